@@ -0,0 +1,189 @@
+"""
+Latency analytics - per service percentiles, error rates and throughput
+
+New request logs are rolled up (by id watermark) into one row per service and
+time bucket holding counters and a DDSketch of processing_time. Sketches are
+mergeable, so any window is answered by merging its buckets instead of
+scanning request_logs, and buckets outlive the log retention window.
+"""
+import logging
+import math
+from datetime import datetime, timedelta
+from telegram.ext import ContextTypes
+from database import db_manager
+from utils.metrics import metrics
+import config
+
+logger = logging.getLogger(__name__)
+
+WINDOWS = {
+    "1h": timedelta(hours=1),
+    "24h": timedelta(hours=24),
+    "7d": timedelta(days=7),
+    "30d": timedelta(days=30)
+}
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative accuracy guarantees (Masson et al., VLDB 2019).
+    Value x > 0 is counted in bin ceil(log_gamma(x)); any quantile estimate is
+    within relative_accuracy of the true value, and two sketches with the same
+    accuracy merge exactly by adding their bin counts.
+    """
+
+    def __init__(self, relative_accuracy: float = config.ANALYTICS_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, value: float, count: int = 1):
+        if value <= 0:
+            self.zero_count += count
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+
+    def merge(self, other: "DDSketch"):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self) -> dict:
+        # JSON object keys are strings
+        return {"a": self.relative_accuracy, "z": self.zero_count,
+                "b": {str(index): count for index, count in self.bins.items()}}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DDSketch":
+        sketch = cls(data["a"])
+        sketch.zero_count = data["z"]
+        sketch.bins = {int(index): count for index, count in data["b"].items()}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
+
+
+def bucket_start(timestamp: datetime) -> datetime:
+    """Start of the analytics bucket containing timestamp"""
+    minutes = timestamp.hour * 60 + timestamp.minute
+    floored = minutes - minutes % config.ANALYTICS_BUCKET_MINUTES
+    return timestamp.replace(hour=floored // 60, minute=floored % 60, second=0, microsecond=0)
+
+
+async def rollup_request_logs(page_size: int = config.ANALYTICS_ROLLUP_PAGE_SIZE) -> int:
+    """Roll request logs newer than the watermark into latency buckets; returns the number of logs"""
+    last_id = await db_manager.get_latency_watermark()
+    rolled_up = 0
+
+    while True:
+        rows = await db_manager.get_request_logs_after(last_id, page_size)
+        if not rows:
+            break
+
+        partials = {}
+        for _, service_name, status, processing_time, timestamp in rows:
+            if status == config.CIRCUIT_BREAKER_LOG_STATUS:
+                continue
+            partial = partials.get((service_name, bucket_start(timestamp)))
+            if partial is None:
+                partial = partials[(service_name, bucket_start(timestamp))] = {
+                    "requests": 0, "errors": 0, "processing_ms": 0, "sketch": DDSketch()
+                }
+            partial["requests"] += 1
+            if status != 'success':
+                partial["errors"] += 1
+            if processing_time is not None:
+                partial["processing_ms"] += processing_time
+                partial["sketch"].add(processing_time)
+
+        last_id = rows[-1][0]
+        await db_manager.merge_latency_buckets(partials, last_id)
+        rolled_up += len(rows)
+
+    return rolled_up
+
+
+async def window_summary(window: str = "24h", now: datetime = None) -> dict:
+    """
+    Per service {requests, errors, error_rate, per_minute, p50, p90, p99} (ms) over a window.
+    The window start is rounded down to a bucket boundary.
+    """
+    now = now or datetime.utcnow()
+    start = bucket_start(now - WINDOWS[window])
+    minutes = max((now - start).total_seconds() / 60, 1)
+
+    merged = {}
+    for bucket in await db_manager.get_latency_buckets(start):
+        service = merged.setdefault(bucket['service_name'], {"requests": 0, "errors": 0, "sketch": DDSketch()})
+        service["requests"] += bucket['requests']
+        service["errors"] += bucket['errors']
+        service["sketch"].merge(DDSketch.from_dict(bucket['sketch']))
+
+    summary = {}
+    for service_name, service in sorted(merged.items()):
+        summary[service_name] = {
+            "requests": service["requests"],
+            "errors": service["errors"],
+            "error_rate": service["errors"] / service["requests"] if service["requests"] else 0.0,
+            "per_minute": service["requests"] / minutes,
+            **{f"p{round(q * 100)}": service["sketch"].quantile(q) for q in QUANTILES}
+        }
+    return summary
+
+
+# Last summaries per window, refreshed by the rollup job and read at scrape time
+latest_summaries = {}
+
+
+async def analytics_rollup_job(context: ContextTypes.DEFAULT_TYPE):
+    """Roll up new request logs and refresh the summaries exposed as metrics"""
+    try:
+        await rollup_request_logs()
+        for window in config.ANALYTICS_METRIC_WINDOWS:
+            latest_summaries[window] = await window_summary(window)
+    except Exception as e:
+        logger.error(f"Latency analytics rollup failed: {e}")
+
+
+def _collect_latency_analytics():
+    """Scrape-time gauges from the latest window summaries"""
+    latency, error_rate, throughput = [], [], []
+    for window, summary in latest_summaries.items():
+        for service_name, stats in summary.items():
+            labels = {"service": service_name, "window": window}
+            for q in QUANTILES:
+                value = stats[f"p{round(q * 100)}"]
+                if value is not None:
+                    latency.append(({**labels, "quantile": str(q)}, round(value, 1)))
+            error_rate.append((labels, round(stats["error_rate"], 4)))
+            throughput.append((labels, round(stats["per_minute"], 2)))
+    return [
+        ("bot_service_latency_ms", "gauge", "Processing time quantiles from request logs", latency),
+        ("bot_service_error_rate", "gauge", "Share of requests that did not succeed", error_rate),
+        ("bot_service_requests_per_minute", "gauge", "Average request rate over the window", throughput),
+    ]
+
+
+metrics.register_collector(_collect_latency_analytics)
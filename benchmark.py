@@ -0,0 +1,441 @@
+"""
+Load generator - replays synthetic Telegram updates against the real Application offline
+
+The Application is built exactly as in production (main.build_application) but
+with a bot whose transport answers every Bot API call locally, and a scratch
+database. Virtual users walk through complete flows (/start, language
+selection, main menu routing and every service conversation) while a pacer
+keeps the offered load at the target rate.
+
+Usage:
+    python benchmark.py --rate 50 --duration 30 --users 200 --output run.json
+    python benchmark.py --rate 50 --duration 30 --compare run.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from telegram import Update
+from telegram.ext import ExtBot, TypeHandler
+from telegram.request import BaseRequest
+
+import config
+from database import db_manager
+from locales import get_text
+from main import build_application
+from services.generation_queue import generation_queue
+from utils.metrics import metrics, HANDLER_DURATION, HANDLER_DB_QUERIES, DB_QUERIES
+from utils.scheduler import percentile
+
+# First Telegram ID used for virtual users
+USER_ID_BASE = 700_000_000
+
+# Relative weight of each flow in the default traffic mix
+DEFAULT_MIX = {
+    "start": 5,
+    "language": 3,
+    "menu": 7,
+    "chat": 20,
+    "translation": 15,
+    "text_gen": 10,
+    "image": 10,
+    "video": 5,
+    "tts": 7,
+    "music": 5,
+    "premium": 5,
+    "stats": 3
+}
+
+
+class OfflineRequest(BaseRequest):
+    """Bot API transport that answers every call locally instead of going to Telegram"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = {}
+        self._message_id = 0
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url: str, method: str, request_data=None, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        parameters = request_data.parameters if request_data else {}
+        return 200, json.dumps({"ok": True, "result": self._result(endpoint, parameters)}).encode('utf-8')
+
+    def _result(self, endpoint: str, parameters: dict):
+        if endpoint == 'getMe':
+            return {
+                "id": 1, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot",
+                "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False
+            }
+        if endpoint.startswith(('send', 'edit')):
+            self._message_id += 1
+            return {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(parameters.get('chat_id', 0)), "type": "private"},
+                "text": parameters.get('text', '')
+            }
+        return True
+
+
+class UpdateFactory:
+    """Builds realistic update payloads for virtual users"""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._update_id = 0
+
+    def _next_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    @staticmethod
+    def _user(telegram_id: int) -> dict:
+        return {
+            "id": telegram_id, "is_bot": False, "first_name": f"User{telegram_id}",
+            "username": f"user{telegram_id}", "language_code": "uz"
+        }
+
+    def _message(self, telegram_id: int, text: str) -> dict:
+        message = {
+            "message_id": self._update_id,
+            "date": int(time.time()),
+            "chat": {"id": telegram_id, "type": "private", "first_name": f"User{telegram_id}"},
+            "from": self._user(telegram_id),
+            "text": text
+        }
+        if text.startswith('/'):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return message
+
+    def message(self, telegram_id: int, text: str) -> Update:
+        update_id = self._next_id()
+        return Update.de_json({"update_id": update_id, "message": self._message(telegram_id, text)}, self.bot)
+
+    def callback(self, telegram_id: int, data: str) -> Update:
+        update_id = self._next_id()
+        return Update.de_json({
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self._user(telegram_id),
+                "chat_instance": str(telegram_id),
+                "data": data,
+                "message": self._message(telegram_id, "Tilni tanlang / Выберите язык:")
+            }
+        }, self.bot)
+
+
+def flow_steps(flow: str, language: str) -> list[tuple[str, str]]:
+    """Steps of a flow as (kind, payload) pairs; kind is 'text' or 'callback'"""
+    def button(key):
+        return ("text", get_text(language, key))
+
+    pro = config.PREMIUM_PACKAGES['pro']
+    flows = {
+        "start": [("text", "/start")],
+        "language": [("text", "/language"), ("callback", f"lang_{language}")],
+        "menu": [("text", "salom")],
+        "stats": [("text", "/stats")],
+        "chat": [button("service_chat"), ("text", "O'zbekistonning poytaxti qaysi?")],
+        "translation": [button("service_translation"), ("text", "Salom, qalaysiz?"), ("text", "Uzbek"), ("text", "English")],
+        "text_gen": [button("service_text_gen"), ("text", "Blog Post"), ("text", "Samarqand sayohati"),
+                     ("text", "Short (100-300 words)"), ("text", "Friendly")],
+        "image": [button("service_image"), ("text", "Registon maydoni kechasi"), ("text", "1024x1024"),
+                  ("text", "Anime"), ("text", "1")],
+        "video": [button("service_video"), ("text", "Toshkent ustidan dron parvozi"), ("text", "5 seconds"),
+                  ("text", "Cinematic"), ("text", "16:9")],
+        "tts": [button("service_voice"), button("voice_mode_tts"), ("text", "Xush kelibsiz!"),
+                ("text", "Calm"), ("text", "Uzbek")],
+        "music": [button("service_voice"), button("voice_mode_music"), ("text", "Tinch oqshom"), ("text", "Ambient")],
+        "premium": [button("service_premium"), ("text", f"{pro[f'name_{language}']} | {pro['price']:,.0f} UZS"),
+                    button("premium_skip_promo"), button("payment_confirm_btn")]
+    }
+    return flows[flow]
+
+
+class Pacer:
+    """Spaces out sends so the offered load does not exceed the target rate"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(self._next, now)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class LoadGenerator:
+    """Drives virtual users through flows and measures end-to-end update latency"""
+
+    def __init__(self, application, mix: dict, users: int, rate: float, duration: float, language: str, seed: int):
+        self.application = application
+        self.factory = UpdateFactory(application.bot)
+        self.flows = list(mix)
+        self.weights = [mix[flow] for flow in self.flows]
+        self.users = users
+        self.pacer = Pacer(rate)
+        self.duration = duration
+        self.language = language
+        self.random = random.Random(seed)
+        self.pending = {}
+        self.latencies = []
+        self.flow_counts = {}
+        self.sent = 0
+
+    async def _mark_done(self, update: Update, context):
+        """Runs after every other handler group for the update"""
+        waiter = self.pending.pop(update.update_id, None)
+        if waiter and not waiter.done():
+            waiter.set_result(time.monotonic())
+
+    async def _send(self, telegram_id: int, kind: str, payload: str):
+        update = (self.factory.message if kind == "text" else self.factory.callback)(telegram_id, payload)
+        waiter = asyncio.get_running_loop().create_future()
+        self.pending[update.update_id] = waiter
+
+        await self.pacer.wait()
+        sent_at = time.monotonic()
+        self.sent += 1
+        await self.application.update_queue.put(update)
+        self.latencies.append(await waiter - sent_at)
+
+    async def _virtual_user(self, telegram_id: int, deadline: float):
+        while time.monotonic() < deadline:
+            flow = self.random.choices(self.flows, self.weights)[0]
+            self.flow_counts[flow] = self.flow_counts.get(flow, 0) + 1
+            for kind, payload in flow_steps(flow, self.language):
+                if time.monotonic() >= deadline:
+                    return
+                await self._send(telegram_id, kind, payload)
+
+    async def run(self) -> float:
+        self.application.add_handler(TypeHandler(Update, self._mark_done), group=1000)
+        started = time.monotonic()
+        deadline = started + self.duration
+        await asyncio.gather(*(
+            self._virtual_user(USER_ID_BASE + index, deadline) for index in range(self.users)
+        ))
+        return time.monotonic() - started
+
+
+async def seed_users(users: int, language: str, premium_share: dict, seed: int):
+    """Create the virtual users and give a share of them paid packages"""
+    from services import PremiumService
+
+    rng = random.Random(seed)
+    for index in range(users):
+        telegram_id = USER_ID_BASE + index
+        await db_manager.get_or_create_user(telegram_id, f"user{telegram_id}", f"User{telegram_id}")
+        await db_manager.set_user_language(telegram_id, language)
+
+        roll = rng.random()
+        for package_key, share in premium_share.items():
+            if roll < share:
+                await PremiumService.activate_premium(telegram_id, config.PREMIUM_PACKAGES[package_key]['duration_days'], package_key)
+                break
+            roll -= share
+
+
+def simulate_provider_latency(seconds: float):
+    """Make every provider hook take a fixed time, as a real AI API would"""
+    from services import (ChatService, TranslationService, TextGenerationService, VideoCreationService,
+                          ImageGenerationService, VoiceMusicService)
+
+    def delayed(hook):
+        async def wrapper(*args, **kwargs):
+            await asyncio.sleep(seconds)
+            return await hook(*args, **kwargs)
+        return wrapper
+
+    for service in (ChatService, TranslationService, TextGenerationService, VideoCreationService,
+                    ImageGenerationService, VoiceMusicService):
+        for name in ('integrate_ai_api', 'integrate_tts_api', 'integrate_music_api'):
+            hook = getattr(service, name, None)
+            if hook is not None:
+                setattr(service, name, staticmethod(delayed(hook)))
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _parse_mapping(text: str, cast=float) -> dict:
+    """Parse 'a=1,b=2' into a dict"""
+    mapping = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        key, value = item.split('=', 1)
+        mapping[key.strip()] = cast(value)
+    return mapping
+
+
+async def run_benchmark(args) -> dict:
+    db_manager.configure_engine(args.database_url)
+    await db_manager.init_db()
+
+    mix = _parse_mapping(args.mix) if args.mix else DEFAULT_MIX
+    unknown = set(mix) - set(DEFAULT_MIX)
+    if unknown:
+        raise SystemExit(f"Unknown flows in --mix: {', '.join(sorted(unknown))}")
+
+    if args.provider_latency_ms:
+        simulate_provider_latency(args.provider_latency_ms / 1000)
+
+    transport = OfflineRequest(args.api_latency_ms / 1000)
+    bot = ExtBot(token="123456:OFFLINE", request=transport, get_updates_request=OfflineRequest())
+    application = build_application(bot=bot, concurrent_updates=args.concurrent_updates or False)
+
+    await seed_users(args.users, args.language, _parse_mapping(args.premium_share), args.seed)
+
+    generator = LoadGenerator(application, mix, args.users, args.rate, args.duration, args.language, args.seed)
+    queries_before = metrics.counter_value(DB_QUERIES)
+
+    await application.initialize()
+    await application.start()
+    await generation_queue.start(application.bot)
+    try:
+        elapsed = await generator.run()
+    finally:
+        await generation_queue.stop()
+        await application.stop()
+        await application.shutdown()
+
+    queries = metrics.counter_value(DB_QUERIES) - queries_before
+    completed = len(generator.latencies)
+    latencies_ms = [latency * 1000 for latency in generator.latencies]
+
+    handlers = []
+    for row in metrics.summary(HANDLER_DURATION):
+        name = row['labels']['handler']
+        handlers.append({
+            "handler": name,
+            "count": row['count'],
+            "p50_ms": round(row['p50'], 2),
+            "p95_ms": round(row['p95'], 2),
+            "p99_ms": round(row['p99'], 2),
+            "db_queries_per_call": round(metrics.counter_value(HANDLER_DB_QUERIES, handler=name) / row['count'], 2)
+        })
+
+    return {
+        "commit": _git_commit(),
+        "started_at": datetime.utcnow().isoformat(timespec='seconds'),
+        "settings": {
+            "rate": args.rate, "duration": args.duration, "users": args.users,
+            "concurrent_updates": args.concurrent_updates, "mix": mix,
+            "provider_latency_ms": args.provider_latency_ms, "api_latency_ms": args.api_latency_ms
+        },
+        "updates_sent": generator.sent,
+        "updates_completed": completed,
+        "elapsed_s": round(elapsed, 2),
+        "updates_per_second": round(completed / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 2),
+            "p95": round(percentile(latencies_ms, 95), 2),
+            "p99": round(percentile(latencies_ms, 99), 2),
+            "max": round(max(latencies_ms), 2) if latencies_ms else 0.0
+        },
+        "db_queries": int(queries),
+        "db_queries_per_update": round(queries / completed, 2) if completed else 0.0,
+        "flows": generator.flow_counts,
+        "bot_api_calls": transport.calls,
+        "handlers": handlers
+    }
+
+
+def _lookup(report: dict, path: str):
+    value = report
+    for part in path.split('.'):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def print_report(report: dict, baseline: dict = None):
+    def delta(path):
+        """Relative change against the baseline run, if one was given"""
+        old = _lookup(baseline, path) if baseline else None
+        if not old:
+            return ""
+        change = (_lookup(report, path) - old) / old * 100
+        return f"  ({change:+.1f}% vs {baseline.get('commit') or 'baseline'})"
+
+    latency = report['latency_ms']
+    print(f"\nCommit: {report['commit'] or 'unknown'}")
+    print(f"Updates: {report['updates_completed']}/{report['updates_sent']} in {report['elapsed_s']}s")
+    print(f"Throughput: {report['updates_per_second']} updates/s{delta('updates_per_second')}")
+    print(f"Latency p50/p95/p99/max: {latency['p50']} / {latency['p95']} / {latency['p99']} / {latency['max']} ms"
+          f"{delta('latency_ms.p95')}")
+    print(f"DB queries per update: {report['db_queries_per_update']}{delta('db_queries_per_update')}")
+
+    print(f"\n{'Handler':<55} {'n':>6} {'p50':>8} {'p95':>8} {'p99':>8} {'sql':>6}")
+    for row in report['handlers']:
+        print(f"{row['handler'][:55]:<55} {row['count']:>6} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+              f"{row['p99_ms']:>8.1f} {row['db_queries_per_call']:>6.1f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay synthetic Telegram traffic against the bot offline")
+    parser.add_argument("--rate", type=float, default=50, help="target updates per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to generate load")
+    parser.add_argument("--users", type=int, default=200, help="number of virtual users")
+    parser.add_argument("--mix", default="", help="flow weights, e.g. 'chat=5,image=2' (default: built-in mix)")
+    parser.add_argument("--premium-share", default="vip=0.05,pro=0.15", help="share of users per paid package")
+    parser.add_argument("--language", choices=["uz", "ru"], default="uz")
+    parser.add_argument("--concurrent-updates", type=int, default=0,
+                        help="process updates concurrently (0 = sequential, as in production)")
+    parser.add_argument("--provider-latency-ms", type=float, default=0, help="simulated AI provider latency")
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="simulated Bot API latency")
+    parser.add_argument("--database-url", default=None, help="scratch database (default: a temporary SQLite file)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of a previous run to compare against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.database_url is None:
+            args.database_url = f"sqlite+aiosqlite:///{os.path.join(scratch, 'benchmark.db')}"
+        report = asyncio.run(run_benchmark(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,13 @@ from database import db_manager
 from locales import get_text
 from utils.keyboards import get_main_menu_keyboard
 from utils.decorators import rate_limit 
+from utils.providers import ProviderUnavailable
+from utils.lifecycle import RequestLifecycle
+from utils.output_delivery import deliver
 import config
 
-# Conversation states
-WAITING_QUESTION = 1
+# Conversation states (defined in services.states)
+from services.states import WAITING_QUESTION
 
 class ChatService:
     """Chat Q&A service"""
@@ -43,25 +46,26 @@ class ChatService:
             )
             return ConversationHandler.END
         
-        # Show processing message
-        await update.message.reply_text(get_text(language, "processing"))
-        
-        # Log request
-        await db_manager.log_request(
-            user.id, 
-            "chat", 
-            {"question": question},
-            "success"
-        )
-        
-        # AI API integration point
-        response = await ChatService.integrate_ai_api(question, language)
-        
-        # Send response
-        await update.message.reply_text(
-            get_text(language, "chat_response", response=response),
-            reply_markup=get_main_menu_keyboard(language)
-        )
+        try:
+            # Timed and logged to RequestLog with the real final status
+            async with RequestLifecycle(user.id, "chat", {"question": question}) as lifecycle:
+                # Show processing message
+                await lifecycle.send(update.message.reply_text(get_text(language, "processing")))
+                
+                # AI API integration point
+                response = await lifecycle.call_provider(ChatService.integrate_ai_api, question, language)
+                
+                # Send response
+                await lifecycle.send(deliver(
+                    update.message, get_text(language, "chat_response", response=response), language,
+                    reply_markup=get_main_menu_keyboard(language), filename="answer.txt"
+                ))
+        except ProviderUnavailable:
+            await update.message.reply_text(
+                get_text(language, "service_unavailable"),
+                reply_markup=get_main_menu_keyboard(language)
+            )
+            return ConversationHandler.END
         
         return ConversationHandler.END
     
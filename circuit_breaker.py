@@ -0,0 +1,156 @@
+"""
+Circuit breakers and adaptive concurrency limits for AI providers
+"""
+import time
+from collections import defaultdict
+import config
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Per-provider circuit breaker.
+
+    closed    - calls pass; consecutive failures are counted
+    open      - calls fail fast until reset_timeout has elapsed
+    half_open - a limited number of probe calls pass; a success closes the
+                breaker, a failure opens it again. Probes that never report
+                back open it again after reset_timeout.
+
+    State-changing methods return (old_state, new_state) on a transition, otherwise None.
+    """
+
+    def __init__(self, name: str,
+                 failure_threshold: int = config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = config.CIRCUIT_BREAKER_RESET_SECONDS,
+                 half_open_calls: int = config.CIRCUIT_BREAKER_HALF_OPEN_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.probed_at = 0.0
+        self.transitions = defaultdict(int)
+
+    def _transition(self, new_state: str):
+        old_state = self.state
+        self.state = new_state
+        self.transitions[(old_state, new_state)] += 1
+        if new_state == OPEN:
+            self.opened_at = time.monotonic()
+        self.failures = 0
+        self.probes = 0
+        return old_state, new_state
+
+    def allow_request(self) -> tuple[bool, tuple | None]:
+        """Check whether a call may pass. Returns (allowed, transition)."""
+        transition = None
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            transition = self._transition(HALF_OPEN)
+        elif (self.state == HALF_OPEN and self.probes >= self.half_open_calls
+              and now - self.probed_at >= self.reset_timeout):
+            transition = self._transition(OPEN)
+
+        if self.state == CLOSED:
+            return True, transition
+        if self.state == HALF_OPEN and self.probes < self.half_open_calls:
+            self.probes += 1
+            self.probed_at = now
+            return True, transition
+        return False, transition
+
+    def release_probe(self):
+        """Give back a probe slot whose call ended without a result (cancelled, or never reached the provider)"""
+        if self.state == HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            return self._transition(CLOSED)
+        self.failures = 0
+        return None
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            return self._transition(OPEN)
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            return self._transition(OPEN)
+        return None
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit driven by observed provider latency.
+    Every call that finishes within the latency target raises the limit by
+    1/limit (about +1 per limit's worth of calls); a failure or a slow call
+    halves it. The limit never exceeds the static cap of the service.
+    """
+
+    def __init__(self, name: str, max_limit: int, latency_target: float,
+                 min_limit: int = 1, backoff: float = 0.5):
+        self.name = name
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.limit = float(max_limit)
+
+    @property
+    def current(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    def on_success(self, latency: float) -> int:
+        if latency > self.latency_target:
+            return self._decrease()
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+        return self.current
+
+    def on_failure(self) -> int:
+        return self._decrease()
+
+    def _decrease(self) -> int:
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        return self.current
+
+
+class ProviderGuard:
+    """Registry of breakers and limiters, one of each per service"""
+
+    def __init__(self):
+        self.breakers = {}
+        self.limiters = {}
+
+    def breaker(self, service_name: str) -> CircuitBreaker:
+        if service_name not in self.breakers:
+            self.breakers[service_name] = CircuitBreaker(service_name)
+        return self.breakers[service_name]
+
+    def limiter(self, service_name: str) -> AdaptiveLimiter:
+        if service_name not in self.limiters:
+            self.limiters[service_name] = AdaptiveLimiter(
+                service_name,
+                max_limit=config.PROVIDER_CONCURRENCY.get(service_name, 5),
+                latency_target=config.PROVIDER_LATENCY_TARGETS.get(service_name, 30)
+            )
+        return self.limiters[service_name]
+
+    def stats(self) -> dict:
+        """Breaker state, transition counts and adaptive limit per service"""
+        return {
+            service_name: {
+                'state': breaker.state,
+                'transitions': {f"{old}->{new}": count for (old, new), count in breaker.transitions.items()},
+                'limit': self.limiter(service_name).current
+            }
+            for service_name, breaker in self.breakers.items()
+        }
+
+
+# Global breaker/limiter registry for provider calls
+provider_guard = ProviderGuard()
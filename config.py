@@ -112,3 +112,129 @@ PREMIUM_FEATURES = {
     "higher_quality": True,
     "exclusive_models": True
 }
+
+# Background Generation Jobs (video, music)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_POLL_INTERVAL = 2  # seconds between queue polls when idle
+JOB_LEASE_SECONDS = 300  # a job whose worker stops heartbeating is picked up again after this
+JOB_MAX_ATTEMPTS = 3
+
+# Priority Processing (see PREMIUM_FEATURES["priority_processing"])
+# Share of provider capacity each package gets when a provider is saturated
+PRIORITY_WEIGHTS = {
+    "vip": 8,
+    "pro": 4,
+    "standard": 2,
+    "basic": 1
+}
+# Maximum concurrent provider calls per service
+PROVIDER_CONCURRENCY = {
+    "chat": 10,
+    "translation": 10,
+    "text_generation": 5,
+    "image_generation": 4,
+    "video_creation": 2,
+    "voice_music": 3
+}
+PRIORITY_MAX_WAIT_SECONDS = 30  # after this, a waiting request is served regardless of its package
+
+# Provider Circuit Breakers & Adaptive Concurrency
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5  # consecutive failures before a provider is cut off
+CIRCUIT_BREAKER_RESET_SECONDS = 30  # how long calls fail fast before a probe is allowed
+CIRCUIT_BREAKER_HALF_OPEN_CALLS = 1
+CIRCUIT_BREAKER_LOG_STATUS = "event"  # request log status of state transitions, skipped by request statistics
+# Latency (seconds) above which the concurrency limit of a provider is reduced
+PROVIDER_LATENCY_TARGETS = {
+    "chat": 15,
+    "translation": 15,
+    "text_generation": 60,
+    "image_generation": 60,
+    "video_creation": 300,
+    "voice_music": 120
+}
+
+# Metrics endpoint (Prometheus text format, local only)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Maintenance jobs (run on the Application's job queue)
+PREMIUM_EXPIRY_INTERVAL = 300  # seconds between premium expiry sweeps
+PREMIUM_EXPIRY_BATCH_SIZE = 1000  # users downgraded per transaction
+PREMIUM_EXPIRY_NOTIFY = True  # tell users that their subscription ended
+NOTIFY_BATCH_SIZE = 25  # messages sent before pausing (Telegram allows ~30/s)
+NOTIFY_BATCH_PAUSE = 1.0  # seconds
+LIMIT_RESET_TIME_UTC = "00:00:30"  # daily bulk reset of elapsed quota windows
+LIMIT_RESET_CHUNK_SIZE = 5000  # user_limits rows per reset transaction
+
+# Request log retention (older rows move to compressed archive chunks)
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "30"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "archive/request_logs")
+LOG_ARCHIVE_CHUNK_ROWS = 20000  # rows per archive file
+LOG_DELETE_BATCH_SIZE = 1000  # rows deleted per transaction
+LOG_DELETE_PAUSE = 0.05  # seconds between delete batches, leaves room for the bot's writes
+LOG_COMPACTION_TIME_UTC = "03:00:00"
+
+# Latency analytics (DDSketch per service and time bucket, rolled up from request logs)
+ANALYTICS_BUCKET_MINUTES = 60
+ANALYTICS_RELATIVE_ACCURACY = 0.01  # quantiles are within 1% of the true value
+ANALYTICS_ROLLUP_INTERVAL = 60  # seconds between rollups of new request logs
+ANALYTICS_ROLLUP_PAGE_SIZE = 10000
+ANALYTICS_METRIC_WINDOWS = ("1h", "24h")  # windows exposed on the metrics endpoint
+
+# Image post-processing (Pillow, in a process pool)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))  # worker processes; each handles one image at a time
+IMAGE_JPEG_QUALITY = 90
+IMAGE_THUMBNAIL_SIZE = 320  # longest side of thumbnails in pixels
+IMAGE_WATERMARK_TEXT = os.getenv("IMAGE_WATERMARK_TEXT", "AI Bot")  # stamped on images of free packages
+
+# Text-to-speech of long texts (sentence-aligned chunks synthesized concurrently)
+TTS_CHUNK_CHARS = 400  # characters per provider call
+TTS_FIRST_CHUNK_CHARS = 150  # the first chunk is shorter and sent as its own voice message
+TTS_CONCURRENCY = 3  # chunks of one text synthesized at once
+TTS_PART_MAX_SECONDS = 180  # audio per voice message; Telegram shows voice notes up to 1 MB
+
+# Graceful shutdown (see utils.shutdown)
+SHUTDOWN_DRAIN_TIMEOUT = 25  # seconds in-flight handlers get after SIGTERM; keep below the deploy's kill timeout
+SHUTDOWN_CANCEL_GRACE = 2  # seconds cancelled handlers get to log their request
+
+# SQLite
+SQLITE_WAL = True  # write-ahead log journal (checkpointed on shutdown)
+SQLITE_BUSY_TIMEOUT_MS = 5000  # a writer waits this long for the database lock
+
+# Long results (see utils.output_delivery)
+OUTPUT_PAGE_CHARS = 4000  # characters per page; Telegram rejects messages over 4096
+OUTPUT_DOCUMENT_CHARS = 20000  # longer results are sent as a .txt document instead of pages
+OUTPUT_PAGE_TTL = 3600  # seconds the pages of a result stay available to the buttons
+OUTPUT_PAGE_CACHE_ENTRIES = 2000  # paged results kept in memory
+
+# Source language auto-detection (offline, see utils.language_detect)
+LANGUAGE_DETECT_MIN_CONFIDENCE = 0.85  # below this the user still picks the source language
+
+# Translation memory (sentence-level reuse of earlier translations)
+TRANSLATION_MEMORY_MAX_ENTRIES = 500000  # segments kept; the least recently used are pruned
+TRANSLATION_MEMORY_PRUNE_INTERVAL = 6 * 3600  # seconds between pruning runs
+
+# Telegram file_id reuse (media_files table)
+MEDIA_STORE_MAX_ENTRIES = 100000  # file_ids kept; the least recently used are pruned
+MEDIA_STORE_MEMORY_ENTRIES = 5000  # hot file_ids served without a query
+MEDIA_STORE_PRUNE_INTERVAL = 3600  # seconds between pruning runs
+
+# Payment reconciliation
+PAYMENT_PENDING_TTL_HOURS = 72  # pending payments older than this expire (admins can still confirm them)
+PAYMENT_RECONCILE_INTERVAL = 900  # seconds between reconciliation runs
+
+# Promo codes
+PROMO_CACHE_TTL = 300  # seconds a looked-up code is served from memory
+PROMO_NEGATIVE_CACHE_TTL = 60  # seconds an unknown/expired code is remembered
+PROMO_CACHE_MAX_ENTRIES = 10000
+PROMO_MAX_FAILED_ATTEMPTS = 5  # invalid codes per user within PROMO_ATTEMPT_WINDOW
+PROMO_ATTEMPT_WINDOW = 900
+PROMO_RESERVATION_TTL_HOURS = 48  # unconfirmed reservations are released after this
+PROMO_RELEASE_INTERVAL = 600  # seconds between sweeps of expired reservations
+
+# Admin exports
+EXPORT_PAGE_SIZE = 2000  # rows fetched per keyset page
+EXPORT_MAX_PART_BYTES = 45 * 1024 * 1024  # Telegram bots may upload files up to 50 MB
+
+# SQL instrumentation
+SLOW_QUERY_THRESHOLD_MS = int(os.getenv("SLOW_QUERY_THRESHOLD_MS", "100"))  # statements slower than this are logged
@@ -0,0 +1,141 @@
+"""
+Cold archive of compacted request logs
+
+Rows older than the retention window are moved out of request_logs into
+gzip-compressed JSONL chunks, bucketed by month:
+
+    <archive_dir>/2026-10/request_logs-<min_id>-<max_id>.jsonl.gz
+
+index.json lists every chunk with its id and time range, so readers only
+open the chunks that overlap the requested period.
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+import config
+
+INDEX_FILE = "index.json"
+
+
+def _serialize_row(row: dict) -> dict:
+    return {key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+
+
+class LogArchive:
+    """Writes and reads archived request log chunks"""
+
+    def __init__(self, archive_dir: str = config.LOG_ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.archive_dir, INDEX_FILE)
+
+    def load_index(self) -> list[dict]:
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_index(self, index: list[dict]):
+        """Atomically replace the index"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        temporary = self.index_path + ".tmp"
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(index, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.index_path)
+
+    def write_chunk(self, rows: list[dict], cutoff: datetime) -> dict:
+        """
+        Write rows (ordered by id) to a new chunk and register it in the index as
+        not yet deleted from the database. Returns the index entry.
+        """
+        min_id, max_id = rows[0]['id'], rows[-1]['id']
+        timestamps = [row['timestamp'] for row in rows]
+        min_ts, max_ts = min(timestamps), max(timestamps)
+
+        bucket = min_ts.strftime("%Y-%m")
+        relative_path = os.path.join(bucket, f"request_logs-{min_id}-{max_id}.jsonl.gz")
+        path = os.path.join(self.archive_dir, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(_serialize_row(row), ensure_ascii=False) + "\n")
+
+        entry = {
+            "file": relative_path,
+            "min_id": min_id,
+            "max_id": max_id,
+            "min_ts": min_ts.isoformat(),
+            "max_ts": max_ts.isoformat(),
+            "cutoff": cutoff.isoformat(),
+            "rows": len(rows),
+            "bytes": os.path.getsize(path),
+            "deleted": False
+        }
+        index = self.load_index()
+        index.append(entry)
+        self.save_index(index)
+        return entry
+
+    def mark_deleted(self, entry: dict):
+        """Record that the rows of a chunk were removed from the database"""
+        index = self.load_index()
+        for item in index:
+            if item['file'] == entry['file']:
+                item['deleted'] = True
+        self.save_index(index)
+
+    def pending_deletes(self) -> list[dict]:
+        """Chunks written by an interrupted compaction whose rows are still in the database"""
+        return [entry for entry in self.load_index() if not entry['deleted']]
+
+    def iter_rows(self, start: datetime = None, end: datetime = None, service_name: str = None):
+        """Yield archived rows with start <= timestamp < end, reading only overlapping chunks"""
+        for entry in self.load_index():
+            if start and datetime.fromisoformat(entry['max_ts']) < start:
+                continue
+            if end and datetime.fromisoformat(entry['min_ts']) >= end:
+                continue
+
+            with gzip.open(os.path.join(self.archive_dir, entry['file']), 'rt', encoding='utf-8') as f:
+                for line in f:
+                    row = json.loads(line)
+                    timestamp = datetime.fromisoformat(row['timestamp'])
+                    if (start and timestamp < start) or (end and timestamp >= end):
+                        continue
+                    if service_name and row['service_name'] != service_name:
+                        continue
+                    yield row
+
+    def aggregate(self, start: datetime = None, end: datetime = None) -> dict:
+        """Per service request count, errors and total processing time of archived rows"""
+        stats = {}
+        for row in self.iter_rows(start, end):
+            if row['status'] == config.CIRCUIT_BREAKER_LOG_STATUS:
+                continue
+            service = stats.setdefault(row['service_name'], {"requests": 0, "errors": 0, "processing_ms": 0})
+            service["requests"] += 1
+            if row['status'] != 'success':
+                service["errors"] += 1
+            service["processing_ms"] += row.get('processing_time') or 0
+        return stats
+
+    def summary(self) -> dict:
+        """Chunk count, rows, size on disk and covered period"""
+        index = self.load_index()
+        return {
+            "chunks": len(index),
+            "rows": sum(entry['rows'] for entry in index),
+            "bytes": sum(entry['bytes'] for entry in index),
+            "oldest": min((entry['min_ts'] for entry in index), default=None),
+            "newest": max((entry['max_ts'] for entry in index), default=None)
+        }
+
+
+# Global archive of compacted request logs
+log_archive = LogArchive()
@@ -0,0 +1,114 @@
+"""
+SQL instrumentation - statement counts, DB time per update and slow-query log
+"""
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from utils.metrics import metrics, DB_QUERIES, DB_SLOW_QUERIES
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Statements executed inside one scope (usually one update)"""
+    __slots__ = ('label', 'count', 'total_time', 'statements', 'parent')
+
+    def __init__(self, label: str = None, record_statements: bool = False, parent: "QueryStats" = None):
+        self.label = label
+        self.count = 0
+        self.total_time = 0.0
+        # Only filled in test mode (assert_max_queries)
+        self.statements = [] if record_statements else None
+        self.parent = parent
+
+    def _record(self, statement: str, duration: float):
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.total_time += duration
+            if stats.statements is not None:
+                stats.statements.append(statement)
+            stats = stats.parent
+
+
+_current_stats: ContextVar = ContextVar('query_stats', default=None)
+
+
+def current_query_stats() -> QueryStats | None:
+    """Stats of the innermost active scope, or None outside any scope"""
+    return _current_stats.get()
+
+
+@contextmanager
+def query_scope(label: str = None, record_statements: bool = False):
+    """
+    Count the statements issued by the current task until the block exits.
+    Scopes nest: statements are also counted in every enclosing scope.
+    """
+    stats = QueryStats(label, record_statements, parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    Test helper: fail if the block issues more than `limit` statements.
+
+    Usage:
+        with assert_max_queries(2):
+            await ImageGenService.start_image_gen(update, context)
+    """
+    with query_scope("assert_max_queries", record_statements=True) as stats:
+        yield stats
+
+    if stats.count > limit:
+        statements = "\n".join(f"  {index}. {statement}" for index, statement in enumerate(stats.statements, 1))
+        raise AssertionError(f"Expected at most {limit} queries, {stats.count} were issued:\n{statements}")
+
+
+def redact_parameters(parameters):
+    """Replace parameter values with their type so user data never reaches the logs"""
+    if isinstance(parameters, dict):
+        return {key: redact_parameters(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return type(parameters)(redact_parameters(value) for value in parameters)
+    if parameters is None:
+        return None
+    return f"<{type(parameters).__name__}>"
+
+
+def _compact(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+def install_query_hooks(engine, slow_query_ms: int = config.SLOW_QUERY_THRESHOLD_MS):
+    """Attach statement counting and the slow-query log to an (async) engine"""
+    sync_engine = getattr(engine, 'sync_engine', engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.monotonic())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.monotonic() - conn.info['query_start'].pop()
+        metrics.counter(DB_QUERIES, "SQL statements executed").inc()
+
+        stats = _current_stats.get()
+        if stats is not None:
+            stats._record(_compact(statement), duration)
+
+        if duration * 1000 >= slow_query_ms:
+            metrics.counter(DB_SLOW_QUERIES, "SQL statements slower than the slow-query threshold").inc()
+            logger.warning(
+                f"Slow query ({duration * 1000:.0f} ms"
+                f"{', ' + stats.label if stats is not None and stats.label else ''}): "
+                f"{_compact(statement)} params={redact_parameters(parameters)}"
+            )
@@ -0,0 +1,446 @@
+"""
+Database microbenchmarks for the hot db_manager methods
+
+Seeds a scratch database with a realistic dataset (users across packages,
+limits, usage counters, payments and a large request log), then calls each
+method at several concurrency levels and reports latency percentiles,
+throughput and SQL statements per call.
+
+Usage:
+    python db_benchmark.py --size small --output before.json
+    python db_benchmark.py --size small --compare before.json
+    python db_benchmark.py --users 1000000 --request-logs 10000000 --database-url sqlite+aiosqlite:///big.db --reuse
+
+--export users|payments|logs instead streams a full admin export and samples
+memory every 100k rows, to check that it stays flat with the table size:
+    python db_benchmark.py --users 10000 --request-logs 1000000 --export logs
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import select, func
+
+import config
+from database import db_manager
+from database.models import User, PremiumPackage, UserLimit, ServiceUsage, Payment, RequestLog
+from database.query_stats import query_scope
+from admin.exporter import EXPORTS, export_table
+from utils.scheduler import percentile
+
+# Dataset presets: (users, request_logs)
+SIZES = {
+    "small": (1_000, 10_000),
+    "medium": (100_000, 1_000_000),
+    "large": (1_000_000, 10_000_000)
+}
+
+# First Telegram ID used for seeded users
+USER_ID_BASE = 800_000_000
+
+# Share of seeded users per package
+PACKAGE_SHARE = {"basic": 0.70, "standard": 0.15, "pro": 0.10, "vip": 0.05}
+
+SERVICES = list(config.PREMIUM_PACKAGES['basic']['limits'])
+
+BATCH_SIZE = 10_000
+
+# Rows between memory samples of the export benchmark
+EXPORT_SAMPLE_ROWS = 100_000
+
+
+class DatasetGenerator:
+    """Generates seed rows; user activity is skewed so a few users produce most traffic"""
+
+    def __init__(self, users: int, seed: int):
+        self.users = users
+        self.random = random.Random(seed)
+        self.now = datetime.utcnow()
+
+    def hot_user_index(self) -> int:
+        """Index of a user, with a quadratic skew towards low indexes (heavy users)"""
+        return int(self.users * self.random.random() ** 2)
+
+    def _pick_package(self) -> str:
+        roll = self.random.random()
+        for package_key, share in PACKAGE_SHARE.items():
+            if roll < share:
+                return package_key
+            roll -= share
+        return 'basic'
+
+    def users_batch(self, start: int, stop: int, package_ids: dict) -> list[dict]:
+        rows = []
+        for index in range(start, stop):
+            package_key = self._pick_package()
+            paid = not config.PREMIUM_PACKAGES[package_key]['is_free']
+            created_at = self.now - timedelta(days=self.random.randint(0, 365))
+            rows.append({
+                "telegram_id": USER_ID_BASE + index,
+                "username": f"user{index}",
+                "first_name": f"User{index}",
+                "language": self.random.choice(('uz', 'ru')),
+                "is_premium": paid,
+                "premium_expiry": self.now + timedelta(days=self.random.randint(-30, 365)) if paid else None,
+                "package_id": package_ids[package_key],
+                "created_at": created_at,
+                "last_active": self.now - timedelta(minutes=self.random.randint(0, 60 * 24 * 30))
+            })
+        return rows
+
+    def limits_and_usage_batch(self, start: int, stop: int) -> tuple[list[dict], list[dict]]:
+        limits, usage = [], []
+        for user_id in range(start + 1, stop + 1):
+            for service_name in self.random.sample(SERVICES, self.random.randint(0, 3)):
+                limits.append({
+                    "user_id": user_id, "service_name": service_name, "limit_type": "daily",
+                    "usage_count": self.random.randint(0, 5), "last_reset": self.now
+                })
+                usage.append({
+                    "user_id": user_id, "service_name": service_name,
+                    "request_count": self.random.randint(1, 500),
+                    "last_reset": self.now, "created_at": self.now
+                })
+        return limits, usage
+
+    def payments_batch(self, start: int, stop: int, package_ids: dict) -> list[dict]:
+        rows = []
+        for user_id in range(start + 1, stop + 1):
+            if self.random.random() >= 0.05:
+                continue
+            package_key = self.random.choice(('pro', 'vip'))
+            status = self.random.choices(('confirmed', 'pending', 'failed'), (80, 15, 5))[0]
+            created_at = self.now - timedelta(days=self.random.randint(0, 180))
+            rows.append({
+                "user_id": user_id, "package_id": package_ids[package_key],
+                "amount": config.PREMIUM_PACKAGES[package_key]['price'], "status": status,
+                "payment_method": "card_transfer", "created_at": created_at,
+                "confirmed_at": created_at + timedelta(hours=1) if status == 'confirmed' else None
+            })
+        return rows
+
+    def request_logs_batch(self, count: int) -> list[dict]:
+        rows = []
+        for _ in range(count):
+            status = self.random.choices(('success', 'error'), (95, 5))[0]
+            rows.append({
+                "user_id": self.hot_user_index() + 1,
+                "service_name": self.random.choice(SERVICES),
+                "request_data": {"prompt": "benchmark request"},
+                "response_data": {"status": status, "provider_ms": self.random.randint(100, 5000)},
+                "status": status,
+                "error_message": "TimeoutError: provider timed out" if status == 'error' else None,
+                "processing_time": self.random.randint(100, 8000),
+                "timestamp": self.now - timedelta(seconds=self.random.randint(0, 90 * 24 * 3600))
+            })
+        return rows
+
+
+async def _insert(table, rows: list[dict]):
+    if rows:
+        async with db_manager.engine.begin() as conn:
+            await conn.execute(table.insert(), rows)
+
+
+async def seed_database(users: int, request_logs: int, seed: int):
+    """Fill an empty database with the benchmark dataset"""
+    await db_manager.init_db()
+    generator = DatasetGenerator(users, seed)
+
+    async with db_manager.async_session() as session:
+        result = await session.execute(select(PremiumPackage.package_key, PremiumPackage.id))
+        package_ids = dict(result.all())
+
+    started = time.monotonic()
+    for start in range(0, users, BATCH_SIZE):
+        stop = min(start + BATCH_SIZE, users)
+        await _insert(User.__table__, generator.users_batch(start, stop, package_ids))
+        limits, usage = generator.limits_and_usage_batch(start, stop)
+        await _insert(UserLimit.__table__, limits)
+        await _insert(ServiceUsage.__table__, usage)
+        await _insert(Payment.__table__, generator.payments_batch(start, stop, package_ids))
+        print(f"\rSeeding users: {stop}/{users}", end="", flush=True)
+    print()
+
+    for start in range(0, request_logs, BATCH_SIZE):
+        count = min(BATCH_SIZE, request_logs - start)
+        await _insert(RequestLog.__table__, generator.request_logs_batch(count))
+        print(f"\rSeeding request_logs: {start + count}/{request_logs}", end="", flush=True)
+    print(f"\nSeeded in {time.monotonic() - started:.1f}s")
+
+
+async def dataset_counts() -> dict:
+    async with db_manager.async_session() as session:
+        return {
+            table.__tablename__: await session.scalar(select(func.count()).select_from(table))
+            for table in (User, UserLimit, ServiceUsage, Payment, RequestLog)
+        }
+
+
+def benchmark_calls(users: int, seed: int) -> dict:
+    """
+    Benchmarked methods: name -> (call factory, share of --iterations).
+    Each factory returns a fresh coroutine for a (skewed) random user.
+    """
+    generator = DatasetGenerator(users, seed)
+
+    def telegram_id():
+        return USER_ID_BASE + generator.hot_user_index()
+
+    def new_or_existing_id():
+        # Roughly 1 in 100 /start presses comes from a new user
+        if generator.random.random() < 0.01:
+            return USER_ID_BASE + users + generator.random.randint(0, 10 ** 9)
+        return telegram_id()
+
+    return {
+        "get_or_create_user": (lambda: db_manager.get_or_create_user(new_or_existing_id(), "bench", "Bench"), 1.0),
+        "get_user_language": (lambda: db_manager.get_user_language(telegram_id()), 1.0),
+        "is_user_premium": (lambda: db_manager.is_user_premium(telegram_id()), 1.0),
+        "check_rate_limit": (lambda: db_manager.check_rate_limit(telegram_id(), generator.random.choice(SERVICES)), 1.0),
+        "increment_usage": (lambda: db_manager.increment_usage(telegram_id(), generator.random.choice(SERVICES)), 1.0),
+        "log_request": (lambda: db_manager.log_request(
+            telegram_id(), generator.random.choice(SERVICES), {"prompt": "benchmark"}, "success",
+            processing_time=generator.random.randint(100, 5000), response_data={"provider_ms": 100}
+        ), 1.0),
+        "get_admin_stats": (lambda: db_manager.get_admin_stats(), 0.05)
+    }
+
+
+async def measure(factory, calls: int, concurrency: int) -> dict:
+    """Run `calls` calls spread over `concurrency` concurrent workers"""
+    latencies = []
+    errors = 0
+    remaining = calls
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.monotonic()
+            try:
+                await factory()
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.monotonic() - started)
+
+    with query_scope("db_benchmark") as stats:
+        started = time.monotonic()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        "calls": len(latencies),
+        "errors": errors,
+        "ops_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 3) if latencies_ms else 0.0,
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p95_ms": round(percentile(latencies_ms, 95), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "max_ms": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+        "sql_per_call": round(stats.count / calls, 2) if calls else 0.0
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmarks(args) -> dict:
+    db_manager.configure_engine(args.database_url)
+
+    counts = None
+    if args.reuse:
+        await db_manager.init_db()
+        counts = await dataset_counts()
+    if not counts or not counts['users']:
+        await seed_database(args.users, args.request_logs, args.seed)
+        counts = await dataset_counts()
+
+    calls = benchmark_calls(counts['users'], args.seed)
+    methods = args.methods.split(',') if args.methods else list(calls)
+    unknown = set(methods) - set(calls)
+    if unknown:
+        raise SystemExit(f"Unknown methods: {', '.join(sorted(unknown))}")
+
+    results = []
+    for method in methods:
+        factory, share = calls[method]
+        iterations = max(10, int(args.iterations * share))
+        await measure(factory, min(args.warmup, iterations), 1)
+        for concurrency in args.concurrency:
+            row = {"method": method, "concurrency": concurrency,
+                   **await measure(factory, iterations, concurrency)}
+            results.append(row)
+            print(f"{method:<20} c={concurrency:<4} p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms "
+                  f"{row['ops_per_second']:.0f} ops/s")
+
+    await db_manager.engine.dispose()
+
+    return {
+        "commit": git_commit(),
+        "started_at": datetime.utcnow().isoformat(timespec='seconds'),
+        "settings": {
+            "iterations": args.iterations, "warmup": args.warmup, "concurrency": args.concurrency,
+            "database": args.database_url.split('://', 1)[0]
+        },
+        "dataset": counts,
+        "results": results
+    }
+
+
+async def run_export_benchmark(args) -> dict:
+    """Export a whole table, sampling Python heap and process RSS every EXPORT_SAMPLE_ROWS rows"""
+    db_manager.configure_engine(args.database_url)
+    await db_manager.init_db()
+    counts = await dataset_counts() if args.reuse else None
+    if not counts or not counts['users']:
+        await seed_database(args.users, args.request_logs, args.seed)
+        counts = await dataset_counts()
+
+    samples = []
+    next_sample = 0
+
+    async def progress(rows_written: int):
+        nonlocal next_sample
+        if rows_written >= next_sample:
+            current, peak = tracemalloc.get_traced_memory()
+            samples.append({
+                "rows": rows_written,
+                "heap_mb": round(current / 1024 / 1024, 2),
+                "heap_peak_mb": round(peak / 1024 / 1024, 2),
+                "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            })
+            next_sample += EXPORT_SAMPLE_ROWS
+            print(f"rows={rows_written:>10,} heap={samples[-1]['heap_mb']:.2f}MB "
+                  f"peak={samples[-1]['heap_peak_mb']:.2f}MB maxrss={samples[-1]['rss_mb']:.1f}MB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        tracemalloc.start()
+        started = time.monotonic()
+        paths, rows_written = await export_table(args.export, directory, progress=progress)
+        duration = time.monotonic() - started
+        tracemalloc.stop()
+        size = sum(os.path.getsize(path) for path in paths)
+
+    await db_manager.engine.dispose()
+
+    return {
+        "commit": git_commit(),
+        "export": args.export,
+        "dataset": counts,
+        "rows": rows_written,
+        "files": len(paths),
+        "compressed_mb": round(size / 1024 / 1024, 2),
+        "duration_s": round(duration, 2),
+        "rows_per_second": round(rows_written / duration) if duration else 0,
+        "samples": samples
+    }
+
+
+def print_export_report(report: dict):
+    samples = report['samples']
+    print(f"\nCommit: {report['commit'] or 'unknown'}  Export: {report['export']}  "
+          f"{report['rows']:,} rows in {report['duration_s']}s ({report['rows_per_second']:,} rows/s), "
+          f"{report['files']} file(s), {report['compressed_mb']} MB compressed")
+    if samples:
+        peaks = [sample['heap_peak_mb'] for sample in samples]
+        print(f"Traced heap peak: first sample {peaks[0]:.2f} MB, last {peaks[-1]:.2f} MB, max {max(peaks):.2f} MB")
+
+
+def print_report(report: dict, baseline: dict = None):
+    previous = {}
+    if baseline:
+        previous = {(row['method'], row['concurrency']): row for row in baseline['results']}
+
+    print(f"\nCommit: {report['commit'] or 'unknown'}  Dataset: "
+          + ", ".join(f"{table}={count:,}" for table, count in report['dataset'].items()))
+    header = f"{'Method':<20} {'c':>4} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'sql':>5} {'err':>4}"
+    if baseline:
+        header += f" {'Δp95':>8} {'Δops/s':>8}"
+    print(header)
+
+    for row in report['results']:
+        line = (f"{row['method']:<20} {row['concurrency']:>4} {row['ops_per_second']:>9.1f} {row['p50_ms']:>9.2f} "
+                f"{row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['sql_per_call']:>5.1f} {row['errors']:>4}")
+        old = previous.get((row['method'], row['concurrency']))
+        if old and old['p95_ms'] and old['ops_per_second']:
+            line += (f" {(row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100:>+7.1f}%"
+                     f" {(row['ops_per_second'] - old['ops_per_second']) / old['ops_per_second'] * 100:>+7.1f}%")
+        print(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the hot database manager methods")
+    parser.add_argument("--size", choices=SIZES, default="small",
+                        help="dataset preset: small 1k users/10k logs, medium 100k/1M, large 1M/10M")
+    parser.add_argument("--users", type=int, help="override the number of seeded users")
+    parser.add_argument("--request-logs", type=int, help="override the number of seeded request_logs rows")
+    parser.add_argument("--methods", default="", help="comma separated methods (default: all)")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--iterations", type=int, default=2000, help="calls per method and concurrency level")
+    parser.add_argument("--warmup", type=int, default=50, help="calls per method before measuring")
+    parser.add_argument("--database-url", default=None, help="database to seed and use (default: a temporary SQLite file)")
+    parser.add_argument("--reuse", action="store_true", help="skip seeding when the database already has users")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of a previous run to compare against")
+    parser.add_argument("--export", choices=EXPORTS, help="benchmark a streaming admin export instead of the methods")
+
+    args = parser.parse_args()
+    default_users, default_logs = SIZES[args.size]
+    args.users = args.users or default_users
+    args.request_logs = args.request_logs if args.request_logs is not None else default_logs
+    args.concurrency = [int(level) for level in args.concurrency.split(',')]
+    return args
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.database_url is None:
+            args.database_url = f"sqlite+aiosqlite:///{os.path.join(scratch, 'db_benchmark.db')}"
+        if args.export:
+            report = asyncio.run(run_export_benchmark(args))
+        else:
+            report = asyncio.run(run_benchmarks(args))
+
+    if args.export:
+        print_export_report(report)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from database import db_manager
 from locales import get_text
+from utils.metrics import metrics, RATE_LIMIT_REJECTIONS
 import config
 
 def rate_limit(service_name: str):
@@ -34,6 +35,7 @@ def rate_limit(service_name: str):
             
             # 2. If rate limit exceeded
             else:
+                metrics.counter(RATE_LIMIT_REJECTIONS, "Requests rejected by package limits", service=service_name).inc()
                 await update.message.reply_text(
                     get_text(language, "rate_limit_exceeded", used=used, limit=limit)
                 )
@@ -77,7 +79,7 @@ def admin_only(func):
         import config
         
         if user.id not in config.ADMIN_IDS:
-            await update.message.reply_text(
+            await update.effective_message.reply_text(
                 get_text(language, "admin_unauthorized")
             )
             return
@@ -0,0 +1,135 @@
+"""
+Streaming exports of users, payments and request logs for admins
+
+Rows are read page by page with keyset pagination (id > last id) and written
+straight into gzip-compressed CSV or JSONL files, so memory use does not grow
+with the table size. Files are split into parts below Telegram's upload limit.
+"""
+import asyncio
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime
+from database import db_manager
+from database.models import User, Payment, RequestLog
+import config
+
+# kind -> (model, time column used by the from/to filter, default format)
+EXPORTS = {
+    "users": (User, "created_at", "csv"),
+    "payments": (Payment, "created_at", "csv"),
+    "logs": (RequestLog, "timestamp", "jsonl")
+}
+
+FORMATS = ("csv", "jsonl")
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class ExportWriter:
+    """Writes rows into gzip parts of at most max_part_bytes compressed bytes"""
+
+    def __init__(self, directory: str, name: str, fmt: str, columns: list[str],
+                 max_part_bytes: int = config.EXPORT_MAX_PART_BYTES):
+        self.directory = directory
+        self.name = name
+        self.fmt = fmt
+        self.columns = columns
+        self.max_part_bytes = max_part_bytes
+        self.paths = []
+        self._raw = None
+        self._gzip = None
+        self._text = None
+        self._csv = None
+
+    def _open_part(self):
+        path = os.path.join(self.directory, f"{self.name}-part{len(self.paths) + 1}.{self.fmt}.gz")
+        self.paths.append(path)
+        self._raw = open(path, 'wb')
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        self._text = io.TextIOWrapper(self._gzip, encoding='utf-8', newline='')
+        if self.fmt == 'csv':
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(self.columns)
+
+    def _close_part(self):
+        if self._text:
+            self._text.close()
+            self._raw.close()
+            self._text = self._gzip = self._raw = self._csv = None
+
+    def write_rows(self, rows: list[dict]):
+        """Append a page of rows (blocking; run it in a thread)"""
+        if self._text is None:
+            self._open_part()
+
+        for row in rows:
+            if self.fmt == 'csv':
+                self._csv.writerow([
+                    json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else _plain(value)
+                    for value in (row[column] for column in self.columns)
+                ])
+            else:
+                self._text.write(json.dumps({key: _plain(value) for key, value in row.items()}, ensure_ascii=False) + "\n")
+
+        # Compressed bytes written so far (zlib keeps a small buffer)
+        self._text.flush()
+        if self._raw.tell() >= self.max_part_bytes:
+            self._close_part()
+
+    def close(self) -> list[str]:
+        self._close_part()
+        return self.paths
+
+
+async def export_table(kind: str, directory: str, start: datetime = None, end: datetime = None,
+                       fmt: str = None, progress=None, page_size: int = config.EXPORT_PAGE_SIZE) -> tuple[list[str], int]:
+    """
+    Export one table into gzip files in directory.
+    progress(rows_written) is awaited after every page.
+    Returns (file paths, rows written).
+    """
+    model, time_column, default_format = EXPORTS[kind]
+    fmt = fmt or default_format
+    columns = [column.name for column in model.__table__.columns]
+    name = f"{kind}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+    writer = ExportWriter(directory, name, fmt, columns)
+
+    rows_written = 0
+    try:
+        async for rows in db_manager.iter_table_pages(model, time_column, start, end, page_size):
+            await asyncio.to_thread(writer.write_rows, rows)
+            rows_written += len(rows)
+            if progress:
+                await progress(rows_written)
+    finally:
+        paths = writer.close()
+
+    return paths, rows_written
+
+
+class ProgressReporter:
+    """Edits a status message with the number of exported rows, at most every interval seconds"""
+
+    def __init__(self, message, kind: str, interval: float = 3.0):
+        self.message = message
+        self.kind = kind
+        self.interval = interval
+        self._last_update = time.monotonic()
+
+    async def __call__(self, rows_written: int):
+        if time.monotonic() - self._last_update < self.interval:
+            return
+        self._last_update = time.monotonic()
+        try:
+            await self.message.edit_text(f"⏳ Exporting {self.kind}: {rows_written:,} rows...")
+        except Exception:
+            # Progress is best effort (e.g. "message is not modified")
+            pass
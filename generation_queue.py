@@ -0,0 +1,246 @@
+"""
+Generation Queue - Background processing of long-running video and music jobs
+"""
+import asyncio
+import importlib
+import logging
+import os
+import socket
+from datetime import datetime
+from telegram import Update
+from telegram.ext import ContextTypes
+from database import db_manager
+from locales import get_text
+from utils.lifecycle import RequestLifecycle
+import config
+
+logger = logging.getLogger(__name__)
+
+# Localized result header for each job type
+RESULT_TEXT_KEYS = {
+    "video": "video_result",
+    "music": "voice_result"
+}
+
+# Provider of each job type as "module:attribute", imported on the first lease so
+# that jobs resumed after a restart find their provider before the service is used
+JOB_PROVIDERS = {
+    "video": "services.video_gen:VideoCreationService.run_job",
+    "music": "services.voice_music:VoiceMusicService.run_music_job"
+}
+
+
+class GenerationQueue:
+    """
+    Durable job queue backed by the generation_jobs table.
+    Handlers submit jobs and return immediately; a pool of workers leases jobs,
+    calls the provider and pushes the result to the user when it is ready.
+    """
+
+    def __init__(self, workers: int = config.JOB_WORKERS,
+                 poll_interval: float = config.JOB_POLL_INTERVAL,
+                 lease_seconds: int = config.JOB_LEASE_SECONDS):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.providers = dict(JOB_PROVIDERS)
+        self.bot = None
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._running = False
+
+    def register_provider(self, job_type: str, provider):
+        """
+        Register the coroutine that generates a result for a job type:
+        provider(payload, lifecycle) -> str, or its "module:attribute" path.
+        """
+        self.providers[job_type] = provider
+
+    def _provider(self, job_type: str):
+        """Provider of a job type, importing it on first use (None if there is none)"""
+        provider = self.providers.get(job_type)
+        if isinstance(provider, str):
+            module_name, attribute = provider.split(':')
+            provider = importlib.import_module(module_name)
+            for name in attribute.split('.'):
+                provider = getattr(provider, name)
+            self.providers[job_type] = provider
+        return provider
+
+    async def submit(self, telegram_id: int, chat_id: int, service_name: str, job_type: str, payload: dict):
+        """Persist a new job and wake up an idle worker"""
+        job = await db_manager.enqueue_job(telegram_id, chat_id, service_name, job_type, payload)
+        if job:
+            self._wakeup.set()
+        return job
+
+    async def start(self, bot):
+        """Start the worker pool. Jobs leased by a previous (crashed) process are resumed once their lease expires."""
+        if self._running:
+            return
+
+        self.bot = bot
+        self._running = True
+
+        await self._fail_exhausted_jobs()
+
+        worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{worker_prefix}:{index}"))
+            for index in range(self.workers)
+        ]
+        logger.info(f"Generation queue started with {self.workers} workers")
+
+    async def stop(self):
+        """Stop the worker pool. Unfinished jobs keep their lease and are retried after restart."""
+        self._running = False
+        self._wakeup.set()
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Generation queue stopped")
+
+    async def _worker(self, worker_id: str):
+        """Lease and process jobs until the pool is stopped"""
+        while self._running:
+            try:
+                job = await db_manager.lease_next_job(worker_id, self.lease_seconds)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed to lease a job: {e}")
+                job = None
+
+            if job is None:
+                await self._wait_for_work()
+                continue
+
+            try:
+                await self._process(job, worker_id)
+            except Exception as e:
+                # Keep the worker alive; the job is retried once its lease expires
+                logger.error(f"Worker {worker_id} failed processing job {job.id}: {e}")
+
+    async def _wait_for_work(self):
+        """Sleep until a new job is submitted or the poll interval elapses"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            await self._fail_exhausted_jobs()
+        self._wakeup.clear()
+
+    async def _process(self, job, worker_id: str):
+        """Run the provider for a leased job while keeping its lease alive"""
+        request_data = {**job.payload, "job_id": job.id, "attempt": job.attempts}
+        heartbeat = None
+        result = None
+        try:
+            # May import the service; a bad provider path fails the job like a provider error
+            provider = self._provider(job.job_type)
+            if provider is None:
+                raise LookupError(f"Unknown job type: {job.job_type}")
+
+            heartbeat = asyncio.create_task(self._heartbeat(job.id, worker_id))
+            # Each attempt is timed and logged to RequestLog with its real final status
+            async with RequestLifecycle(job.payload['telegram_id'], job.service_name, request_data) as lifecycle:
+                lifecycle.extra["queue_delay_ms"] = round((datetime.utcnow() - job.created_at).total_seconds() * 1000)
+                if job.result is not None:
+                    # An earlier attempt generated the result but could not deliver it
+                    result = job.result
+                    lifecycle.extra["redelivery"] = True
+                else:
+                    result = await provider(job.payload, lifecycle)
+
+                if not await db_manager.extend_job_lease(job.id, worker_id, self.lease_seconds):
+                    logger.warning(f"Job {job.id} lease was lost before delivery, result discarded")
+                    return
+
+                # Delivered before the job is marked done, so a failed delivery is retried
+                await lifecycle.send(self._deliver(job, result))
+                if not await db_manager.complete_job(job.id, worker_id, result):
+                    logger.warning(f"Job {job.id} lease was lost during delivery")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job {job.id} attempt {job.attempts} failed: {e}")
+            status = await db_manager.fail_job(job.id, worker_id, str(e), result)
+            if status == 'failed':
+                await self._notify_failed(job)
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: int, worker_id: str):
+        """Periodically extend the lease of a running job"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await db_manager.extend_job_lease(job_id, worker_id, self.lease_seconds)
+            except Exception as e:
+                # Keep beating: the next extension can still renew the lease in time
+                logger.error(f"Failed to extend the lease of job {job_id}: {e}")
+
+    async def _deliver(self, job, result: str):
+        """Push a finished result to the user"""
+        language = job.payload.get('language', 'uz')
+        header = get_text(language, RESULT_TEXT_KEYS.get(job.job_type, "success"))
+        await self.bot.send_message(
+            chat_id=job.chat_id,
+            text=header + f"\n\n{result}"
+        )
+
+    async def _notify_failed(self, job):
+        """Tell the user that a job could not be completed"""
+        language = job.payload.get('language', 'uz')
+        try:
+            await self.bot.send_message(
+                chat_id=job.chat_id,
+                text=get_text(language, "job_failed", job_id=job.id)
+            )
+        except Exception as e:
+            logger.error(f"Failed to notify user about failed job {job.id}: {e}")
+
+    async def _fail_exhausted_jobs(self):
+        """Fail jobs whose last attempt was abandoned and notify their owners"""
+        try:
+            jobs = await db_manager.fail_exhausted_jobs()
+        except Exception as e:
+            logger.error(f"Failed to check exhausted jobs: {e}")
+            return
+
+        for job in jobs:
+            logger.warning(f"Job {job.id} failed after {job.attempts} attempts")
+            await self._notify_failed(job)
+
+
+class JobService:
+    """User-facing commands for background jobs"""
+
+    @staticmethod
+    async def list_jobs(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show the status of the user's recent generation jobs"""
+        user = update.effective_user
+        language = await db_manager.get_user_language(user.id)
+
+        jobs = await db_manager.get_user_jobs(user.id)
+
+        if not jobs:
+            await update.message.reply_text(get_text(language, "jobs_empty"))
+            return
+
+        jobs_text = get_text(language, "jobs_header") + "\n\n"
+        for job in jobs:
+            jobs_text += get_text(
+                language,
+                "job_status_line",
+                job_id=job.id,
+                service=job.service_name.replace('_', ' ').title(),
+                status=get_text(language, f"job_status_{job.status}"),
+                created_at=job.created_at.strftime("%Y-%m-%d %H:%M")
+            ) + "\n"
+
+        await update.message.reply_text(jobs_text)
+
+
+# Global generation queue instance
+generation_queue = GenerationQueue()
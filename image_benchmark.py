@@ -0,0 +1,136 @@
+"""
+Image pipeline benchmark - images/second with 1 vs N worker processes
+
+Synthetic generator output (noisy PNGs, like diffusion models return) is
+pushed through utils.image_pipeline in albums of --album images, as the image
+service does, with --concurrency albums in flight. Workers 0 runs
+process_image inline on the event loop for comparison; the max event loop lag
+shows how long other updates would have been stalled.
+
+Usage:
+    python image_benchmark.py --workers 0,1,4 --images 200
+    python image_benchmark.py --workers 1,8 --source-size 1792x1024 --size 1024x1024 --watermark
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+from PIL import Image
+
+from utils.image_pipeline import ImagePipeline, parse_size, process_image
+import config
+
+
+def synthetic_images(count: int, size: tuple[int, int], variants: int = 8) -> list[bytes]:
+    """PNG encoded noise over a gradient; a few variants are reused to keep setup fast"""
+    encoded = []
+    for seed in range(min(count, variants)):
+        noise = Image.effect_noise(size, 40 + seed * 5).convert('RGB')
+        gradient = Image.linear_gradient('L').resize(size).convert('RGB')
+        buffer = io.BytesIO()
+        Image.blend(noise, gradient, 0.5).save(buffer, 'PNG')
+        encoded.append(buffer.getvalue())
+    return [encoded[index % len(encoded)] for index in range(count)]
+
+
+async def _watch_loop_lag(lags: list[float], interval: float = 0.005):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run_level(workers: int, images: list[bytes], size: str, watermark: str | None,
+                    album: int, concurrency: int) -> dict:
+    pipeline = ImagePipeline(workers) if workers else None
+    if pipeline:
+        await pipeline.start()
+
+    albums = [images[index:index + album] for index in range(0, len(images), album)]
+    semaphore = asyncio.Semaphore(concurrency)
+    album_times = []
+    output_bytes = 0
+
+    async def handle(batch: list[bytes]):
+        nonlocal output_bytes
+        async with semaphore:
+            started = time.perf_counter()
+            if pipeline:
+                processed = await pipeline.process(batch, size, watermark)
+            else:
+                processed = [process_image(data, parse_size(size), watermark) for data in batch]
+            album_times.append(time.perf_counter() - started)
+            output_bytes += sum(len(image.data) for image in processed)
+
+    lags = []
+    watcher = asyncio.create_task(_watch_loop_lag(lags))
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(handle(batch) for batch in albums))
+    finally:
+        duration = time.perf_counter() - started
+        # Let the watcher observe a stall that lasted until the end
+        await asyncio.sleep(0.02)
+        watcher.cancel()
+        if pipeline:
+            pipeline.shutdown()
+
+    album_times.sort()
+    return {
+        "workers": workers,
+        "images": len(images),
+        "duration_s": round(duration, 3),
+        "images_per_s": round(len(images) / duration, 1),
+        "album_p50_ms": round(album_times[len(album_times) // 2] * 1000, 1),
+        "album_max_ms": round(album_times[-1] * 1000, 1),
+        "max_loop_lag_ms": round(max(lags, default=0) * 1000, 1),
+        "avg_output_kb": round(output_bytes / len(images) / 1024, 1)
+    }
+
+
+def print_report(results: list[dict]):
+    baseline = next((result for result in results if result["workers"] == 1), results[0])
+    print(f"{'workers':>8} {'img/s':>8} {'speedup':>8} {'album p50':>10} {'album max':>10} {'loop lag':>9} {'avg out':>8}")
+    for result in results:
+        speedup = result["images_per_s"] / baseline["images_per_s"]
+        label = "inline" if result["workers"] == 0 else str(result["workers"])
+        print(
+            f"{label:>8} {result['images_per_s']:>8} {speedup:>7.2f}x {result['album_p50_ms']:>8}ms "
+            f"{result['album_max_ms']:>8}ms {result['max_loop_lag_ms']:>7}ms {result['avg_output_kb']:>6}KB"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the image post-processing pipeline")
+    parser.add_argument("--workers", default=f"0,1,{os.cpu_count() or 2}",
+                        help="comma separated worker counts; 0 processes inline on the event loop")
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--album", type=int, default=4, help="images per request")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    parser.add_argument("--source-size", default="1024x1024", help="size of the generated images")
+    parser.add_argument("--size", default="1024x1792", help="requested size the images are fitted to")
+    parser.add_argument("--watermark", action="store_true", help="stamp the free package watermark")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    images = synthetic_images(args.images, parse_size(args.source_size))
+    watermark = config.IMAGE_WATERMARK_TEXT if args.watermark else None
+
+    results = []
+    for workers in (int(level) for level in args.workers.split(',')):
+        results.append(asyncio.run(run_level(workers, images, args.size, watermark, args.album, args.concurrency)))
+
+    print_report(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,10 +8,14 @@ from locales import get_text
 from utils.keyboards import (get_main_menu_keyboard, get_image_size_keyboard,
                              get_image_style_keyboard, get_image_quantity_keyboard)
 from utils.decorators import rate_limit 
+from utils.providers import ProviderUnavailable
+from utils.lifecycle import RequestLifecycle
+from utils.image_pipeline import image_pipeline
+from utils.media_store import media_store
 import config
 
-# Conversation states
-ENTERING_PROMPT, SELECTING_SIZE, SELECTING_STYLE, SELECTING_QUANTITY = range(4)
+# Conversation states (defined in services.states)
+from services.states import ENTERING_PROMPT, SELECTING_SIZE, IMAGE_STYLE as SELECTING_STYLE, SELECTING_QUANTITY
 
 class ImageGenerationService:
     """Image generation service"""
@@ -130,32 +134,40 @@ class ImageGenerationService:
         size = context.user_data.get('image_size', '')
         style = context.user_data.get('image_style', '')
         
-        # Show processing message
-        await update.message.reply_text(get_text(language, "image_processing"))
-        
-        # Log request
-        await db_manager.log_request(
-            user.id,
-            "image_generation",
-            {
-                "prompt": prompt,
-                "size": size,
-                "style": style,
-                "quantity": quantity
-            },
-            "success"
-        )
-        
-        # AI API integration point
-        image_result = await ImageGenerationService.integrate_ai_api(
-            prompt, size, style, quantity, language
-        )
-        
-        # Send result message
-        await update.message.reply_text(
-            get_text(language, "image_result") + f"\n\n{image_result}",
-            reply_markup=get_main_menu_keyboard(language)
-        )
+        request_data = {
+            "prompt": prompt,
+            "size": size,
+            "style": style,
+            "quantity": quantity
+        }
+        
+        try:
+            # Timed and logged to RequestLog with the real final status
+            async with RequestLifecycle(user.id, "image_generation", request_data) as lifecycle:
+                # Show processing message
+                await lifecycle.send(update.message.reply_text(get_text(language, "image_processing")))
+                
+                # AI API integration point
+                image_result = await lifecycle.call_provider(
+                    ImageGenerationService.integrate_ai_api,
+                    prompt, size, style, quantity, language
+                )
+                
+                if isinstance(image_result, list):
+                    await ImageGenerationService.send_images(update, lifecycle, image_result, size, language)
+                else:
+                    # Send result message
+                    await lifecycle.send(update.message.reply_text(
+                        get_text(language, "image_result") + f"\n\n{image_result}",
+                        reply_markup=get_main_menu_keyboard(language)
+                    ))
+        except ProviderUnavailable:
+            await update.message.reply_text(
+                get_text(language, "service_unavailable"),
+                reply_markup=get_main_menu_keyboard(language)
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
         
         # Clear context data
         context.user_data.clear()
@@ -163,9 +175,48 @@ class ImageGenerationService:
         return ConversationHandler.END
     
     @staticmethod
-    async def integrate_ai_api(prompt: str, size: str, style: str, quantity: str, language: str) -> str:
+    async def send_images(update: Update, lifecycle: RequestLifecycle, images: list[bytes], size: str, language: str):
+        """
+        Post-process generated images and send them as one album.
+        Free packages get watermarked photos; paid packages get the full quality
+        files as documents (Telegram does not recompress those) with thumbnails.
+        """
+        package_key = await db_manager.get_user_package_key(update.effective_user.id)
+        is_free = config.PREMIUM_PACKAGES.get(package_key, {}).get("is_free", True)
+        processed = await image_pipeline.process(
+            images, size, watermark=config.IMAGE_WATERMARK_TEXT if is_free else None
+        )
+
+        # The caption of the first item is shown under the album
+        caption = get_text(language, "image_result")
+        media_type = "photo" if is_free else "document"
+        items = []
+        for number, image in enumerate(processed, 1):
+            arguments = {"caption": caption if number == 1 else None}
+            if not is_free:
+                arguments.update(filename=f"image_{number}.jpg", thumbnail=image.thumbnail)
+            items.append((media_type, image.data, arguments))
+
+        # Identical images (e.g. re-sent results) go out by file_id without uploading them again
+        if len(items) == 1:
+            send = update.message.reply_photo if is_free else update.message.reply_document
+            _, data, arguments = items[0]
+            await lifecycle.send(media_store.send(send, data, media_type, **arguments))
+        else:
+            await lifecycle.send(media_store.send_group(update.message.reply_media_group, items))
+
+        # Albums cannot carry a reply keyboard
+        await lifecycle.send(update.message.reply_text(
+            get_text(language, "main_menu"),
+            reply_markup=get_main_menu_keyboard(language)
+        ))
+
+    @staticmethod
+    async def integrate_ai_api(prompt: str, size: str, style: str, quantity: str, language: str) -> str | list[bytes]:
         """
-        AI API integration point for image generation
+        AI API integration point for image generation.
+        Return the generated images as a list of encoded bytes (PNG, JPEG, WebP)
+        to deliver them through the image pipeline, or text to send as is.
         """
         # Placeholder result
         return f"[Image Generation Placeholder]\n\nPrompt: {prompt}\nSize: {size}\nStyle: {style}\nQuantity: {quantity}\n\n[Add API integration here to generate actual images]"
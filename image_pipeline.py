@@ -0,0 +1,145 @@
+"""
+Image post-processing pipeline - resize, watermark, thumbnail and re-encode generated images
+
+Pillow work is CPU-bound, so it runs in a process pool instead of the event
+loop. Image bytes go to the workers as plain bytes objects: pickling them is a
+single copy, the worker decodes straight from that buffer (BytesIO shares a
+bytes object instead of copying it) and only the encoded results come back.
+"""
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProcessedImage:
+    """Encoded image and thumbnail ready to send"""
+    data: bytes
+    thumbnail: bytes
+    width: int
+    height: int
+    format: str
+
+
+def parse_size(size: str) -> tuple[int, int] | None:
+    """'1024x1792' -> (1024, 1792); None for anything else (keep the generated size)"""
+    try:
+        width, height = (int(part) for part in size.lower().split('x'))
+    except (AttributeError, ValueError):
+        return None
+    return width, height
+
+
+def _watermark(image: Image.Image, text: str) -> Image.Image:
+    """Semi-transparent text in the bottom right corner, scaled to the image"""
+    overlay = Image.new('RGBA', image.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    font = ImageFont.load_default()
+
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    text_size = (right - left, bottom - top)
+    # Render small, then scale to ~1/4 of the image width
+    label = Image.new('RGBA', (text_size[0] + 8, text_size[1] + 8), (0, 0, 0, 0))
+    label_draw = ImageDraw.Draw(label)
+    # Dark shadow keeps the text readable on light images
+    label_draw.text((5 - left, 5 - top), text, font=font, fill=(0, 0, 0, 110))
+    label_draw.text((4 - left, 4 - top), text, font=font, fill=(255, 255, 255, 160))
+    scale = max(1, image.width // 4 // label.width)
+    label = label.resize((label.width * scale, label.height * scale), Image.Resampling.NEAREST)
+
+    margin = max(4, image.width // 50)
+    overlay.paste(label, (image.width - label.width - margin, image.height - label.height - margin), label)
+    return Image.alpha_composite(image.convert('RGBA'), overlay).convert('RGB')
+
+
+def _encode(image: Image.Image, image_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        image.save(buffer, 'JPEG', quality=quality, progressive=True)
+    else:
+        image.save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def process_image(data: bytes, size: tuple[int, int] | None = None, watermark: str | None = None,
+                  image_format: str = 'JPEG', quality: int = config.IMAGE_JPEG_QUALITY,
+                  thumbnail_size: int = config.IMAGE_THUMBNAIL_SIZE) -> ProcessedImage:
+    """Decode, resize (cover + center crop), watermark and re-encode one image (runs in a worker)"""
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+    if size and image.size != size:
+        image = ImageOps.fit(image, size, Image.Resampling.LANCZOS)
+    if watermark:
+        image = _watermark(image, watermark)
+
+    thumbnail = image.copy()
+    thumbnail.thumbnail((thumbnail_size, thumbnail_size), Image.Resampling.BILINEAR)
+
+    return ProcessedImage(
+        data=_encode(image, image_format, quality),
+        thumbnail=_encode(thumbnail, 'JPEG', 80),
+        width=image.width,
+        height=image.height,
+        format=image_format
+    )
+
+
+class ImagePipeline:
+    """Runs process_image on a lazily started process pool"""
+
+    def __init__(self, workers: int = config.IMAGE_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._warmup = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process with running event loop and database threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    async def start(self):
+        """Start the worker processes up front, so the first images do not wait for them to spawn"""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool(), parse_size, "1x1") for _ in range(self.workers)))
+
+    def start_background(self):
+        """Start the worker processes without waiting for them (e.g. while the bot starts polling)"""
+        self._warmup = asyncio.ensure_future(self.start())
+        self._warmup.add_done_callback(self._warmup_done)
+
+    @staticmethod
+    def _warmup_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Image worker processes failed to start: {task.exception()}")
+
+    async def process(self, images: list[bytes], size: str = None, watermark: str | None = None,
+                      image_format: str = 'JPEG') -> list[ProcessedImage]:
+        """Process images in parallel; the result order matches the input"""
+        loop = asyncio.get_running_loop()
+        target = parse_size(size) if size else None
+        return await asyncio.gather(*(
+            loop.run_in_executor(self._pool(), process_image, data, target, watermark, image_format)
+            for data in images
+        ))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+# Global image pipeline
+image_pipeline = ImagePipeline()
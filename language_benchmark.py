@@ -0,0 +1,156 @@
+"""
+Language detection benchmark - accuracy and throughput on a sample corpus
+
+The corpus below is separate from the detector's training samples: everyday
+messages, short phrases and product texts in the six translation languages,
+with Uzbek in both Latin and Cyrillic script. Reports accuracy per language,
+how often the source step would be skipped at the confidence threshold (and
+how accurate those skips are), and detections per second for short and long
+inputs.
+
+Usage:
+    python language_benchmark.py
+    python language_benchmark.py --threshold 0.9 --iterations 20000
+"""
+import argparse
+import json
+import time
+
+from utils.language_detect import MAX_SCORED_CHARS, detect
+import config
+
+CORPUS = [
+    ("en", "Can you help me translate this letter for my new employer?"),
+    ("en", "The package arrived yesterday but the box was damaged."),
+    ("en", "Good morning"),
+    ("en", "I forgot my password and cannot log in to my account."),
+    ("en", "Our new collection of winter jackets is now available in all stores."),
+    ("en", "How long does it take to get to the airport by taxi?"),
+    ("en", "Happy birthday! Wishing you all the best."),
+    ("en", "The meeting has been moved to next Monday at ten o'clock."),
+    ("en", "Please call me back when you have a minute."),
+    ("en", "This laptop has a fast processor, a light body and a battery that lasts all day."),
+    ("uz", "Ertaga soat nechada uchrashamiz?"),
+    ("uz", "Men bu kitobni do'konda topa olmadim."),
+    ("uz", "Salom, yaxshimisiz?"),
+    ("uz", "Buyurtmangiz ikki kun ichida yetkazib beriladi."),
+    ("uz", "Bizning yangi qishki kurtkalar to'plamimiz barcha do'konlarda mavjud."),
+    ("uz", "Aeroportgacha taksida qancha vaqt ketadi?"),
+    ("uz", "Tug'ilgan kuningiz bilan! Sizga eng yaxshi tilaklarimni bildiraman."),
+    ("uz", "Parolimni unutib qo'ydim va hisobimga kira olmayapman."),
+    ("uz", "Iltimos, bo'sh vaqtingiz bo'lganda menga qo'ng'iroq qiling."),
+    ("uz", "Bu noutbukning protsessori tez, o‘zi yengil va batareyasi kun bo‘yi yetadi."),
+    ("uz", "Эртага соат нечада учрашамиз?"),
+    ("uz", "Буюртмангиз икки кун ичида етказиб берилади."),
+    ("uz", "Паролимни унутиб қўйдим ва ҳисобимга кира олмаяпман."),
+    ("uz", "Туғилган кунингиз билан! Сизга энг яхши тилакларимни билдираман."),
+    ("uz", "Илтимос, бўш вақтингиз бўлганда менга қўнғироқ қилинг."),
+    ("tr", "Yarın saat kaçta buluşalım?"),
+    ("tr", "Bu kitabı mağazada bulamadım."),
+    ("tr", "Merhaba, nasılsın?"),
+    ("tr", "Siparişiniz iki gün içinde teslim edilecektir."),
+    ("tr", "Yeni kış mont koleksiyonumuz tüm mağazalarda satışta."),
+    ("tr", "Havalimanına taksiyle gitmek ne kadar sürer?"),
+    ("tr", "Doğum günün kutlu olsun! Sana en iyi dileklerimi gönderiyorum."),
+    ("tr", "Şifremi unuttum ve hesabıma giriş yapamıyorum."),
+    ("tr", "Lütfen bir dakikan olduğunda beni geri ara."),
+    ("tr", "Bu dizüstü bilgisayarın hızlı bir işlemcisi ve gün boyu dayanan bir pili var."),
+    ("ru", "Во сколько мы завтра встречаемся?"),
+    ("ru", "Я не смог найти эту книгу в магазине."),
+    ("ru", "Привет, как дела?"),
+    ("ru", "Ваш заказ будет доставлен в течение двух дней."),
+    ("ru", "Наша новая коллекция зимних курток уже доступна во всех магазинах."),
+    ("ru", "Сколько времени ехать до аэропорта на такси?"),
+    ("ru", "С днём рождения! Желаю всего самого лучшего."),
+    ("ru", "Я забыл пароль и не могу войти в свой аккаунт."),
+    ("ru", "Пожалуйста, перезвоните мне, когда будет минутка."),
+    ("ru", "У этого ноутбука быстрый процессор, лёгкий корпус и батарея на весь день."),
+    ("zh", "我们明天几点见面？"),
+    ("zh", "我在商店里找不到这本书。"),
+    ("zh", "你好"),
+    ("zh", "您的订单将在两天内送达。"),
+    ("zh", "我们的新款冬季夹克现已在所有商店有售。"),
+    ("zh", "这台笔记本电脑的处理器很快，机身很轻，电池可以用一整天。"),
+    ("ar", "في أي ساعة سنلتقي غدا؟"),
+    ("ar", "لم أتمكن من العثور على هذا الكتاب في المتجر."),
+    ("ar", "مرحبا، كيف حالك؟"),
+    ("ar", "سيتم توصيل طلبك خلال يومين."),
+    ("ar", "مجموعتنا الجديدة من السترات الشتوية متوفرة الآن في جميع المتاجر."),
+    ("ar", "هذا الحاسوب المحمول لديه معالج سريع وبطارية تدوم طوال اليوم."),
+]
+
+
+def evaluate(threshold: float, candidates: list[str]) -> dict:
+    per_language = {}
+    skipped = 0
+    skipped_correct = 0
+    mistakes = []
+    for code, text in CORPUS:
+        detection = detect(text, candidates)
+        correct = detection is not None and detection.code == code
+        stats = per_language.setdefault(code, {"samples": 0, "correct": 0, "confidence": 0.0})
+        stats["samples"] += 1
+        stats["correct"] += correct
+        stats["confidence"] += detection.confidence if detection else 0.0
+        if detection and detection.confidence >= threshold:
+            skipped += 1
+            skipped_correct += correct
+        if not correct:
+            mistakes.append({"text": text, "expected": code, "detected": detection.code if detection else None,
+                             "confidence": detection.confidence if detection else None})
+
+    samples = len(CORPUS)
+    return {
+        "samples": samples,
+        "accuracy": round(sum(stats["correct"] for stats in per_language.values()) / samples, 3),
+        "per_language": {
+            code: {"accuracy": round(stats["correct"] / stats["samples"], 3),
+                   "mean_confidence": round(stats["confidence"] / stats["samples"], 3)}
+            for code, stats in per_language.items()
+        },
+        "threshold": threshold,
+        "skip_rate": round(skipped / samples, 3),
+        "skip_accuracy": round(skipped_correct / skipped, 3) if skipped else None,
+        "mistakes": mistakes
+    }
+
+
+def throughput(texts: list[str], iterations: int, candidates: list[str]) -> float:
+    started = time.perf_counter()
+    for index in range(iterations):
+        detect(texts[index % len(texts)], candidates)
+    return iterations / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline language detector")
+    parser.add_argument("--threshold", type=float, default=config.LANGUAGE_DETECT_MIN_CONFIDENCE)
+    parser.add_argument("--iterations", type=int, default=10000, help="detections per throughput measurement")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+
+    candidates = config.SERVICE_PARAMS["translation"]["languages"]
+    report = evaluate(args.threshold, candidates)
+    short_texts = [text for _, text in CORPUS if len(text) <= 40]
+    long_texts = [" ".join(text for code, text in CORPUS if code == language) for language in ("en", "uz", "tr", "ru")]
+    report["short_per_s"] = round(throughput(short_texts, args.iterations, candidates))
+    report["long_per_s"] = round(throughput(long_texts, args.iterations, candidates))
+
+    print(f"{report['samples']} samples, accuracy {report['accuracy']:.1%}")
+    for code, stats in report["per_language"].items():
+        print(f"  {code}: accuracy {stats['accuracy']:.1%}, mean confidence {stats['mean_confidence']:.2f}")
+    print(
+        f"Confidence >= {args.threshold}: source step skipped for {report['skip_rate']:.1%} of texts, "
+        f"{report['skip_accuracy'] or 0:.1%} of those correct"
+    )
+    for mistake in report["mistakes"]:
+        print(f"  wrong: {mistake['text'][:50]!r} -> {mistake['detected']} ({mistake['confidence']}), expected {mistake['expected']}")
+    print(f"Throughput: {report['short_per_s']:,} short texts/s, {report['long_per_s']:,} long texts/s (≤{MAX_SCORED_CHARS} chars scored)")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
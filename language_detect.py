@@ -0,0 +1,225 @@
+"""
+Language detection - offline identification of the translation source language
+
+The script of the letters (Latin, Cyrillic, Arabic, Han) narrows the text down
+to the languages written in it; a character trigram model trained on the
+built-in samples decides among those. The model is built at import into one
+trigram index and a compact float array of log-probabilities per language,
+so detecting a message costs a few hundred dict lookups.
+"""
+import math
+import re
+import unicodedata
+from array import array
+from dataclasses import dataclass
+
+# Code -> name used in config.SERVICE_PARAMS["translation"]["languages"]
+LANGUAGE_NAMES = {
+    "uz": "Uzbek",
+    "ru": "Russian",
+    "en": "English",
+    "tr": "Turkish",
+    "zh": "Chinese",
+    "ar": "Arabic"
+}
+
+# Languages written in each script; single-language scripts need no model
+SCRIPT_LANGUAGES = {
+    "latin": ("en", "uz", "tr"),
+    "cyrillic": ("ru", "uz"),
+    "arabic": ("ar",),
+    "han": ("zh",)
+}
+
+# Texts up to this many letters get proportionally less confident results
+FULL_CONFIDENCE_LETTERS = 40
+# Scale of per-trigram log-likelihood differences before the softmax
+CONFIDENCE_SHARPNESS = 10.0
+# Only the start of long texts is scored
+MAX_SCORED_CHARS = 600
+
+TRAINING_TEXTS = {
+    ("en", "latin"): """
+        The weather was cold this morning, so we stayed at home and watched a film together.
+        Please send me the documents before the meeting on Thursday afternoon.
+        Our company offers fast delivery and a friendly service for every customer in the city.
+        I would like to know how much this phone costs and whether it comes with a warranty.
+        Thank you very much for your help, I really appreciate everything you have done.
+        She has been working as a teacher for many years and her students love her lessons.
+        What time does the train leave, and where can I buy the tickets?
+        This product is made of high quality materials and it will last for a long time.
+        They decided to open a small restaurant near the river where the view is beautiful.
+        If you have any questions, do not hesitate to contact our support team.
+        The children played in the garden while their parents prepared dinner in the kitchen.
+        We should think about the future and make the right decisions today.
+        Reading books every evening helps me relax and learn something new.
+    """,
+    ("uz", "latin"): """
+        Bugun ertalab havo juda sovuq edi, shuning uchun biz uyda qolib birga film ko'rdik.
+        Iltimos, hujjatlarni payshanba kuni tushdan keyingi uchrashuvdan oldin yuboring.
+        Kompaniyamiz shahardagi har bir mijoz uchun tez yetkazib berish va qulay xizmat taklif qiladi.
+        Bu telefon qancha turishini va kafolati bor yoki yo'qligini bilmoqchi edim.
+        Yordamingiz uchun katta rahmat, qilgan barcha ishlaringizni juda qadrlayman.
+        U ko'p yillardan beri o'qituvchi bo'lib ishlaydi va o'quvchilari uning darslarini yaxshi ko'radi.
+        Poyezd soat nechada jo'naydi va chiptalarni qayerdan sotib olsam bo'ladi?
+        Bu mahsulot yuqori sifatli materiallardan tayyorlangan va uzoq vaqt xizmat qiladi.
+        Ular daryo bo'yida, manzarasi chiroyli joyda kichik oshxona ochishga qaror qilishdi.
+        Savollaringiz bo'lsa, qo'llab-quvvatlash xizmatimizga bemalol murojaat qiling.
+        Bolalar bog'da o'ynashdi, ota-onalari esa oshxonada kechki ovqat tayyorlashdi.
+        Kelajak haqida o'ylashimiz va bugun to'g'ri qarorlar qabul qilishimiz kerak.
+        Har kuni kechqurun kitob o'qish menga dam olishga va yangi narsalarni o'rganishga yordam beradi.
+        Assalomu alaykum, qalaysiz? Ishlaringiz yaxshimi? G'alaba bizniki bo'ladi.
+    """,
+    ("tr", "latin"): """
+        Bu sabah hava çok soğuktu, bu yüzden evde kalıp birlikte film izledik.
+        Lütfen belgeleri perşembe öğleden sonraki toplantıdan önce bana gönderin.
+        Şirketimiz şehirdeki her müşteriye hızlı teslimat ve güler yüzlü hizmet sunuyor.
+        Bu telefonun ne kadar olduğunu ve garantisinin olup olmadığını öğrenmek istiyorum.
+        Yardımınız için çok teşekkür ederim, yaptığınız her şeyi gerçekten takdir ediyorum.
+        Yıllardır öğretmen olarak çalışıyor ve öğrencileri onun derslerini çok seviyor.
+        Tren saat kaçta kalkıyor ve biletleri nereden satın alabilirim?
+        Bu ürün yüksek kaliteli malzemelerden yapılmıştır ve uzun süre dayanır.
+        Manzaranın güzel olduğu nehrin yakınında küçük bir restoran açmaya karar verdiler.
+        Herhangi bir sorunuz varsa destek ekibimizle iletişime geçmekten çekinmeyin.
+        Çocuklar bahçede oynarken anne ve babaları mutfakta akşam yemeği hazırladı.
+        Geleceği düşünmeli ve bugün doğru kararlar vermeliyiz.
+        Her akşam kitap okumak rahatlamama ve yeni şeyler öğrenmeme yardımcı oluyor.
+        Merhaba, nasılsınız? Görüşmek üzere, iyi günler dilerim.
+    """,
+    ("ru", "cyrillic"): """
+        Сегодня утром было очень холодно, поэтому мы остались дома и вместе посмотрели фильм.
+        Пожалуйста, пришлите мне документы до встречи в четверг после обеда.
+        Наша компания предлагает быструю доставку и удобный сервис для каждого клиента в городе.
+        Я хотел бы узнать, сколько стоит этот телефон и есть ли на него гарантия.
+        Большое спасибо за вашу помощь, я очень ценю всё, что вы сделали.
+        Она много лет работает учителем, и ученики очень любят её уроки.
+        Во сколько отправляется поезд и где можно купить билеты?
+        Этот продукт сделан из качественных материалов и прослужит очень долго.
+        Они решили открыть небольшой ресторан у реки, где красивый вид.
+        Если у вас есть вопросы, без колебаний обращайтесь в нашу службу поддержки.
+        Дети играли в саду, пока родители готовили ужин на кухне.
+        Нам нужно думать о будущем и принимать правильные решения уже сегодня.
+        Чтение книг каждый вечер помогает мне отдохнуть и узнать что-то новое.
+        Здравствуйте, как ваши дела? Всего хорошего и до свидания.
+    """,
+    ("uz", "cyrillic"): """
+        Бугун эрталаб ҳаво жуда совуқ эди, шунинг учун биз уйда қолиб бирга фильм кўрдик.
+        Илтимос, ҳужжатларни пайшанба куни тушдан кейинги учрашувдан олдин юборинг.
+        Компаниямиз шаҳардаги ҳар бир мижоз учун тез етказиб бериш ва қулай хизмат таклиф қилади.
+        Бу телефон қанча туришини ва кафолати бор ёки йўқлигини билмоқчи эдим.
+        Ёрдамингиз учун катта раҳмат, қилган барча ишларингизни жуда қадрлайман.
+        У кўп йиллардан бери ўқитувчи бўлиб ишлайди ва ўқувчилари унинг дарсларини яхши кўради.
+        Поезд соат нечада жўнайди ва чипталарни қаердан сотиб олсам бўлади?
+        Бу маҳсулот юқори сифатли материаллардан тайёрланган ва узоқ вақт хизмат қилади.
+        Улар дарё бўйида, манзараси чиройли жойда кичик ошхона очишга қарор қилишди.
+        Саволларингиз бўлса, қўллаб-қувватлаш хизматимизга бемалол мурожаат қилинг.
+        Болалар боғда ўйнашди, ота-оналари эса ошхонада кечки овқат тайёрлашди.
+        Келажак ҳақида ўйлашимиз ва бугун тўғри қарорлар қабул қилишимиз керак.
+        Ассалому алайкум, қалайсиз? Ишларингиз яхшими? Ғалаба бизники бўлади.
+    """
+}
+
+# Uzbek Latin writes o‘ and g‘ with several apostrophe look-alikes
+APOSTROPHES = str.maketrans({"‘": "'", "’": "'", "ʻ": "'", "ʼ": "'", "`": "'"})
+NON_LETTERS = re.compile(r"[^\w']+|[\d_]+")
+
+
+@dataclass
+class Detection:
+    code: str
+    language: str  # name as in the translation keyboard
+    confidence: float  # 0..1
+    script: str
+
+
+def script_of(char: str) -> str | None:
+    """Script of a letter, None for anything else"""
+    code = ord(char)
+    if code < 0x250:
+        return "latin" if char.isalpha() else None
+    if 0x400 <= code <= 0x52F:
+        return "cyrillic"
+    if 0x600 <= code <= 0x6FF or 0x750 <= code <= 0x77F or 0xFB50 <= code <= 0xFDFF or 0xFE70 <= code <= 0xFEFF:
+        return "arabic"
+    if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF or 0xF900 <= code <= 0xFAFF:
+        return "han"
+    return None
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize('NFC', text).lower().translate(APOSTROPHES)
+    return " " + " ".join(NON_LETTERS.sub(" ", text).split()) + " "
+
+
+def _trigrams(normalized: str) -> list[str]:
+    return [normalized[index:index + 3] for index in range(len(normalized) - 2)]
+
+
+def _build_models():
+    """Trigram index shared by all models and one array of log-probabilities per (language, script)"""
+    counts = {}
+    index = {}
+    for key, text in TRAINING_TEXTS.items():
+        model_counts = counts[key] = {}
+        for trigram in _trigrams(_normalize(text)):
+            model_counts[trigram] = model_counts.get(trigram, 0) + 1
+            index.setdefault(trigram, len(index))
+
+    models = {}
+    for key, model_counts in counts.items():
+        # Add-one smoothing; trigrams the model never saw get the unseen probability
+        total = sum(model_counts.values()) + len(model_counts) + 1
+        unseen = math.log(1 / total)
+        log_probs = array('f', [unseen]) * len(index)
+        for trigram, count in model_counts.items():
+            log_probs[index[trigram]] = math.log((count + 1) / total)
+        models[key] = (log_probs, unseen)
+    return index, models
+
+
+_TRIGRAM_INDEX, _MODELS = _build_models()
+
+
+def detect(text: str, candidates: list[str] = None) -> Detection | None:
+    """
+    Most likely language of text, or None if it has no letters.
+    candidates (language names) restricts the result, e.g. to the translation keyboard.
+    """
+    text = text[:MAX_SCORED_CHARS]
+    scripts = {}
+    for char in text:
+        script = script_of(char)
+        if script:
+            scripts[script] = scripts.get(script, 0) + 1
+    if not scripts:
+        return None
+
+    letters = sum(scripts.values())
+    script = max(scripts, key=scripts.get)
+    # Mixed script text (e.g. a Russian sentence with an English brand name) is less certain
+    dominance = scripts[script] / letters
+    codes = [code for code in SCRIPT_LANGUAGES[script]
+             if candidates is None or LANGUAGE_NAMES[code] in candidates]
+    if not codes:
+        return None
+
+    if len(codes) == 1:
+        probabilities = {codes[0]: 1.0}
+    else:
+        ids = [_TRIGRAM_INDEX.get(trigram) for trigram in _trigrams(_normalize(text))]
+        averages = {}
+        for code in codes:
+            log_probs, unseen = _MODELS[(code, script)]
+            score = sum(log_probs[trigram_id] if trigram_id is not None else unseen for trigram_id in ids)
+            averages[code] = score / max(len(ids), 1)
+        best = max(averages.values())
+        weights = {code: math.exp((average - best) * CONFIDENCE_SHARPNESS) for code, average in averages.items()}
+        total = sum(weights.values())
+        probabilities = {code: weight / total for code, weight in weights.items()}
+
+    code = max(probabilities, key=probabilities.get)
+    # Short texts carry little evidence: pull their confidence towards a uniform guess
+    evidence = min(scripts[script] / FULL_CONFIDENCE_LETTERS, 1.0)
+    uniform = 1 / len(codes)
+    confidence = (uniform + (probabilities[code] - uniform) * evidence) * dominance
+    return Detection(code, LANGUAGE_NAMES[code], round(confidence, 3), script)
@@ -0,0 +1,113 @@
+"""
+Request lifecycle instrumentation for service terminal steps
+"""
+import logging
+import time
+from database import db_manager
+from database.query_stats import query_scope, current_query_stats
+from utils.providers import timed_call_provider
+
+logger = logging.getLogger(__name__)
+
+
+def response_size(result) -> int:
+    """Size of a provider result: characters for text, bytes for media, summed for lists"""
+    if result is None:
+        return 0
+    if isinstance(result, (str, bytes, bytearray)):
+        return len(result)
+    if isinstance(result, (list, tuple)):
+        return sum(response_size(item) for item in result)
+    return len(str(result))
+
+
+class RequestLifecycle:
+    """
+    Measures one service request and writes it to RequestLog when it ends.
+
+    Usage:
+        async with RequestLifecycle(user.id, "chat", {"question": question}) as lifecycle:
+            response = await lifecycle.call_provider(ChatService.integrate_ai_api, question, language)
+            await lifecycle.send(update.message.reply_text(response))
+
+    The log records the real final status ("error" if anything inside the block
+    raised), the total processing_time in milliseconds, and in response_data the
+    queue wait, provider time and Telegram send time (monotonic clock), the
+    response size and the SQL statements issued so far by the update.
+    """
+
+    def __init__(self, telegram_id: int, service_name: str, request_data: dict):
+        self.telegram_id = telegram_id
+        self.service_name = service_name
+        self.request_data = request_data
+        self.queue_wait = 0.0
+        self.provider_time = 0.0
+        self.send_time = 0.0
+        self.response_size = 0
+        self.extra = {}
+        self.started = None
+        self.query_stats = None
+        self._query_scope = None
+
+    async def __aenter__(self):
+        self.started = time.monotonic()
+        # Inside a handler the update's scope is already active; background jobs get their own
+        self.query_stats = current_query_stats()
+        if self.query_stats is None:
+            self._query_scope = query_scope(self.service_name)
+            self.query_stats = self._query_scope.__enter__()
+        return self
+
+    async def call_provider(self, provider, *args, **kwargs):
+        """Call a provider hook through the gateway and record its timings"""
+        result, queue_wait, provider_time = await timed_call_provider(
+            self.service_name, self.telegram_id, provider, *args, **kwargs
+        )
+        self.queue_wait += queue_wait
+        self.provider_time += provider_time
+        self.response_size += response_size(result)
+        return result
+
+    async def send(self, coroutine):
+        """Await an outgoing Telegram call and record its duration"""
+        started = time.monotonic()
+        try:
+            return await coroutine
+        finally:
+            self.send_time += time.monotonic() - started
+
+    def response_data(self) -> dict:
+        """Timings and size stored in RequestLog.response_data"""
+        return {
+            "queue_wait_ms": round(self.queue_wait * 1000),
+            "provider_ms": round(self.provider_time * 1000),
+            "send_ms": round(self.send_time * 1000),
+            "response_size": self.response_size,
+            "db_queries": self.query_stats.count if self.query_stats else 0,
+            "db_ms": round(self.query_stats.total_time * 1000) if self.query_stats else 0,
+            **self.extra
+        }
+
+    async def __aexit__(self, exc_type, exc, tb):
+        processing_time = round((time.monotonic() - self.started) * 1000)
+        status = "success" if exc_type is None else "error"
+        error_message = f"{exc_type.__name__}: {exc}" if exc_type is not None else None
+        response_data = self.response_data()
+        if self._query_scope is not None:
+            self._query_scope.__exit__(None, None, None)
+            self._query_scope = None
+
+        try:
+            await db_manager.log_request(
+                self.telegram_id,
+                self.service_name,
+                self.request_data,
+                status,
+                error_message=error_message,
+                processing_time=processing_time,
+                response_data=response_data
+            )
+        except Exception as e:
+            logger.error(f"Failed to log {self.service_name} request: {e}")
+
+        return False
@@ -1,7 +1,10 @@
 """
 Main bot file - Entry point for Telegram AI Bot
 """
+import asyncio
+import importlib
 import logging
+import re
 from telegram import Update
 from telegram.ext import (
     Application,
@@ -16,42 +19,26 @@ import config
 from database import db_manager
 from locales import get_text
 from utils.keyboards import get_language_keyboard, get_main_menu_keyboard
-from services import (
-    ChatService,
-    TranslationService,
-    TextGenerationService,
-    VideoCreationService,
-    ImageGenerationService,
-    VoiceMusicService,
-    PremiumService
-)
-from admin import AdminPanel
-
-# Import conversation states
-from services.chat import WAITING_QUESTION
-from services.translation import WAITING_TEXT, SELECTING_SOURCE, SELECTING_TARGET
-from services.text_gen import SELECTING_TYPE, ENTERING_TOPIC, SELECTING_LENGTH, SELECTING_TONE
-from services.video_gen import (
-    ENTERING_DESCRIPTION as VIDEO_DESCRIPTION,
-    SELECTING_LENGTH as VIDEO_LENGTH,
-    SELECTING_STYLE as VIDEO_STYLE,
-    SELECTING_RATIO
-)
-from services.image_gen import (
-    ENTERING_PROMPT,
-    SELECTING_SIZE,
-    SELECTING_STYLE as IMAGE_STYLE,
-    SELECTING_QUANTITY
-)
-from services.voice_music import (
-    SELECTING_MODE,
-    ENTERING_TEXT as VOICE_TEXT,
-    SELECTING_VOICE_STYLE,
-    SELECTING_VOICE_LANG,
-    ENTERING_MUSIC_PROMPT,
-    SELECTING_MUSIC_STYLE
+from services.generation_queue import generation_queue
+from services.maintenance import schedule_maintenance_jobs
+from utils.output_delivery import page_callback
+from utils.shutdown import shutdown_coordinator
+from utils.media_store import media_store
+from utils.analytics import rollup_request_logs
+from utils.metrics import (metrics_server, instrument_application, instrument_module,
+                           InstrumentedRequest)
+
+# Conversation states (the services themselves are imported on first use, see _lazy)
+from services.states import (
+    WAITING_QUESTION,
+    WAITING_TEXT, SELECTING_SOURCE, SELECTING_TARGET,
+    SELECTING_TYPE, ENTERING_TOPIC, SELECTING_LENGTH, SELECTING_TONE,
+    VIDEO_DESCRIPTION, VIDEO_LENGTH, VIDEO_STYLE, VIDEO_RATIO,
+    ENTERING_PROMPT, SELECTING_SIZE, IMAGE_STYLE, SELECTING_QUANTITY,
+    SELECTING_MODE, ENTERING_TEXT as VOICE_TEXT, SELECTING_VOICE_STYLE, SELECTING_VOICE_LANG,
+    ENTERING_MUSIC_PROMPT, SELECTING_MUSIC_STYLE,
+    SELECTING_PACKAGE, ENTERING_PROMO, WAITING_FOR_PAYMENT
 )
-from services.premium import SELECTING_PACKAGE, ENTERING_PROMO, WAITING_FOR_PAYMENT # NEW
 
 # Configure logging
 logging.basicConfig(
@@ -61,6 +48,51 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _lazy(path: str):
+    """
+    Handler callback that imports its module on the first update it handles,
+    e.g. _lazy("services.chat:ChatService.process_question"). Startup then
+    only pays for the services and admin panel that are actually used.
+    """
+    module_name, attribute = path.split(':')
+    target = None
+
+    async def callback(update: Update, context):
+        nonlocal target
+        if target is None:
+            target = importlib.import_module(module_name)
+            for name in attribute.split('.'):
+                target = getattr(target, name)
+        return await target(update, context)
+
+    # Metrics label the handler by its qualified name, as for a direct callback
+    callback.__qualname__ = attribute
+    return callback
+
+
+CHAT = "services.chat:ChatService"
+TRANSLATION = "services.translation:TranslationService"
+TEXT_GEN = "services.text_gen:TextGenerationService"
+VIDEO = "services.video_gen:VideoCreationService"
+IMAGE = "services.image_gen:ImageGenerationService"
+VOICE = "services.voice_music:VoiceMusicService"
+PREMIUM = "services.premium:PremiumService"
+JOBS = "services.generation_queue:JobService"
+ADMIN = "admin.panel:AdminPanel"
+
+# Main menu button -> entry point of its flow
+MENU_ROUTES = {
+    "service_chat": _lazy(f"{CHAT}.start"),
+    "service_translation": _lazy(f"{TRANSLATION}.start"),
+    "service_text_gen": _lazy(f"{TEXT_GEN}.start"),
+    "service_video": _lazy(f"{VIDEO}.start"),
+    "service_image": _lazy(f"{IMAGE}.start"),
+    "service_voice": _lazy(f"{VOICE}.start"),
+    # Redirect to the entry point of the Premium Conversation Handler
+    "service_premium": _lazy(f"{PREMIUM}.show_info")
+}
+
+
 # Command handlers
 async def start_command(update: Update, context):
     """Handle /start command"""
@@ -114,17 +146,24 @@ Commands:
 /stats - Show your usage statistics
 /language - Change language
 /premium - Show premium packages
+/jobs - Show status of your video/music jobs
 
 Admin Commands (admin only):
-/admin_stats - Show bot, revenue and usage statistics
+/admin_stats [1h|24h|7d|30d] - Show bot, revenue, usage and latency statistics
 /list_payments - List pending payments for manual confirmation
 /confirm_payment <id> - Confirm payment and activate premium
+/confirm_payments <id> [id ...] - Confirm several payments in one transaction
+/reject_payment <id> - Mark a pending payment as failed
 /create_promo <code> <discount%> [max] [days] - Create a promo code
 /list_promos - List existing promo codes
 /grant_premium <user_id> <days> [package] - Grant premium
 /revoke_premium <user_id> - Revoke premium
-/list_users [limit] - List recent users
+/list_users [size] [package=] [premium=yes|no] [lang=] [@prefix] - Browse users
 /broadcast <message> - Send message to all users
+/provider_stats - Show provider queues, load and circuit breakers
+/perf - Show handler, database, provider and Telegram latency percentiles
+/log_history [days] - Request statistics including archived logs
+/export users|payments|logs [from] [to] - Download a gzip CSV/JSONL export
 """
     
     await update.message.reply_text(help_text)
@@ -204,68 +243,171 @@ async def handle_main_menu(update: Update, context):
     message_text = update.message.text
     
     # Route to services
-    if message_text == get_text(language, "service_chat"):
-        return await ChatService.start(update, context)
-    elif message_text == get_text(language, "service_translation"):
-        return await TranslationService.start(update, context)
-    elif message_text == get_text(language, "service_text_gen"):
-        return await TextGenerationService.start(update, context)
-    elif message_text == get_text(language, "service_video"):
-        return await VideoCreationService.start(update, context)
-    elif message_text == get_text(language, "service_image"):
-        return await ImageGenerationService.start(update, context)
-    elif message_text == get_text(language, "service_voice"):
-        return await VoiceMusicService.start(update, context)
-    elif message_text == get_text(language, "service_premium"):
-        # Redirect to the entry point of the Premium Conversation Handler
-        return await PremiumService.show_info(update, context)
-    else:
-        # Unknown command - Show main menu (Fallback)
-        await update.message.reply_text(
-            get_text(language, "main_menu"),
-            reply_markup=get_main_menu_keyboard(language)
-        )
+    for button_key, entry_point in MENU_ROUTES.items():
+        if message_text == get_text(language, button_key):
+            return await entry_point(update, context)
 
+    # Unknown command - Show main menu (Fallback)
+    await update.message.reply_text(
+        get_text(language, "main_menu"),
+        reply_markup=get_main_menu_keyboard(language)
+    )
 
-def main():
-    """Start the bot"""
-    # Initialize database
-    import asyncio
-    asyncio.run(db_manager.init_db())
-    
-    # Create application
-    application = Application.builder().token(config.BOT_TOKEN).build()
+
+async def post_init(application: Application):
+    """
+    Check the schema, start background workers, image worker processes and the
+    metrics endpoint once the application is initialized. This runs on the
+    polling event loop, so the database connections opened here stay usable.
+    """
+    await db_manager.init_db()
+    await generation_queue.start(application.bot)
+    # PIL and the worker processes are not needed to answer the first updates
+    from utils.image_pipeline import image_pipeline
+    image_pipeline.start_background()
+    try:
+        await metrics_server.start()
+    except OSError as e:
+        logger.error(f"Metrics endpoint could not be started: {e}")
+
+    # SIGTERM/SIGINT drain the in-flight handlers; buffered state is written on shutdown
+    shutdown_coordinator.register_flush("media_store", media_store.flush)
+    shutdown_coordinator.register_flush("analytics_rollup", rollup_request_logs)
+    shutdown_coordinator.install(application)
+
+
+async def post_shutdown(application: Application):
+    """Stop background workers, image worker processes and the metrics endpoint, then flush and checkpoint"""
+    await generation_queue.stop()
+    from utils.image_pipeline import image_pipeline
+    await asyncio.to_thread(image_pipeline.shutdown)
+    await metrics_server.stop()
+    await shutdown_coordinator.finish()
+
+
+def _menu_button_filter(key: str):
+    """Match a main menu button in any supported language"""
+    return filters.Regex(f"^({re.escape(get_text('uz', key))}|{re.escape(get_text('ru', key))})$")
+
+
+def _service_conversation(name: str, button_key: str, service: str, states: dict) -> ConversationHandler:
+    """
+    Conversation handler for a multi-step service started from the main menu.
+    service is "module:Class"; states maps each state to the name of its step method.
+    """
+    text_input = filters.TEXT & ~filters.COMMAND
+    return ConversationHandler(
+        entry_points=[MessageHandler(_menu_button_filter(button_key), MENU_ROUTES[button_key])],
+        states={
+            state: [MessageHandler(text_input, _lazy(f"{service}.{method}"))]
+            for state, method in states.items()
+        },
+        fallbacks=[CommandHandler("start", start_command), CommandHandler("cancel", _lazy(f"{service}.cancel"))],
+        name=name,
+        persistent=False,
+        allow_reentry=True
+    )
+
+
+def build_application(bot=None, concurrent_updates: bool | int = False) -> Application:
+    """
+    Build the Application with all handlers registered and instrumented.
+    A pre-built bot can be passed in (the load generator uses one that never
+    touches the network); otherwise the bot is created from config.BOT_TOKEN.
+    """
+    # Time every database manager call
+    instrument_module(db_manager)
     
+    builder = (
+        Application.builder()
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(concurrent_updates)
+    )
+    if bot is None:
+        # Outbound Bot API calls are timed per endpoint
+        builder = builder.token(config.BOT_TOKEN).request(InstrumentedRequest())
+    else:
+        builder = builder.bot(bot).updater(None)
+    application = builder.build()
+
     # Command handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("stats", stats_command))
     application.add_handler(CommandHandler("language", language_command))
-    application.add_handler(CommandHandler("premium", PremiumService.show_info)) # Added command
+    application.add_handler(CommandHandler("premium", _lazy(f"{PREMIUM}.show_info"))) # Added command
+    application.add_handler(CommandHandler("jobs", _lazy(f"{JOBS}.list_jobs")))
     
     # Admin command handlers (Updated/New)
-    application.add_handler(CommandHandler("admin_stats", AdminPanel.show_stats))
-    application.add_handler(CommandHandler("list_payments", AdminPanel.list_pending_payments))
-    application.add_handler(CommandHandler("confirm_payment", AdminPanel.confirm_payment))
-    application.add_handler(CommandHandler("create_promo", AdminPanel.create_promo_code_command))
-    application.add_handler(CommandHandler("list_promos", AdminPanel.list_promo_codes_command))
-    application.add_handler(CommandHandler("grant_premium", AdminPanel.grant_premium))
-    application.add_handler(CommandHandler("revoke_premium", AdminPanel.revoke_premium))
-    application.add_handler(CommandHandler("list_users", AdminPanel.list_users))
-    application.add_handler(CommandHandler("broadcast", AdminPanel.broadcast))
+    application.add_handler(CommandHandler("admin_stats", _lazy(f"{ADMIN}.show_stats")))
+    application.add_handler(CommandHandler("list_payments", _lazy(f"{ADMIN}.list_pending_payments")))
+    application.add_handler(CommandHandler("confirm_payment", _lazy(f"{ADMIN}.confirm_payment")))
+    application.add_handler(CommandHandler("confirm_payments", _lazy(f"{ADMIN}.confirm_payments")))
+    application.add_handler(CommandHandler("reject_payment", _lazy(f"{ADMIN}.reject_payment")))
+    application.add_handler(CommandHandler("create_promo", _lazy(f"{ADMIN}.create_promo_code_command")))
+    application.add_handler(CommandHandler("list_promos", _lazy(f"{ADMIN}.list_promo_codes_command")))
+    application.add_handler(CommandHandler("grant_premium", _lazy(f"{ADMIN}.grant_premium")))
+    application.add_handler(CommandHandler("revoke_premium", _lazy(f"{ADMIN}.revoke_premium")))
+    application.add_handler(CommandHandler("list_users", _lazy(f"{ADMIN}.list_users")))
+    application.add_handler(CallbackQueryHandler(_lazy(f"{ADMIN}.list_users_navigate"), pattern=r"^lu:"))
+    application.add_handler(CommandHandler("broadcast", _lazy(f"{ADMIN}.broadcast")))
+    application.add_handler(CommandHandler("provider_stats", _lazy(f"{ADMIN}.show_provider_stats")))
+    application.add_handler(CommandHandler("perf", _lazy(f"{ADMIN}.show_perf")))
+    application.add_handler(CommandHandler("log_history", _lazy(f"{ADMIN}.show_log_history")))
+    application.add_handler(CommandHandler("export", _lazy(f"{ADMIN}.export_data")))
     
     # Language selection callback
     application.add_handler(CallbackQueryHandler(language_callback, pattern="^lang_"))
     
+    # Pages of long results
+    application.add_handler(CallbackQueryHandler(page_callback, pattern=r"^pg:"))
+    
+    # Service conversation handlers (entered from the main menu buttons)
+    application.add_handler(_service_conversation("chat_conversation", "service_chat", CHAT, {
+        WAITING_QUESTION: "process_question"
+    }))
+    application.add_handler(_service_conversation("translation_conversation", "service_translation", TRANSLATION, {
+        WAITING_TEXT: "receive_text",
+        SELECTING_SOURCE: "select_source_language",
+        SELECTING_TARGET: "select_target_language"
+    }))
+    application.add_handler(_service_conversation("text_gen_conversation", "service_text_gen", TEXT_GEN, {
+        SELECTING_TYPE: "select_type",
+        ENTERING_TOPIC: "enter_topic",
+        SELECTING_LENGTH: "select_length",
+        SELECTING_TONE: "select_tone"
+    }))
+    application.add_handler(_service_conversation("video_conversation", "service_video", VIDEO, {
+        VIDEO_DESCRIPTION: "enter_description",
+        VIDEO_LENGTH: "select_length",
+        VIDEO_STYLE: "select_style",
+        VIDEO_RATIO: "select_ratio"
+    }))
+    application.add_handler(_service_conversation("image_conversation", "service_image", IMAGE, {
+        ENTERING_PROMPT: "enter_prompt",
+        SELECTING_SIZE: "select_size",
+        IMAGE_STYLE: "select_style",
+        SELECTING_QUANTITY: "select_quantity"
+    }))
+    application.add_handler(_service_conversation("voice_music_conversation", "service_voice", VOICE, {
+        SELECTING_MODE: "select_mode",
+        VOICE_TEXT: "enter_text",
+        SELECTING_VOICE_STYLE: "select_voice_style",
+        SELECTING_VOICE_LANG: "select_voice_language",
+        ENTERING_MUSIC_PROMPT: "enter_music_prompt",
+        SELECTING_MUSIC_STYLE: "select_music_style"
+    }))
+    
     # Premium purchase conversation handler (NEW)
     premium_handler = ConversationHandler(
-        entry_points=[MessageHandler(filters.Regex(get_text('uz', "service_premium")) | filters.Regex(get_text('ru', "service_premium")), PremiumService.show_info)],
+        entry_points=[MessageHandler(filters.Regex(get_text('uz', "service_premium")) | filters.Regex(get_text('ru', "service_premium")), _lazy(f"{PREMIUM}.show_info"))],
         states={
-            SELECTING_PACKAGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, PremiumService.select_package)],
-            ENTERING_PROMO: [MessageHandler(filters.TEXT & ~filters.COMMAND, PremiumService.enter_promo)],
-            WAITING_FOR_PAYMENT: [MessageHandler(filters.TEXT & ~filters.COMMAND, PremiumService.payment_confirmation_request)]
+            SELECTING_PACKAGE: [MessageHandler(filters.TEXT & ~filters.COMMAND, _lazy(f"{PREMIUM}.select_package"))],
+            ENTERING_PROMO: [MessageHandler(filters.TEXT & ~filters.COMMAND, _lazy(f"{PREMIUM}.enter_promo"))],
+            WAITING_FOR_PAYMENT: [MessageHandler(filters.TEXT & ~filters.COMMAND, _lazy(f"{PREMIUM}.payment_confirmation_request"))]
         },
-        fallbacks=[CommandHandler("start", start_command), MessageHandler(filters.Regex(get_text('uz', "back")) | filters.Regex(get_text('ru', "back")), PremiumService.show_info)],
+        fallbacks=[CommandHandler("start", start_command), MessageHandler(filters.Regex(get_text('uz', "back")) | filters.Regex(get_text('ru', "back")), _lazy(f"{PREMIUM}.show_info"))],
         name="premium_conversation",
         persistent=False,
         allow_reentry=True
@@ -292,9 +434,26 @@ def main():
     
     application.add_error_handler(error_handler)
     
-    # Start bot
+    # Periodic maintenance (premium expiry, quota resets, log compaction)
+    schedule_maintenance_jobs(application)
+    
+    # Latency histograms for every registered handler
+    instrument_application(application)
+    
+    # In-flight handlers are waited for on shutdown
+    shutdown_coordinator.track_application(application)
+    
+    return application
+
+
+def main():
+    """Start the bot"""
+    application = build_application()
+    
+    # Start bot (the schema is checked in post_init, on the polling event loop).
+    # Stop signals are handled by the shutdown coordinator, which drains first.
     logger.info("Starting bot...")
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    application.run_polling(allowed_updates=Update.ALL_TYPES, stop_signals=None)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,316 @@
+"""
+Maintenance jobs - periodic set-based housekeeping scheduled on the Application's job queue
+
+Every job can also be run once from the command line, e.g. for a backfill:
+    python -m services.maintenance reset-limits --chunk-size 10000
+    python -m services.maintenance expire-premium --notify
+    python -m services.maintenance compact-logs --retention-days 30
+    python -m services.maintenance rollup-analytics
+    python -m services.maintenance reconcile-payments --pending-ttl-hours 72
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from telegram import Bot
+from telegram.error import TelegramError
+from telegram.ext import Application, ContextTypes
+from database import db_manager
+from database.log_archive import log_archive
+from utils.analytics import analytics_rollup_job, rollup_request_logs
+from utils.media_store import prune_media_store_job
+from locales import get_text
+import config
+
+logger = logging.getLogger(__name__)
+
+
+async def notify_users(bot, recipients: list[tuple[int, str]], text_key: str):
+    """Send a localized message to (telegram_id, language) pairs in rate-friendly batches"""
+    for index, (telegram_id, language) in enumerate(recipients, 1):
+        try:
+            await bot.send_message(chat_id=telegram_id, text=get_text(language, text_key))
+        except TelegramError as e:
+            # Blocked bot, deleted account etc. must not stop the batch
+            logger.warning(f"Could not notify user {telegram_id}: {e}")
+
+        if index % config.NOTIFY_BATCH_SIZE == 0:
+            await asyncio.sleep(config.NOTIFY_BATCH_PAUSE)
+
+
+async def expire_premium_job(context: ContextTypes.DEFAULT_TYPE):
+    """Downgrade all expired subscriptions and tell their owners"""
+    started = time.monotonic()
+    try:
+        expired = await db_manager.expire_premium_subscriptions()
+    except Exception as e:
+        logger.error(f"Premium expiry sweep failed: {e}")
+        return
+
+    if not expired:
+        return
+
+    logger.info(f"Premium expiry sweep downgraded {len(expired)} users in {time.monotonic() - started:.2f}s")
+    if config.PREMIUM_EXPIRY_NOTIFY:
+        await notify_users(context.bot, expired, "premium_expired_user_msg")
+
+
+async def reset_limits_job(context: ContextTypes.DEFAULT_TYPE):
+    """Reset all quota counters whose daily/monthly window has elapsed"""
+    try:
+        stats = await db_manager.reset_expired_limits()
+    except Exception as e:
+        logger.error(f"Quota reset failed: {e}")
+        return
+
+    logger.info(
+        f"Quota reset generation {stats['generation']}: {stats['rows_reset']} rows in "
+        f"{stats['chunks']} chunks, {stats['duration_ms']} ms (longest chunk {stats['max_chunk_ms']} ms)"
+    )
+
+
+async def release_promo_reservations_job(context: ContextTypes.DEFAULT_TYPE):
+    """Give back promo uses held by payments that were never confirmed"""
+    try:
+        released = await db_manager.release_expired_promo_reservations()
+    except Exception as e:
+        logger.error(f"Promo reservation release failed: {e}")
+        return
+
+    if released:
+        logger.info(f"Released {released} expired promo reservations")
+
+
+async def reconcile_payments_job(context: ContextTypes.DEFAULT_TYPE):
+    """Expire stale and supersede duplicate pending payments and keep the open payments index in sync"""
+    try:
+        stats = await db_manager.reconcile_payments()
+    except Exception as e:
+        logger.error(f"Payment reconciliation failed: {e}")
+        return
+
+    if any(stats.values()):
+        logger.info(
+            f"Payment reconciliation expired {stats['expired']} stale and superseded {stats['collapsed']} duplicate payments; "
+            f"open index: {stats['indexed']} added, {stats['pruned']} pruned"
+        )
+
+
+async def prune_translation_memory_job(context: ContextTypes.DEFAULT_TYPE):
+    """Keep the translation memory at its most recently used segments"""
+    try:
+        pruned = await db_manager.prune_translation_memory(config.TRANSLATION_MEMORY_MAX_ENTRIES)
+    except Exception as e:
+        logger.error(f"Translation memory pruning failed: {e}")
+        return
+
+    if pruned:
+        logger.info(f"Pruned {pruned} least recently used translation memory segments")
+
+
+async def _delete_archived(entry: dict) -> int:
+    """Remove the rows of an archived chunk from the database in small batches"""
+    cutoff = datetime.fromisoformat(entry['cutoff'])
+    deleted = 0
+    while True:
+        count = await db_manager.delete_request_logs(
+            entry['min_id'], entry['max_id'], cutoff, config.LOG_DELETE_BATCH_SIZE
+        )
+        deleted += count
+        if count < config.LOG_DELETE_BATCH_SIZE:
+            break
+        await asyncio.sleep(config.LOG_DELETE_PAUSE)
+
+    log_archive.mark_deleted(entry)
+    return deleted
+
+
+async def compact_request_logs(retention_days: int = config.LOG_RETENTION_DAYS,
+                               chunk_rows: int = config.LOG_ARCHIVE_CHUNK_ROWS, progress=None) -> dict:
+    """
+    Move request logs older than retention_days into archive chunks.
+    A chunk is written (and indexed) before its rows are deleted, so an
+    interrupted run never loses rows; its deletes are finished on the next run.
+    """
+    started = time.monotonic()
+    archived = 0
+    deleted = 0
+    chunks = 0
+
+    for entry in log_archive.pending_deletes():
+        deleted += await _delete_archived(entry)
+
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    while True:
+        rows = await db_manager.get_request_logs_before(cutoff, chunk_rows)
+        if not rows:
+            break
+
+        entry = await asyncio.to_thread(log_archive.write_chunk, rows, cutoff)
+        deleted += await _delete_archived(entry)
+        archived += len(rows)
+        chunks += 1
+        if progress:
+            progress(archived, chunks)
+
+    return {
+        "archived": archived,
+        "deleted": deleted,
+        "chunks": chunks,
+        "duration_ms": round((time.monotonic() - started) * 1000)
+    }
+
+
+async def compact_logs_job(context: ContextTypes.DEFAULT_TYPE):
+    """Archive request logs older than the retention window"""
+    try:
+        stats = await compact_request_logs()
+    except Exception as e:
+        logger.error(f"Request log compaction failed: {e}")
+        return
+
+    logger.info(
+        f"Request log compaction archived {stats['archived']} rows into {stats['chunks']} chunks "
+        f"and deleted {stats['deleted']} rows in {stats['duration_ms']} ms"
+    )
+
+
+def schedule_maintenance_jobs(application: Application):
+    """Register the periodic maintenance jobs on the application's job queue"""
+    job_queue = application.job_queue
+    if job_queue is None:
+        logger.warning("Job queue is not available (install python-telegram-bot[job-queue]); maintenance jobs disabled")
+        return
+
+    job_queue.run_repeating(
+        expire_premium_job,
+        interval=config.PREMIUM_EXPIRY_INTERVAL,
+        first=10,
+        name="expire_premium"
+    )
+
+    # Daily windows roll over at midnight UTC; the startup run catches up after downtime
+    reset_time = datetime.strptime(config.LIMIT_RESET_TIME_UTC, "%H:%M:%S").time()
+    job_queue.run_daily(reset_limits_job, time=reset_time, name="reset_limits")
+    job_queue.run_once(reset_limits_job, when=30, name="reset_limits_startup")
+
+    compaction_time = datetime.strptime(config.LOG_COMPACTION_TIME_UTC, "%H:%M:%S").time()
+    job_queue.run_daily(compact_logs_job, time=compaction_time, name="compact_logs")
+
+    job_queue.run_repeating(
+        release_promo_reservations_job,
+        interval=config.PROMO_RELEASE_INTERVAL,
+        first=60,
+        name="release_promo_reservations"
+    )
+
+    job_queue.run_repeating(
+        reconcile_payments_job,
+        interval=config.PAYMENT_RECONCILE_INTERVAL,
+        first=20,
+        name="reconcile_payments"
+    )
+
+    job_queue.run_repeating(
+        prune_translation_memory_job,
+        interval=config.TRANSLATION_MEMORY_PRUNE_INTERVAL,
+        first=600,
+        name="prune_translation_memory"
+    )
+
+    job_queue.run_repeating(
+        prune_media_store_job,
+        interval=config.MEDIA_STORE_PRUNE_INTERVAL,
+        first=300,
+        name="prune_media_store"
+    )
+
+    # Runs every minute, far ahead of the retention cutoff used by the log compaction
+    job_queue.run_repeating(
+        analytics_rollup_job,
+        interval=config.ANALYTICS_ROLLUP_INTERVAL,
+        first=5,
+        name="analytics_rollup"
+    )
+
+
+def _print_progress(scanned: int, total: int, rows_reset: int):
+    print(f"\rScanned {scanned:,}/{total:,} ids, reset {rows_reset:,} rows", end="", flush=True)
+
+
+async def _run_cli(args):
+    await db_manager.init_db()
+
+    if args.command == "reset-limits":
+        stats = await db_manager.reset_expired_limits(args.chunk_size, dry_run=args.dry_run, progress=_print_progress)
+        duration = stats['duration_ms'] / 1000
+        rate = stats['rows_reset'] / duration if duration else 0
+        print(
+            f"\n{'Would reset' if args.dry_run else 'Reset'} {stats['rows_reset']:,} rows in {stats['chunks']} chunks: "
+            f"{duration:.2f}s total, {rate:,.0f} rows/s, longest chunk {stats['max_chunk_ms']} ms"
+            + ("" if args.dry_run else f", generation {stats['generation']}")
+        )
+
+    elif args.command == "expire-premium":
+        started = time.monotonic()
+        expired = await db_manager.expire_premium_subscriptions(args.batch_size)
+        print(f"Downgraded {len(expired):,} expired subscriptions in {time.monotonic() - started:.2f}s")
+        if args.notify and expired:
+            async with Bot(config.BOT_TOKEN) as bot:
+                await notify_users(bot, expired, "premium_expired_user_msg")
+
+    elif args.command == "compact-logs":
+        stats = await compact_request_logs(
+            args.retention_days, args.chunk_rows,
+            progress=lambda archived, chunks: print(f"\rArchived {archived:,} rows in {chunks} chunks", end="", flush=True)
+        )
+        summary = log_archive.summary()
+        print(
+            f"\nArchived {stats['archived']:,} rows, deleted {stats['deleted']:,} in {stats['duration_ms'] / 1000:.2f}s. "
+            f"Archive: {summary['rows']:,} rows in {summary['chunks']} chunks, {summary['bytes'] / 1024 / 1024:.1f} MB"
+        )
+
+
+    elif args.command == "rollup-analytics":
+        started = time.monotonic()
+        rolled_up = await rollup_request_logs(args.page_size)
+        print(f"Rolled up {rolled_up:,} request logs into latency buckets in {time.monotonic() - started:.2f}s")
+
+    elif args.command == "reconcile-payments":
+        stats = await db_manager.reconcile_payments(timedelta(hours=args.pending_ttl_hours))
+        print(
+            f"Expired {stats['expired']:,} stale and superseded {stats['collapsed']:,} duplicate pending payments; "
+            f"open payments index: {stats['indexed']:,} added, {stats['pruned']:,} pruned"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a maintenance job once")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    reset_parser = commands.add_parser("reset-limits", help="reset quota counters of elapsed windows")
+    reset_parser.add_argument("--chunk-size", type=int, default=config.LIMIT_RESET_CHUNK_SIZE)
+    reset_parser.add_argument("--dry-run", action="store_true", help="only count the rows that would be reset")
+
+    expire_parser = commands.add_parser("expire-premium", help="downgrade expired premium subscriptions")
+    expire_parser.add_argument("--batch-size", type=int, default=config.PREMIUM_EXPIRY_BATCH_SIZE)
+    expire_parser.add_argument("--notify", action="store_true", help="message the downgraded users")
+
+    compact_parser = commands.add_parser("compact-logs", help="archive request logs older than the retention window")
+    compact_parser.add_argument("--retention-days", type=int, default=config.LOG_RETENTION_DAYS)
+    compact_parser.add_argument("--chunk-rows", type=int, default=config.LOG_ARCHIVE_CHUNK_ROWS)
+
+    rollup_parser = commands.add_parser("rollup-analytics", help="roll new request logs into latency buckets")
+    rollup_parser.add_argument("--page-size", type=int, default=config.ANALYTICS_ROLLUP_PAGE_SIZE)
+
+    reconcile_parser = commands.add_parser("reconcile-payments", help="expire stale/duplicate pending payments")
+    reconcile_parser.add_argument("--pending-ttl-hours", type=float, default=config.PAYMENT_PENDING_TTL_HOURS)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_run_cli(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+Media Store - re-send uploaded media by Telegram file_id instead of uploading it again
+
+Telegram keeps every file a bot uploads and returns a file_id that this bot can
+send to any chat without the bytes. The store remembers that file_id per
+content hash (sha256 of the bytes) and media type, and optionally per request
+cache key, so repeated deliveries of the same asset upload nothing. Recently
+used ids are kept in memory; the table is pruned to the most recently used
+entries by the maintenance job.
+"""
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from telegram import InputMediaPhoto, InputMediaDocument, InputMediaAudio, InputMediaVideo
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+from database import db_manager
+from utils.metrics import metrics, MEDIA_SENDS, MEDIA_UPLOAD_BYTES, MEDIA_REUSED_BYTES
+import config
+
+logger = logging.getLogger(__name__)
+
+INPUT_MEDIA = {
+    "photo": InputMediaPhoto,
+    "document": InputMediaDocument,
+    "audio": InputMediaAudio,
+    "video": InputMediaVideo
+}
+
+# Arguments that only apply to uploads; Telegram ignores them for a file_id
+UPLOAD_ONLY_ARGUMENTS = ("filename", "thumbnail")
+
+# Bad Request messages (lower case) meaning a stored file_id can no longer be used
+STALE_FILE_ERRORS = (
+    "wrong file identifier",
+    "wrong remote file identifier",
+    "file reference expired",
+    "wrong file_id",
+)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def request_cache_key(service_name: str, request_data: dict) -> str:
+    """Stable key of a request whose result is fully determined by it (e.g. speech of a text)"""
+    payload = json.dumps({"service": service_name, **request_data}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def message_file(message, media_type: str) -> tuple[str, str] | None:
+    """(file_id, file_unique_id) of the media of a sent message, None if it holds no such media"""
+    if media_type == "photo":
+        # Telegram returns every size it generated; the largest is the original
+        media = message.photo[-1] if message.photo else None
+    else:
+        media = getattr(message, media_type, None)
+    if media is None:
+        return None
+    return media.file_id, media.file_unique_id
+
+
+def _reuse_arguments(kwargs: dict) -> dict:
+    return {name: value for name, value in kwargs.items() if name not in UPLOAD_ONLY_ARGUMENTS}
+
+
+def _is_stale_file(error: BadRequest) -> bool:
+    """Whether Telegram rejected a stored file_id (other file errors, e.g. "File is too big", are not)"""
+    message = str(error).lower()
+    return any(marker in message for marker in STALE_FILE_ERRORS)
+
+
+def _count_send(media_type: str, source: str, size: int):
+    metrics.counter(MEDIA_SENDS, "Media sent, by upload or by stored file_id", type=media_type, source=source).inc()
+    if source == "upload":
+        metrics.counter(MEDIA_UPLOAD_BYTES, "Bytes of media uploaded to Telegram").inc(size)
+    else:
+        metrics.counter(MEDIA_REUSED_BYTES, "Bytes of media sent by file_id instead of uploading").inc(size)
+
+
+class MediaStore:
+    """Content-addressed cache of Telegram file_ids"""
+
+    def __init__(self, memory_entries: int = config.MEDIA_STORE_MEMORY_ENTRIES):
+        self.memory_entries = memory_entries
+        # (content hash, media type) -> file_id, least recently used first
+        self._memory = OrderedDict()
+        # Reused since the last flush; last_used_at is written in bulk by the maintenance job
+        self._touched = set()
+
+    def _remember(self, key: tuple[str, str], file_id: str):
+        self._memory[key] = file_id
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def file_id(self, digest: str, media_type: str) -> str | None:
+        """Stored file_id of an asset, None if it was never uploaded"""
+        key = (digest, media_type)
+        file_id = self._memory.get(key)
+        if file_id is None:
+            media_file = await db_manager.get_media_file(digest, media_type)
+            if media_file is None:
+                return None
+            file_id = media_file.file_id
+        self._remember(key, file_id)
+        self._touched.add(key)
+        return file_id
+
+    async def _record(self, key: tuple[str, str], message, size: int, cache_key: str = None):
+        sent = message_file(message, key[1])
+        if sent is None:
+            return
+        self._remember(key, sent[0])
+        try:
+            await db_manager.save_media_file(key[0], key[1], sent[0], sent[1], size, cache_key)
+        except Exception as e:
+            # Only costs a re-upload next time
+            logger.error(f"Could not save file_id of {key[1]} {key[0][:12]}: {e}")
+
+    async def _forget(self, key: tuple[str, str]):
+        self._memory.pop(key, None)
+        self._touched.discard(key)
+        await db_manager.delete_media_file(*key)
+
+    async def send(self, send, data: bytes, media_type: str, cache_key: str = None, **kwargs):
+        """
+        Send one asset with send(media, **kwargs), e.g. message.reply_photo or
+        functools.partial(bot.send_audio, chat_id). The bytes are only uploaded
+        if the asset was not uploaded before; returns the sent message.
+        """
+        key = (content_hash(data), media_type)
+        file_id = await self.file_id(*key)
+        if file_id is not None:
+            try:
+                message = await send(file_id, **_reuse_arguments(kwargs))
+                _count_send(media_type, "file_id", len(data))
+                return message
+            except BadRequest as e:
+                if not _is_stale_file(e):
+                    raise
+                logger.warning(f"Stored file_id of {media_type} {key[0][:12]} was rejected ({e}), uploading again")
+                await self._forget(key)
+
+        message = await send(data, **kwargs)
+        _count_send(media_type, "upload", len(data))
+        await self._record(key, message, len(data), cache_key)
+        return message
+
+    async def send_cached(self, send, cache_key: str, media_type: str, **kwargs):
+        """
+        Send the asset stored for a request cache key without having its bytes.
+        Returns None if there is none (or Telegram rejects it), so the caller generates it.
+        """
+        media_file = await db_manager.get_media_file(cache_key=cache_key)
+        if media_file is None or media_file.media_type != media_type:
+            return None
+
+        key = (media_file.content_hash, media_type)
+        try:
+            message = await send(media_file.file_id, **_reuse_arguments(kwargs))
+        except BadRequest as e:
+            if not _is_stale_file(e):
+                raise
+            await self._forget(key)
+            return None
+
+        self._remember(key, media_file.file_id)
+        self._touched.add(key)
+        _count_send(media_type, "file_id", media_file.size)
+        return message
+
+    async def send_group(self, send_group, items: list[tuple[str, bytes, dict]]):
+        """
+        Send an album with send_group(media), e.g. message.reply_media_group.
+        items are (media type, bytes, InputMedia arguments); only the assets
+        that were not uploaded before are uploaded. Returns the sent messages.
+        """
+        keys = [(content_hash(data), media_type) for media_type, data, _ in items]
+        file_ids = [await self.file_id(*key) for key in keys]
+
+        def build(file_ids):
+            return [
+                INPUT_MEDIA[media_type](file_id, **_reuse_arguments(kwargs)) if file_id
+                else INPUT_MEDIA[media_type](data, **kwargs)
+                for (media_type, data, kwargs), file_id in zip(items, file_ids)
+            ]
+
+        try:
+            messages = await send_group(build(file_ids))
+        except BadRequest as e:
+            if not any(file_ids) or not _is_stale_file(e):
+                raise
+            # Telegram does not say which item was rejected: upload them all
+            logger.warning(f"Stored file_ids of an album were rejected ({e}), uploading again")
+            for key, file_id in zip(keys, file_ids):
+                if file_id:
+                    await self._forget(key)
+            file_ids = [None] * len(items)
+            messages = await send_group(build(file_ids))
+
+        for key, (media_type, data, _), file_id, message in zip(keys, items, file_ids, messages):
+            _count_send(media_type, "file_id" if file_id else "upload", len(data))
+            if not file_id:
+                await self._record(key, message, len(data))
+        return messages
+
+    async def flush(self) -> int:
+        """Write the last use of reused assets; returns the number of entries written"""
+        touched, self._touched = self._touched, set()
+        await db_manager.touch_media_files(list(touched), datetime.utcnow())
+        return len(touched)
+
+    async def prune(self, max_entries: int = config.MEDIA_STORE_MAX_ENTRIES) -> int:
+        """Drop the least recently used file_ids beyond max_entries; returns the number dropped"""
+        await self.flush()
+        return await db_manager.prune_media_files(max_entries)
+
+
+# Global media store
+media_store = MediaStore()
+
+
+async def prune_media_store_job(context: ContextTypes.DEFAULT_TYPE):
+    """Persist recent uses and prune the least recently used file_ids"""
+    try:
+        pruned = await media_store.prune()
+    except Exception as e:
+        logger.error(f"Media store pruning failed: {e}")
+        return
+
+    if pruned:
+        logger.info(f"Pruned {pruned} least recently used media file_ids")
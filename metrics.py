@@ -0,0 +1,343 @@
+"""
+Metrics - low-overhead latency histograms, counters and a Prometheus endpoint
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from telegram.request import HTTPXRequest
+import config
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; a final +Inf bucket is implicit
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(labels: tuple, extra: str = "") -> str:
+    """Render a label tuple as {k="v",...} with Prometheus escaping"""
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_bound(bound: float) -> str:
+    return f"{bound:g}"
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. The bot runs on a single event loop, so observe()
+    is a plain list increment without locks.
+    """
+    __slots__ = ('labels', 'buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, labels: tuple, buckets: tuple = DEFAULT_BUCKETS):
+        self.labels = labels
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside the matching bucket"""
+        if self.count == 0:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class Counter:
+    """Monotonic counter"""
+    __slots__ = ('labels', 'value')
+
+    def __init__(self, labels: tuple):
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class MetricsRegistry:
+    """Holds all metric families and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._families = {}
+        self._collectors = []
+
+    def _family(self, name: str, kind: str, help_text: str):
+        if name not in self._families:
+            self._families[name] = {'kind': kind, 'help': help_text, 'series': {}}
+        return self._families[name]
+
+    def histogram(self, name: str, help_text: str, **labels) -> Histogram:
+        """Get or create a histogram series"""
+        family = self._family(name, 'histogram', help_text)
+        key = tuple(sorted(labels.items()))
+        series = family['series'].get(key)
+        if series is None:
+            series = family['series'][key] = Histogram(key)
+        return series
+
+    def counter(self, name: str, help_text: str, **labels) -> Counter:
+        """Get or create a counter series"""
+        family = self._family(name, 'counter', help_text)
+        key = tuple(sorted(labels.items()))
+        series = family['series'].get(key)
+        if series is None:
+            series = family['series'][key] = Counter(key)
+        return series
+
+    def register_collector(self, collector):
+        """
+        Register a callable evaluated at scrape time for values owned by other
+        components. It returns a list of (name, kind, help, [(labels_dict, value), ...]).
+        """
+        self._collectors.append(collector)
+
+    def histograms(self, name: str) -> list[Histogram]:
+        family = self._families.get(name)
+        return list(family['series'].values()) if family else []
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, family in self._families.items():
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for series in family['series'].values():
+                if family['kind'] == 'histogram':
+                    cumulative = 0
+                    for bound, bucket_count in zip(series.buckets, series.counts):
+                        cumulative += bucket_count
+                        le = _format_labels(series.labels, f'le="{_format_bound(bound)}"')
+                        lines.append(f"{name}_bucket{le} {cumulative}")
+                    inf_labels = _format_labels(series.labels, 'le="+Inf"')
+                    lines.append(f"{name}_bucket{inf_labels} {series.count}")
+                    lines.append(f"{name}_sum{_format_labels(series.labels)} {series.sum}")
+                    lines.append(f"{name}_count{_format_labels(series.labels)} {series.count}")
+                else:
+                    lines.append(f"{name}{_format_labels(series.labels)} {series.value}")
+
+        for collector in self._collectors:
+            try:
+                collected = collector()
+            except Exception as e:
+                logger.error(f"Metrics collector failed: {e}")
+                continue
+            for name, kind, help_text, samples in collected:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(sorted(labels.items())))} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Current value of a counter series (0 if it was never incremented)"""
+        family = self._families.get(name)
+        series = family['series'].get(tuple(sorted(labels.items()))) if family else None
+        return series.value if series else 0
+
+    def summary(self, name: str, limit: int = None) -> list[dict]:
+        """p50/p95/p99 in milliseconds per series of a histogram, busiest first"""
+        rows = []
+        for series in self.histograms(name):
+            if not series.count:
+                continue
+            rows.append({
+                'labels': dict(series.labels),
+                'count': series.count,
+                'p50': series.quantile(0.50) * 1000,
+                'p95': series.quantile(0.95) * 1000,
+                'p99': series.quantile(0.99) * 1000
+            })
+        rows.sort(key=lambda row: row['count'], reverse=True)
+        return rows[:limit] if limit else rows
+
+
+# Global metrics registry
+metrics = MetricsRegistry()
+
+HANDLER_DURATION = "bot_handler_duration_seconds"
+HANDLER_ERRORS = "bot_handler_errors_total"
+DB_CALL_DURATION = "bot_db_call_duration_seconds"
+PROVIDER_DURATION = "bot_provider_duration_seconds"
+PROVIDER_QUEUE_WAIT = "bot_provider_queue_wait_seconds"
+PROVIDER_ERRORS = "bot_provider_errors_total"
+TELEGRAM_REQUEST_DURATION = "bot_telegram_request_duration_seconds"
+RATE_LIMIT_REJECTIONS = "bot_rate_limit_rejections_total"
+DB_QUERIES = "bot_db_queries_total"
+DB_SLOW_QUERIES = "bot_db_slow_queries_total"
+HANDLER_DB_QUERIES = "bot_handler_db_queries_total"
+HANDLER_DB_TIME = "bot_handler_db_time_seconds_total"
+MEDIA_SENDS = "bot_media_sends_total"
+MEDIA_UPLOAD_BYTES = "bot_media_upload_bytes_total"
+MEDIA_REUSED_BYTES = "bot_media_reused_bytes_total"
+OUTPUT_DELIVERIES = "bot_output_deliveries_total"
+
+
+def timed_coroutine(func, histogram: Histogram, error_counter: Counter = None):
+    """Wrap a coroutine function so every call is observed in a histogram"""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            if error_counter is not None:
+                error_counter.inc()
+            raise
+        finally:
+            histogram.observe(time.monotonic() - started)
+
+    wrapper.__metrics_wrapped__ = True
+    return wrapper
+
+
+def instrument_module(module, metric_name: str = DB_CALL_DURATION, label: str = 'method'):
+    """Time every public coroutine function defined in a module (e.g. db_manager)"""
+    for attr_name, func in list(vars(module).items()):
+        if attr_name.startswith('_') or not inspect.iscoroutinefunction(func):
+            continue
+        if func.__module__ != module.__name__ or getattr(func, '__metrics_wrapped__', False):
+            continue
+        histogram = metrics.histogram(metric_name, "Duration of database manager calls", **{label: attr_name})
+        setattr(module, attr_name, timed_coroutine(func, histogram))
+
+
+def track_queries(func, name: str):
+    """Wrap a handler so the statements it issues are counted per update"""
+    from database.query_stats import query_scope
+
+    queries = metrics.counter(HANDLER_DB_QUERIES, "SQL statements issued by update handlers", handler=name)
+    db_time = metrics.counter(HANDLER_DB_TIME, "Time update handlers spent in SQL statements", handler=name)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with query_scope(name) as stats:
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                queries.inc(stats.count)
+                db_time.inc(stats.total_time)
+
+    return wrapper
+
+
+def _instrument_handler(handler):
+    """Wrap the callback of a handler (recursing into conversation handlers)"""
+    from telegram.ext import ConversationHandler
+
+    if isinstance(handler, ConversationHandler):
+        for child in handler.entry_points + handler.fallbacks:
+            _instrument_handler(child)
+        for state_handlers in handler.states.values():
+            for child in state_handlers:
+                _instrument_handler(child)
+        return
+
+    callback = getattr(handler, 'callback', None)
+    if callback is None or getattr(callback, '__metrics_wrapped__', False):
+        return
+
+    name = getattr(callback, '__qualname__', repr(callback))
+    handler.callback = timed_coroutine(
+        track_queries(callback, name),
+        metrics.histogram(HANDLER_DURATION, "Duration of update handler callbacks", handler=name),
+        metrics.counter(HANDLER_ERRORS, "Update handler callbacks that raised", handler=name)
+    )
+
+
+def instrument_application(application):
+    """Time every handler registered on the application"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument_handler(handler)
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that records the duration of every Bot API call per endpoint"""
+
+    async def do_request(self, url: str, method: str, request_data=None, **kwargs):
+        endpoint = url.rsplit('/', 1)[-1]
+        started = time.monotonic()
+        try:
+            return await super().do_request(url, method, request_data=request_data, **kwargs)
+        finally:
+            metrics.histogram(
+                TELEGRAM_REQUEST_DURATION, "Duration of outbound Telegram Bot API calls", endpoint=endpoint
+            ).observe(time.monotonic() - started)
+
+
+class MetricsServer:
+    """Minimal local HTTP server exposing /metrics in Prometheus text format"""
+
+    def __init__(self, host: str = config.METRICS_HOST, port: int = config.METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Metrics endpoint listening on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Drain the request headers
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b'\r\n', b'\n', b''):
+                pass
+
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                body = metrics.render_prometheus().encode('utf-8')
+                status = "200 OK"
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            else:
+                body = b"Not Found\n"
+                status = "404 Not Found"
+                content_type = "text/plain"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+# Global metrics endpoint
+metrics_server = MetricsServer()
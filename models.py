@@ -2,7 +2,7 @@
 Database models for the Telegram AI Bot
 """
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, BigInteger, Float
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, JSON, BigInteger, Float, Index, UniqueConstraint, func, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 
@@ -37,6 +37,16 @@ class User(Base):
     payments: Mapped[list["Payment"]] = relationship("Payment", back_populates="user", cascade="all, delete-orphan")
     user_limits: Mapped[list["UserLimit"]] = relationship("UserLimit", back_populates="user", cascade="all, delete-orphan")
 
+    # Admin browsing: keyset pages on (created_at, id), optionally within one filter value,
+    # and case-insensitive username prefix search
+    __table_args__ = (
+        Index('ix_users_created_at_id', 'created_at', 'id'),
+        Index('ix_users_package_created_at_id', 'package_id', 'created_at', 'id'),
+        Index('ix_users_premium_created_at_id', 'is_premium', 'created_at', 'id'),
+        Index('ix_users_language_created_at_id', 'language', 'created_at', 'id'),
+        Index('ix_users_username_lower', func.lower(username)),
+    )
+
     def __repr__(self):
         return f"<User(telegram_id={self.telegram_id}, username={self.username}, package_id={self.package_id})>"
 
@@ -86,9 +96,10 @@ class Payment(Base):
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     package_id: Mapped[int] = mapped_column(Integer, ForeignKey('premium_packages.id'), nullable=False)
     amount: Mapped[float] = mapped_column(Float, nullable=False)
-    status: Mapped[str] = mapped_column(String(20), default='pending', nullable=False) # pending, confirmed, failed
+    status: Mapped[str] = mapped_column(String(20), default='pending', nullable=False) # pending, confirmed, failed, expired (TTL), superseded (by a newer payment)
     payment_method: Mapped[str] = mapped_column(String(50), default='card_transfer', nullable=False)
     transaction_id: Mapped[str | None] = mapped_column(String(255), nullable=True) # Optional external ID
+    promo_code: Mapped[str | None] = mapped_column(String(50), nullable=True) # Applied promo, counted when confirmed
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     confirmed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
@@ -100,6 +111,24 @@ class Payment(Base):
         return f"<Payment(user_id={self.user_id}, package={self.package_id}, status={self.status}, amount={self.amount})>"
 
 
+class OpenPayment(Base):
+    """Index of pending payments (at most one per user and package) with what the admin list shows"""
+    __tablename__ = 'open_payments'
+
+    payment_id: Mapped[int] = mapped_column(Integer, ForeignKey('payments.id'), primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False)
+    package_id: Mapped[int] = mapped_column(Integer, ForeignKey('premium_packages.id'), nullable=False)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    package_name: Mapped[str] = mapped_column(String(100), nullable=False)
+    amount: Mapped[float] = mapped_column(Float, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    __table_args__ = (UniqueConstraint('user_id', 'package_id'),)
+
+    def __repr__(self):
+        return f"<OpenPayment(payment={self.payment_id}, user={self.user_id}, package={self.package_id})>"
+
+
 class PromoCode(Base):
     """Manages promotional codes for discounts or bonuses"""
     __tablename__ = 'promo_codes'
@@ -118,6 +147,28 @@ class PromoCode(Base):
         return f"<PromoCode(code={self.code}, discount={self.discount_percent}%, active={self.is_active})>"
 
 
+class PromoReservation(Base):
+    """One promo code use held for a user until the payment is confirmed, fails or the hold expires"""
+    __tablename__ = 'promo_reservations'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    promo_code_id: Mapped[int] = mapped_column(Integer, ForeignKey('promo_codes.id'), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    payment_id: Mapped[int | None] = mapped_column(Integer, ForeignKey('payments.id'), nullable=True, index=True)
+    status: Mapped[str] = mapped_column(String(20), default='reserved', nullable=False, index=True) # reserved, consumed, released
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    # At most one live reservation per user and code
+    __table_args__ = (
+        Index('ux_promo_reservations_live', 'promo_code_id', 'user_id', unique=True,
+              sqlite_where=text("status = 'reserved'"), postgresql_where=text("status = 'reserved'")),
+    )
+
+    def __repr__(self):
+        return f"<PromoReservation(promo={self.promo_code_id}, user={self.user_id}, status={self.status})>"
+
+
 class ServiceUsage(Base):
     """(Kept for compatibility, though limit checking moved to UserLimit)"""
     __tablename__ = 'service_usage'
@@ -155,3 +206,105 @@ class RequestLog(Base):
     
     def __repr__(self):
         return f"<RequestLog(user_id={self.user_id}, service={self.service_name}, status={self.status})>"
+
+
+class LatencyBucket(Base):
+    """Per service request counts and a DDSketch of processing_time for one time bucket, rolled up from request logs"""
+    __tablename__ = 'latency_buckets'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    service_name: Mapped[str] = mapped_column(String(50), nullable=False)
+    bucket_start: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+    requests: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    errors: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    processing_ms: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    sketch: Mapped[dict] = mapped_column(JSON, nullable=False)
+    # Highest request log id rolled into this bucket; the max over all buckets is the rollup watermark
+    max_log_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False, index=True)
+
+    __table_args__ = (UniqueConstraint('service_name', 'bucket_start'),)
+
+    def __repr__(self):
+        return f"<LatencyBucket(service={self.service_name}, start={self.bucket_start}, requests={self.requests})>"
+
+
+class MediaFile(Base):
+    """Telegram file_id of an uploaded asset, so identical media is re-sent without uploading it again"""
+    __tablename__ = 'media_files'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    content_hash: Mapped[str] = mapped_column(String(64), nullable=False) # sha256 of the uploaded bytes
+    media_type: Mapped[str] = mapped_column(String(20), nullable=False) # photo, document, audio, voice, video
+    file_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    file_unique_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # Key of the request that produced the asset, for deliveries that start from the request instead of the bytes
+    cache_key: Mapped[str | None] = mapped_column(String(64), nullable=True, unique=True)
+    size: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    __table_args__ = (UniqueConstraint('content_hash', 'media_type'),)
+
+    def __repr__(self):
+        return f"<MediaFile(type={self.media_type}, hash={self.content_hash[:12]}, file_id={self.file_id[:16]})>"
+
+
+class TranslationSegment(Base):
+    """Translation memory: the stored translation of one normalized sentence for a language pair"""
+    __tablename__ = 'translation_memory'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    source_hash: Mapped[str] = mapped_column(String(64), nullable=False) # sha256 of the normalized segment
+    source_lang: Mapped[str] = mapped_column(String(50), nullable=False)
+    target_lang: Mapped[str] = mapped_column(String(50), nullable=False)
+    source_text: Mapped[str] = mapped_column(Text, nullable=False)
+    translation: Mapped[str] = mapped_column(Text, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    # Lookups are by language pair and a batch of hashes
+    __table_args__ = (UniqueConstraint('source_lang', 'target_lang', 'source_hash'),)
+
+    def __repr__(self):
+        return f"<TranslationSegment({self.source_lang}->{self.target_lang}, hash={self.source_hash[:12]}, hits={self.hits})>"
+
+
+class LimitResetRun(Base):
+    """One run of the bulk quota reset; its id is the reset generation used to invalidate cached counters"""
+    __tablename__ = 'limit_reset_runs'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    started_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    finished_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    rows_reset: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    chunks: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    duration_ms: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f"<LimitResetRun(generation={self.id}, rows_reset={self.rows_reset})>"
+
+
+class GenerationJob(Base):
+    """Durable queue of long-running generation jobs (video, music) processed by background workers"""
+    __tablename__ = 'generation_jobs'
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    chat_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    service_name: Mapped[str] = mapped_column(String(50), nullable=False) # e.g., 'video_creation'
+    job_type: Mapped[str] = mapped_column(String(20), nullable=False) # video, music
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default='queued', nullable=False, index=True) # queued, running, done, failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = mapped_column(Integer, default=3, nullable=False)
+    worker_id: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    lease_expiry: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
+    result: Mapped[str | None] = mapped_column(Text, nullable=True)
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self):
+        return f"<GenerationJob(id={self.id}, type={self.job_type}, status={self.status}, attempts={self.attempts})>"
@@ -0,0 +1,181 @@
+"""
+Output Delivery - send results longer than one Telegram message
+
+A text message holds at most 4096 characters (UTF-16 code units), and longer
+texts are rejected outright. Long results are split on paragraph, line,
+sentence and finally word boundaries into pages: the first page is sent at
+once with inline ◀️/▶️ buttons, and the other pages are served from a
+short-lived in-memory cache by editing that message. Results above
+OUTPUT_DOCUMENT_CHARS are sent as a single .txt document instead.
+"""
+import re
+import secrets
+import time
+from collections import OrderedDict
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
+from telegram.ext import ContextTypes
+from database import db_manager
+from locales import get_text
+from utils.metrics import metrics, OUTPUT_DELIVERIES
+import config
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Split points from coarsest to finest; the separator stays with the text before it
+SPLIT_LEVELS = (
+    re.compile(r'\n[ \t]*\n\s*'),
+    re.compile(r'\n\s*'),
+    re.compile(r'(?<=[.!?…])\s+'),
+    re.compile(r'\s+')
+)
+
+
+def text_length(text: str) -> int:
+    """Length as Telegram counts it: UTF-16 code units (emoji outside the BMP count twice)"""
+    return len(text.encode('utf-16-le')) // 2
+
+
+def _hard_split(text: str, limit: int) -> list[str]:
+    pieces = []
+    current = []
+    length = 0
+    for char in text:
+        size = 2 if ord(char) > 0xFFFF else 1
+        if length + size > limit:
+            pieces.append("".join(current))
+            current = []
+            length = 0
+        current.append(char)
+        length += size
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def _pieces(text: str, limit: int, level: int = 0) -> list[str]:
+    """text as pieces of at most limit, split only as finely as needed"""
+    if text_length(text) <= limit:
+        return [text]
+    if level == len(SPLIT_LEVELS):
+        return _hard_split(text, limit)
+    pieces = []
+    start = 0
+    for match in SPLIT_LEVELS[level].finditer(text):
+        if match.end() > start:
+            pieces.extend(_pieces(text[start:match.end()], limit, level + 1))
+            start = match.end()
+    if start < len(text):
+        pieces.extend(_pieces(text[start:], limit, level + 1))
+    return pieces
+
+
+def paginate(text: str, limit: int = config.OUTPUT_PAGE_CHARS) -> list[str]:
+    """
+    Split text into pages of at most limit characters (UTF-16 units), filling
+    each page with whole paragraphs, then lines, sentences or words.
+    """
+    pages = []
+    current = ""
+    for piece in _pieces(text.strip(), limit):
+        if current and text_length(current + piece.rstrip()) > limit:
+            pages.append(current.rstrip())
+            current = ""
+        current += piece if current else piece.lstrip()
+    if current.strip():
+        pages.append(current.rstrip())
+    return pages
+
+
+class PageCache:
+    """Pages of recently sent long results, by random token, for a limited time"""
+
+    def __init__(self, ttl: float = config.OUTPUT_PAGE_TTL, max_entries: int = config.OUTPUT_PAGE_CACHE_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # token -> (expires at, chat id, pages), oldest first
+        self._entries = OrderedDict()
+
+    def put(self, chat_id: int, pages: list[str]) -> str:
+        now = time.monotonic()
+        while self._entries and (
+            len(self._entries) >= self.max_entries or next(iter(self._entries.values()))[0] <= now
+        ):
+            self._entries.popitem(last=False)
+        token = secrets.token_urlsafe(6)
+        self._entries[token] = (now + self.ttl, chat_id, pages)
+        return token
+
+    def get(self, token: str, chat_id: int) -> list[str] | None:
+        entry = self._entries.get(token)
+        if entry is None or entry[0] <= time.monotonic() or entry[1] != chat_id:
+            return None
+        return entry[2]
+
+
+page_cache = PageCache()
+
+
+def page_keyboard(token: str, index: int, count: int) -> InlineKeyboardMarkup:
+    """◀️ n/count ▶️ buttons (callback data pg:<token>:<page index>, pg:- for the counter)"""
+    buttons = []
+    if index > 0:
+        buttons.append(InlineKeyboardButton("◀️", callback_data=f"pg:{token}:{index - 1}"))
+    buttons.append(InlineKeyboardButton(f"{index + 1}/{count}", callback_data="pg:-"))
+    if index < count - 1:
+        buttons.append(InlineKeyboardButton("▶️", callback_data=f"pg:{token}:{index + 1}"))
+    return InlineKeyboardMarkup([buttons])
+
+
+async def deliver(message, text: str, language: str, reply_markup=None, filename: str = "result.txt"):
+    """
+    Reply to message with text of any length and return the sent message.
+    reply_markup (usually the main menu) goes with the result; paged results
+    carry their page buttons, so it follows in a separate main menu message.
+    """
+    length = text_length(text)
+    if length <= TELEGRAM_MESSAGE_LIMIT:
+        metrics.counter(OUTPUT_DELIVERIES, "Results sent, by delivery mode", mode="message").inc()
+        return await message.reply_text(text, reply_markup=reply_markup)
+
+    if length > config.OUTPUT_DOCUMENT_CHARS:
+        metrics.counter(OUTPUT_DELIVERIES, "Results sent, by delivery mode", mode="document").inc()
+        return await message.reply_document(
+            text.encode('utf-8'),
+            filename=filename,
+            caption=get_text(language, "output_document", chars=len(text)),
+            reply_markup=reply_markup
+        )
+
+    pages = paginate(text)
+    token = page_cache.put(message.chat.id, pages)
+    metrics.counter(OUTPUT_DELIVERIES, "Results sent, by delivery mode", mode="pages").inc()
+    sent = await message.reply_text(pages[0], reply_markup=page_keyboard(token, 0, len(pages)))
+    if reply_markup is not None:
+        await message.reply_text(get_text(language, "main_menu"), reply_markup=reply_markup)
+    return sent
+
+
+async def page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show another page of a paged result (callback data pg:<token>:<page index>)"""
+    query = update.callback_query
+    if query.data == "pg:-":
+        await query.answer()
+        return
+
+    _, token, index = query.data.split(':')
+    pages = page_cache.get(token, query.message.chat.id)
+    if pages is None:
+        language = await db_manager.get_user_language(update.effective_user.id)
+        await query.answer(get_text(language, "output_pages_expired"), show_alert=True)
+        await query.edit_message_reply_markup(reply_markup=None)
+        return
+
+    await query.answer()
+    index = min(int(index), len(pages) - 1)
+    try:
+        await query.edit_message_text(pages[index], reply_markup=page_keyboard(token, index, len(pages)))
+    except BadRequest as e:
+        # Double taps ask for the page that is already shown
+        if "not modified" not in str(e).lower():
+            raise
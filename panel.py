@@ -1,30 +1,55 @@
 """
 Admin Panel - User and service management
 """
-from telegram import Update
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from database import db_manager
 from locales import get_text
 from utils.decorators import admin_only
+from database.log_archive import log_archive
+from admin.exporter import EXPORTS, FORMATS, export_table, ProgressReporter
+from utils.analytics import WINDOWS, window_summary
 from services.premium import PremiumService
+from services.maintenance import notify_users
+from services.promo_engine import promo_engine
+from utils.media_store import message_file
+from utils.scheduler import provider_scheduler
+from utils.circuit_breaker import provider_guard
+from utils.metrics import (metrics, HANDLER_DURATION, DB_CALL_DURATION, PROVIDER_DURATION,
+                           TELEGRAM_REQUEST_DURATION, HANDLER_DB_QUERIES)
 import config
+import asyncio
+import os
+import tempfile
 from datetime import datetime, timedelta
 
 # Conversation states for Admin flow
 ADMIN_MENU, ADMIN_PROMO_CODE_CREATE = range(200, 202)
 
+# /list_users paging
+LIST_USERS_MAX_PAGE_SIZE = 50
+# Media an admin can broadcast by replying to it (Bot.send_<type> for each)
+BROADCAST_MEDIA_TYPES = ("photo", "video", "audio", "voice", "document")
+CURSOR_EPOCH = datetime(1970, 1, 1)
+
 class AdminPanel:
     """Admin panel for bot management"""
     
     @staticmethod
     @admin_only
     async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Show bot statistics and revenue data (4, 9-bandlar)"""
+        """
+        Show bot statistics and revenue data (4, 9-bandlar)
+        Usage: /admin_stats [1h|24h|7d|30d] - latency window, default 24h
+        """
         user = update.effective_user
         language = await db_manager.get_user_language(user.id)
-        
+
+        window = context.args[0] if context.args and context.args[0] in WINDOWS else "24h"
+
         # Get statistics
         stats = await db_manager.get_admin_stats()
+        latency = await window_summary(window)
         
         # Format service stats
         service_stats_text = ""
@@ -46,8 +71,27 @@ class AdminPanel:
                 total_revenue=f"{stats['total_revenue']:,.0f} UZS",
                 monthly_revenue=f"{stats['monthly_revenue']:,.0f} UZS",
                 pending_payments_count=stats['pending_payments_count']
-            )
+            ) + AdminPanel._format_latency(window, latency)
         )
+
+    @staticmethod
+    def _format_latency(window: str, latency: dict) -> str:
+        """Latency analytics block of /admin_stats"""
+        def ms(value):
+            if value is None:
+                return "-"
+            return f"{value / 1000:.1f}s" if value >= 1000 else f"{value:.0f}ms"
+
+        text = f"\n\n⏱ Latency ({window}):\n"
+        if not latency:
+            return text + "  No requests in this window"
+        for service, service_stats in latency.items():
+            text += (
+                f"  • {service}: p50 {ms(service_stats['p50'])} · p90 {ms(service_stats['p90'])} · "
+                f"p99 {ms(service_stats['p99'])} · err {service_stats['error_rate']:.1%} · "
+                f"{service_stats['per_minute']:.2f}/min ({service_stats['requests']})\n"
+            )
+        return text
     
     @staticmethod
     @admin_only
@@ -125,64 +169,124 @@ class AdminPanel:
     @admin_only
     async def list_users(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
-        List recent users (Updated to show package)
-        Usage: /list_users [limit]
+        Browse users page by page, newest first
+        Usage: /list_users [page size] [package=<key>] [premium=yes|no] [lang=uz|ru] [@username prefix]
         """
-        user = update.effective_user
-        language = await db_manager.get_user_language(user.id)
-        
+        usage = "Usage: /list_users [page size] [package=<key>] [premium=yes|no] [lang=uz|ru] [@username prefix]"
+        filters = {}
+        page_size = 10
+
         try:
-            # Parse limit
-            limit = 10
-            if context.args and len(context.args) > 0:
-                limit = int(context.args[0])
-            
-            # Get users
-            async with db_manager.async_session() as session:
-                from sqlalchemy import select
-                from database.models import User, PremiumPackage
-                
-                result = await session.execute(
-                    select(User, PremiumPackage.package_key)
-                    .outerjoin(PremiumPackage, User.package_id == PremiumPackage.id)
-                    .order_by(User.created_at.desc()).limit(limit)
-                )
-                
-                user_list_text = f"📋 Recent Users (showing {limit} max):\n\n"
-                for u, package_key in result.all():
-                    premium_badge = "⭐" if u.is_premium else ""
-                    package_name = package_key if package_key else 'N/A'
-                    user_list_text += (
-                        f"{premium_badge} ID: {u.telegram_id}\n"
-                        f"   Username: @{u.username or 'N/A'}\n"
-                        f"   Package: {package_name}\n"
-                        f"   Joined: {u.created_at.strftime('%Y-%m-%d')}\n\n"
-                    )
+            for arg in context.args or []:
+                if arg.isdigit():
+                    page_size = max(1, min(int(arg), LIST_USERS_MAX_PAGE_SIZE))
+                elif arg.startswith('@') and len(arg) > 1:
+                    filters['username_prefix'] = arg[1:]
+                elif arg.startswith('package='):
+                    filters['package_key'] = arg.split('=', 1)[1]
+                elif arg in ('premium=yes', 'premium=no'):
+                    filters['premium'] = arg == 'premium=yes'
+                elif arg.startswith('lang='):
+                    filters['language'] = arg.split('=', 1)[1]
+                else:
+                    raise ValueError(arg)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ Invalid argument {e}. {usage}")
+            return
 
-            await update.message.reply_text(user_list_text)
-        
-        except ValueError:
-            await update.message.reply_text(
-                "❌ Invalid limit. Usage: /list_users [limit]"
-            )
+        # Filters stay with the admin; the buttons only carry the cursor (64 byte callback data limit)
+        context.user_data['list_users'] = {"filters": filters, "page_size": page_size}
+
+        try:
+            text, reply_markup = await AdminPanel._users_page(context.user_data['list_users'])
+            await update.message.reply_text(text, reply_markup=reply_markup)
         except Exception as e:
             await update.message.reply_text(f"❌ Error: {str(e)}")
-    
+
+    @staticmethod
+    @admin_only
+    async def list_users_navigate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle the next/prev buttons of /list_users (callback data lu:<n|p>:<created_at us>:<id>)"""
+        query = update.callback_query
+        await query.answer()
+
+        state = context.user_data.get('list_users')
+        if not state:
+            await query.edit_message_text("⌛ This list has expired. Run /list_users again.")
+            return
+
+        _, direction, created_at, user_id = query.data.split(':')
+        cursor = (CURSOR_EPOCH + timedelta(microseconds=int(created_at)), int(user_id))
+
+        try:
+            text, reply_markup = await AdminPanel._users_page(state, cursor, backwards=direction == 'p')
+            await query.edit_message_text(text, reply_markup=reply_markup)
+        except Exception as e:
+            await query.edit_message_text(f"❌ Error: {str(e)}")
+
+    @staticmethod
+    async def _users_page(state: dict, cursor: tuple = None, backwards: bool = False):
+        """Render one /list_users page and its navigation buttons"""
+        rows, has_more = await db_manager.list_users_page(state['page_size'], cursor, backwards, **state['filters'])
+
+        filters = state['filters']
+        description = ", ".join(
+            f"{name}={'@' + value if name == 'username_prefix' else value}" for name, value in filters.items()
+        )
+        text = f"📋 Users{' (' + description + ')' if description else ''}:\n\n"
+        if not rows:
+            text += "No users found."
+
+        now = datetime.utcnow()
+        for row in rows:
+            premium_active = row['is_premium'] and (row['premium_expiry'] is None or row['premium_expiry'] > now)
+            text += (
+                f"{'⭐' if premium_active else ''} ID: {row['telegram_id']}\n"
+                f"   Username: @{row['username'] or 'N/A'}\n"
+                f"   Package: {row['package_key'] or 'N/A'} | Language: {row['language']}\n"
+                f"   Joined: {row['created_at'].strftime('%Y-%m-%d')}\n\n"
+            )
+
+        def cursor_data(direction: str, row: dict) -> str:
+            created_at = (row['created_at'] - CURSOR_EPOCH) // timedelta(microseconds=1)
+            return f"lu:{direction}:{created_at}:{row['id']}"
+
+        # Paging forwards there is always something before, paging backwards always something after
+        buttons = []
+        if rows and (has_more if backwards else cursor is not None):
+            buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=cursor_data('p', rows[0])))
+        if rows and (backwards or has_more):
+            buttons.append(InlineKeyboardButton("Next ➡️", callback_data=cursor_data('n', rows[-1])))
+
+        return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
     @staticmethod
     @admin_only
     async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """
-        Broadcast message to all users (Unchanged)
+        Broadcast message to all users
         Usage: /broadcast <message>
+        Reply to a photo, video, audio, voice or document with /broadcast [caption]
+        to broadcast that media; it is sent by file_id, without uploading it per user.
         """
         user = update.effective_user
         language = await db_manager.get_user_language(user.id)
         
         try:
+            media = None
+            replied = update.message.reply_to_message
+            if replied:
+                for media_type in BROADCAST_MEDIA_TYPES:
+                    sent = message_file(replied, media_type)
+                    if sent:
+                        media = (media_type, sent[0])
+                        break
+
             # Get message
-            if not context.args:
+            if not context.args and not media:
                 await update.message.reply_text(
-                    "Usage: /broadcast <message>\n\nExample: /broadcast Hello everyone!"
+                    "Usage: /broadcast <message>\n\nExample: /broadcast Hello everyone!\n\n"
+                    "Reply to a photo, video, audio or document with /broadcast [caption] to broadcast it."
                 )
                 return
             
@@ -202,10 +306,17 @@ class AdminPanel:
             
             for target_user in users:
                 try:
-                    await context.bot.send_message(
-                        chat_id=target_user.telegram_id,
-                        text=f"📢 Broadcast Message:\n\n{message}"
-                    )
+                    if media:
+                        media_type, file_id = media
+                        await getattr(context.bot, f"send_{media_type}")(
+                            target_user.telegram_id, file_id,
+                            caption=f"📢 {message}" if message else None
+                        )
+                    else:
+                        await context.bot.send_message(
+                            chat_id=target_user.telegram_id,
+                            text=f"📢 Broadcast Message:\n\n{message}"
+                        )
                     success_count += 1
                 except Exception:
                     fail_count += 1
@@ -261,6 +372,60 @@ class AdminPanel:
         except Exception as e:
             await update.message.reply_text(f"❌ Error: {str(e)}")
 
+    @staticmethod
+    @admin_only
+    async def confirm_payments(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Confirm several pending payments in one transaction
+        Usage: /confirm_payments <payment_id> [payment_id ...]
+        """
+        user = update.effective_user
+
+        try:
+            payment_ids = sorted({int(arg) for arg in context.args or []})
+        except ValueError:
+            await update.message.reply_text("❌ Invalid payment ID.")
+            return
+
+        if not payment_ids:
+            await update.message.reply_text("Usage: /confirm_payments <payment_id> [payment_id ...]")
+            return
+
+        try:
+            confirmed = await db_manager.confirm_payments(payment_ids, user.id)
+        except Exception as e:
+            await update.message.reply_text(f"❌ Error: {str(e)}")
+            return
+
+        skipped = [payment_id for payment_id in payment_ids if payment_id not in confirmed]
+        text = f"✅ Confirmed {len(confirmed)} payment(s): {', '.join(map(str, confirmed)) or '-'}"
+        if skipped:
+            text += f"\n⚠️ Not pending (already processed or missing): {', '.join(map(str, skipped))}"
+        await update.message.reply_text(text)
+
+        await notify_users(context.bot, list(confirmed.values()), "premium_activated_user_msg")
+
+    @staticmethod
+    @admin_only
+    async def reject_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Mark a pending payment as failed
+        Usage: /reject_payment <payment_id>
+        """
+        user = update.effective_user
+
+        try:
+            payment_id = int(context.args[0])
+        except (TypeError, IndexError, ValueError):
+            await update.message.reply_text("Usage: /reject_payment <payment_id>")
+            return
+
+        target_user_id = await db_manager.fail_payment(payment_id, user.id)
+        if target_user_id is None:
+            await update.message.reply_text(f"❌ Payment {payment_id} not found or already confirmed/failed.")
+        else:
+            await update.message.reply_text(f"🚫 Payment {payment_id} of user {target_user_id} marked as failed.")
+
     @staticmethod
     @admin_only
     async def list_pending_payments(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -320,6 +485,8 @@ class AdminPanel:
             )
             
             if success:
+                # A guess of this code may be cached as unknown
+                promo_engine.invalidate(code)
                 expiry_text = expiry_date.strftime("%Y-%m-%d") if expiry_date else "Cheksiz"
                 await update.message.reply_text(
                     f"✅ Promo code **{code}** created successfully:\n"
@@ -360,3 +527,149 @@ class AdminPanel:
             )
             
         await update.message.reply_text(promo_list_text, parse_mode='Markdown')
+
+    # --- PROVIDER MONITORING ---
+
+    @staticmethod
+    @admin_only
+    async def show_provider_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show provider queue wait per package, load per service and circuit breaker states"""
+        wait_stats = provider_scheduler.wait_stats()
+        service_stats = provider_scheduler.service_stats()
+
+        stats_text = "⏱ Provider Queue Wait (per package):\n\n"
+        for tier, stats in wait_stats.items():
+            stats_text += (
+                f"  • {tier}: p50 {stats['p50']:.0f} ms | p95 {stats['p95']:.0f} ms | "
+                f"max {stats['max']:.0f} ms ({stats['count']} calls)\n"
+            )
+
+        stats_text += "\n⚙️ Provider Load:\n\n"
+        if not service_stats:
+            stats_text += "  No provider calls yet\n"
+        for service_name, stats in service_stats.items():
+            stats_text += (
+                f"  • {service_name}: {stats['active']}/{stats['capacity']} active, "
+                f"{stats['queued']} queued\n"
+            )
+
+        guard_stats = provider_guard.stats()
+        if guard_stats:
+            stats_text += "\n🔌 Circuit Breakers:\n\n"
+        for service_name, stats in guard_stats.items():
+            transitions = ", ".join(f"{name}: {count}" for name, count in stats['transitions'].items()) or "none"
+            stats_text += (
+                f"  • {service_name}: {stats['state']} (limit {stats['limit']})\n"
+                f"    transitions: {transitions}\n"
+            )
+
+        await update.message.reply_text(stats_text)
+
+    @staticmethod
+    @admin_only
+    async def show_perf(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Show p50/p95/p99 latency of handlers, database calls, providers and Telegram calls"""
+        sections = [
+            ("🧭 Handlers", HANDLER_DURATION, 'handler', 15),
+            ("🗄 Database", DB_CALL_DURATION, 'method', 10),
+            ("🤖 Providers", PROVIDER_DURATION, 'service', None),
+            ("📡 Telegram API", TELEGRAM_REQUEST_DURATION, 'endpoint', 10)
+        ]
+
+        perf_text = "⏱ Performance (p50 / p95 / p99 ms):\n"
+        for title, metric_name, label, limit in sections:
+            perf_text += f"\n{title}:\n"
+            rows = metrics.summary(metric_name, limit)
+            if not rows:
+                perf_text += "  No data yet\n"
+            for row in rows:
+                name = row['labels'].get(label, '?')
+                perf_text += (
+                    f"  • {name}: {row['p50']:.0f} / {row['p95']:.0f} / "
+                    f"{row['p99']:.0f} (n={row['count']}"
+                )
+                if metric_name == HANDLER_DURATION:
+                    # Average SQL statements per update handled
+                    queries = metrics.counter_value(HANDLER_DB_QUERIES, handler=name)
+                    perf_text += f", sql={queries / row['count']:.1f}"
+                perf_text += ")\n"
+
+        await update.message.reply_text(perf_text)
+
+    @staticmethod
+    @admin_only
+    async def show_log_history(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Request statistics per service over live and archived request logs
+        Usage: /log_history [days]
+        """
+        try:
+            days = int(context.args[0]) if context.args else 90
+        except ValueError:
+            await update.message.reply_text("❌ Invalid number of days. Usage: /log_history [days]")
+            return
+
+        start = datetime.utcnow() - timedelta(days=days)
+        live = await db_manager.get_request_log_stats(start)
+        archived = await asyncio.to_thread(log_archive.aggregate, start)
+
+        history_text = f"🗂 Request history (last {days} days):\n\n"
+        for service_name in sorted(set(live) | set(archived)):
+            totals = {"requests": 0, "errors": 0, "processing_ms": 0}
+            for source in (live, archived):
+                for key, value in source.get(service_name, {}).items():
+                    totals[key] += value
+            avg_ms = totals['processing_ms'] / totals['requests'] if totals['requests'] else 0
+            history_text += (
+                f"  • {service_name}: {totals['requests']} requests, {totals['errors']} errors, "
+                f"avg {avg_ms:.0f} ms ({archived.get(service_name, {}).get('requests', 0)} archived)\n"
+            )
+        if not live and not archived:
+            history_text += "  No requests in this period\n"
+
+        summary = log_archive.summary()
+        history_text += (
+            f"\n📦 Archive: {summary['rows']} rows in {summary['chunks']} chunks "
+            f"({summary['bytes'] / 1024 / 1024:.1f} MB), {summary['oldest'] or '-'} … {summary['newest'] or '-'}"
+        )
+
+        await update.message.reply_text(history_text)
+
+    @staticmethod
+    @admin_only
+    async def export_data(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Export a table as gzip-compressed CSV/JSONL documents
+        Usage: /export users|payments|logs [from YYYY-MM-DD] [to YYYY-MM-DD] [csv|jsonl]
+        """
+        usage = "Usage: /export users|payments|logs [from YYYY-MM-DD] [to YYYY-MM-DD] [csv|jsonl]"
+        args = list(context.args or [])
+        if not args or args[0] not in EXPORTS:
+            await update.message.reply_text(usage)
+            return
+
+        kind = args.pop(0)
+        fmt = args.pop() if args and args[-1] in FORMATS else None
+        try:
+            start = datetime.strptime(args[0], "%Y-%m-%d") if len(args) > 0 else None
+            end = datetime.strptime(args[1], "%Y-%m-%d") if len(args) > 1 else None
+        except ValueError:
+            await update.message.reply_text(f"❌ Invalid date. {usage}")
+            return
+
+        status_message = await update.message.reply_text(f"⏳ Exporting {kind}...")
+
+        with tempfile.TemporaryDirectory() as directory:
+            try:
+                paths, rows_written = await export_table(
+                    kind, directory, start, end, fmt, progress=ProgressReporter(status_message, kind)
+                )
+            except Exception as e:
+                await status_message.edit_text(f"❌ Export failed: {e}")
+                return
+
+            for path in paths:
+                with open(path, 'rb') as document:
+                    await update.message.reply_document(document=document, filename=os.path.basename(path))
+
+        await status_message.edit_text(f"✅ Exported {rows_written:,} {kind} rows in {len(paths)} file(s)")
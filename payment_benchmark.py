@@ -0,0 +1,225 @@
+"""
+Payment confirmation concurrency test
+
+Creates --payments pending payments (one per user) on a scratch database,
+some reserving a promo code use ahead and some only naming a code capped at
+--promo-max-uses, then fires --calls overlapping confirm_payments calls at
+once: every payment is named by about --overlap calls, alone or in batches.
+The calls are split over --processes processes, so they race both within a
+process and in the database, as with two bot instances. Checks that
+
+  * every payment was confirmed by exactly one call,
+  * every user's subscription was extended exactly once,
+  * the promo code's uses stopped at its max_uses,
+
+and reports confirmation latency and throughput. Exits non-zero on a violation.
+
+Usage:
+    python payment_benchmark.py
+    python payment_benchmark.py --payments 500 --calls 300 --overlap 4 --processes 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import select
+
+import config
+from database import db_manager
+from database.models import User, PromoCode
+from utils.scheduler import percentile
+
+# First Telegram ID used for seeded users
+USER_ID_BASE = 910_000_000
+
+PROMO_CODE = "RACE"
+
+PACKAGE_KEY = "pro"
+
+
+async def seed(args) -> list[int]:
+    """Pending payments, one per user; returns their ids"""
+    await db_manager.create_promo_code(PROMO_CODE, discount=10, max_uses=args.promo_max_uses)
+    reserved_left = args.promo_reserved
+    price = config.PREMIUM_PACKAGES[PACKAGE_KEY]['price']
+    payment_ids = []
+    for index in range(args.payments):
+        telegram_id = USER_ID_BASE + index
+        await db_manager.get_or_create_user(telegram_id, f"payer{index}", f"Payer{index}")
+        promo_code = reservation_id = None
+        if index % 2:
+            promo_code = PROMO_CODE
+            if reserved_left:
+                reservation_id = await db_manager.reserve_promo_code(PROMO_CODE, telegram_id, timedelta(hours=1))
+                reserved_left -= 1
+        payment = await db_manager.create_pending_payment(telegram_id, PACKAGE_KEY, price, promo_code, reservation_id)
+        payment_ids.append(payment.id)
+    return payment_ids
+
+
+def overlapping_calls(payment_ids: list[int], calls: int, overlap: int, rng: random.Random) -> list[list[int]]:
+    """calls batches that together name every payment about overlap times"""
+    batches = [[] for _ in range(calls)]
+    for payment_id in payment_ids:
+        for batch_index in rng.sample(range(calls), min(overlap, calls)):
+            batches[batch_index].append(payment_id)
+    return [batch for batch in batches if batch]
+
+
+async def _confirm_concurrently(database_url: str, batches: list[list[int]], start_at: float) -> tuple:
+    """Fire all batches at once; returns (confirmed payment ids per call, latencies, errors)"""
+    db_manager.configure_engine(database_url)
+    latencies = []
+    errors = []
+
+    async def confirm(batch: list[int]) -> list[int]:
+        started = time.perf_counter()
+        try:
+            return list(await db_manager.confirm_payments(batch, admin_id=0))
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return []
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    # Processes start at different speeds; all of them fire at the same moment
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    results = await asyncio.gather(*(confirm(batch) for batch in batches))
+    await db_manager.dispose_engine()
+    return results, latencies, errors
+
+
+def _confirm_process(database_url: str, batches: list[list[int]], start_at: float) -> tuple:
+    logging.basicConfig(level=logging.WARNING)
+    return asyncio.run(_confirm_concurrently(database_url, batches, start_at))
+
+
+async def run_benchmark(args) -> dict:
+    db_manager.configure_engine(args.database_url)
+    await db_manager.init_db()
+    payment_ids = await seed(args)
+    promo_payments = sum(1 for index in range(args.payments) if index % 2)
+    batches = overlapping_calls(payment_ids, args.calls, args.overlap, random.Random(args.seed))
+    await db_manager.dispose_engine()
+
+    shares = [batches[index::args.processes] for index in range(args.processes)]
+    start_at = time.time() + args.start_delay
+    confirmed_before = datetime.utcnow()
+    with ProcessPoolExecutor(args.processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            asyncio.wrap_future(executor.submit(_confirm_process, args.database_url, share, start_at))
+            for share in shares
+        ]
+        outcomes = await asyncio.gather(*futures)
+    elapsed = time.time() - start_at
+    confirmed_after = datetime.utcnow()
+
+    claims = {}
+    latencies = []
+    errors = []
+    for results, process_latencies, process_errors in outcomes:
+        latencies.extend(process_latencies)
+        errors.extend(process_errors)
+        for result in results:
+            for payment_id in result:
+                claims[payment_id] = claims.get(payment_id, 0) + 1
+
+    duration = timedelta(days=config.PREMIUM_PACKAGES[PACKAGE_KEY]['duration_days'])
+    db_manager.configure_engine(args.database_url)
+    async with db_manager.async_session() as session:
+        expiries = (await session.scalars(
+            select(User.premium_expiry).where(User.telegram_id >= USER_ID_BASE,
+                                              User.telegram_id < USER_ID_BASE + args.payments)
+        )).all()
+        promo_uses = await session.scalar(select(PromoCode.current_uses).where(PromoCode.code == PROMO_CODE))
+    # Extended once: expiry is one duration after a moment during the run
+    extended_once = sum(
+        1 for expiry in expiries
+        if expiry and confirmed_before + duration <= expiry <= confirmed_after + duration
+    )
+
+    checks = {
+        "all_confirmed": len(claims) == len(payment_ids),
+        "confirmed_once": all(count == 1 for count in claims.values()),
+        "extended_once": extended_once == len(payment_ids),
+        "promo_capped": promo_uses == min(args.promo_max_uses, promo_payments),
+        "no_errors": not errors
+    }
+    await db_manager.dispose_engine()
+    return {
+        "payments": len(payment_ids),
+        "calls": len(batches),
+        "processes": args.processes,
+        "payments_per_call": round(sum(map(len, batches)) / len(batches), 1),
+        "elapsed_s": round(elapsed, 2),
+        "payments_per_s": round(len(claims) / elapsed, 1),
+        "call_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "call_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "promo_payments": promo_payments,
+        "promo_max_uses": args.promo_max_uses,
+        "promo_uses": promo_uses,
+        "errors": errors[:10],
+        "checks": checks
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"{report['payments']} payments, {report['calls']} overlapping calls in {report['processes']} processes "
+        f"({report['payments_per_call']} payments per call)"
+    )
+    print(
+        f"Confirmed in {report['elapsed_s']}s ({report['payments_per_s']} payments/s), "
+        f"call p50 {report['call_p50_ms']} ms, p95 {report['call_p95_ms']} ms"
+    )
+    print(
+        f"Promo {PROMO_CODE}: {report['promo_uses']} uses for {report['promo_payments']} payments "
+        f"(max_uses {report['promo_max_uses']})"
+    )
+    for error in report["errors"]:
+        print(f"  error: {error}")
+    for name, passed in report["checks"].items():
+        print(f"  {'ok  ' if passed else 'FAIL'} {name}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Fire overlapping payment confirmations and check they act once")
+    parser.add_argument("--payments", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=120, help="concurrent confirm_payments calls")
+    parser.add_argument("--overlap", type=int, default=3, help="calls naming each payment")
+    parser.add_argument("--processes", type=int, default=2, help="processes the calls are split over")
+    parser.add_argument("--start-delay", type=float, default=3.0,
+                        help="seconds the processes get to start before all of them fire")
+    parser.add_argument("--promo-max-uses", type=int, default=40, help="max_uses of the promo code (half the payments use it)")
+    parser.add_argument("--promo-reserved", type=int, default=10, help="promo payments that reserved their use ahead")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--database-url", help="database to use (default: a scratch SQLite file)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.database_url:
+            args.database_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'payments.db')}"
+        report = asyncio.run(run_benchmark(args))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if not all(report["checks"].values()):
+        raise SystemExit("Concurrent confirmations violated an invariant")
+
+
+if __name__ == "__main__":
+    main()
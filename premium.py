@@ -4,16 +4,16 @@ Premium Service - Subscription management
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from database import db_manager
+from services.promo_engine import promo_engine, RESERVED, THROTTLED
 from locales import get_text
 from utils.keyboards import get_main_menu_keyboard, get_premium_packages_keyboard, get_back_keyboard, get_payment_keyboard
-from datetime import datetime, timedelta
 import config
 import logging
 
 logger = logging.getLogger(__name__)
 
-# Conversation states for Premium flow
-SELECTING_PACKAGE, ENTERING_PROMO, WAITING_FOR_PAYMENT = range(100, 103)
+# Conversation states (defined in services.states)
+from services.states import SELECTING_PACKAGE, ENTERING_PROMO, WAITING_FOR_PAYMENT
 
 class PremiumService:
     """Premium subscription service and user flow"""
@@ -143,15 +143,16 @@ class PremiumService:
         # Check if user wants to skip promo code (Check both hardcoded skip and localized button)
         skip_words = [get_text(language, "premium_skip_promo").upper()]
         
+        reservation_id = None
         if promo_input in skip_words or update.message.text.lower() == get_text(language, "premium_skip_promo").lower():
             final_price = original_price
             promo_used = False
         else:
-            # Try to validate and apply promo code
-            promo_code_obj = await db_manager.get_promo_code(promo_input)
+            # Validate the code (cached) and reserve one use of it until the payment is confirmed
+            outcome, promo, reservation_id = await promo_engine.redeem(user.id, promo_input)
             
-            if promo_code_obj and promo_code_obj.discount_percent:
-                discount_percent = promo_code_obj.discount_percent
+            if outcome == RESERVED:
+                discount_percent = promo['discount_percent']
                 discount_amount = original_price * (discount_percent / 100)
                 final_price = original_price - discount_amount
                 context.user_data['promo_code'] = promo_input
@@ -159,12 +160,13 @@ class PremiumService:
                 await update.message.reply_text(
                     get_text(language, "promo_applied", discount=discount_percent, final_price=f"{final_price:,.0f} UZS")
                 )
-                # Increment promo usage here before payment is confirmed? No, confirm_payment should handle it.
                 promo_used = True
             else:
                 final_price = original_price
                 promo_used = False
-                await update.message.reply_text(get_text(language, "promo_invalid_skip"))
+                await update.message.reply_text(
+                    get_text(language, "promo_throttled" if outcome == THROTTLED else "promo_invalid_skip")
+                )
 
         # Proceed to payment page
         context.user_data['final_price'] = final_price
@@ -173,9 +175,14 @@ class PremiumService:
         card_number = config.MANUAL_CARD_NUMBER
         
         # Create pending payment record
-        payment = await db_manager.create_pending_payment(user.id, package_key, final_price)
+        payment = await db_manager.create_pending_payment(
+            user.id, package_key, final_price,
+            context.user_data.get('promo_code') if promo_used else None, reservation_id
+        )
         
         if not payment:
+            if reservation_id:
+                await promo_engine.release(reservation_id)
             await update.message.reply_text(get_text(language, "error"))
             return ConversationHandler.END
         
@@ -266,40 +273,8 @@ class PremiumService:
         """
         Activate premium subscription for a user (Called by admin or automated system)
         """
-        package_config = config.PREMIUM_PACKAGES.get(package_key)
-        
-        if not package_config:
-            # Fallback to Pro package config if key is unknown
-            package_config = config.PREMIUM_PACKAGES['pro'] 
-            
-        async with db_manager.async_session() as session:
-            from sqlalchemy import select
-            from database.models import User, PremiumPackage
-            
-            result = await session.execute(
-                select(User).where(User.telegram_id == telegram_id)
-            )
-            user = result.scalar_one_or_none()
-            
-            package_result = await session.execute(
-                select(PremiumPackage).where(PremiumPackage.package_key == package_key)
-            )
-            package = package_result.scalar_one_or_none()
-
-            if user and package:
-                user.is_premium = True
-                user.package_id = package.id
-                
-                # Calculate expiry date (Admin grant uses explicit 'days' parameter)
-                user.premium_expiry = datetime.utcnow() + timedelta(days=days)
-                
-                # Reset/Update Limits for User
-                await db_manager.reset_user_limits(session, user.id, package_key)
-                
-                await session.commit()
-                return True
-        
-        return False
+        # Admin grant uses the explicit 'days' parameter instead of the package duration
+        return await db_manager.grant_premium(telegram_id, days, package_key)
     
     @staticmethod
     async def deactivate_premium(telegram_id: int):
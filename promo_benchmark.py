@@ -0,0 +1,184 @@
+"""
+Promo redemption load test - one code redeemed by many concurrent users
+
+Creates a discount code with --max-uses uses on a scratch database and has
+--users users redeem it through PromoEngine.redeem at the same moment, split
+over --processes processes (each with its own engine, cache and reservation
+locks, as separate bot instances). --repeat of the users enter the code twice
+at once. Checks that
+
+  * the code's current_uses ends at exactly max_uses,
+  * exactly max_uses distinct reservations were handed out, at most one per user,
+  * no redemption failed (e.g. "database is locked"),
+
+and reports redemption latency and throughput. Exits non-zero on a violation.
+
+Usage:
+    python promo_benchmark.py
+    python promo_benchmark.py --users 2000 --max-uses 100 --processes 4
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import select, func
+
+from database import db_manager
+from database.models import PromoCode, PromoReservation
+from services.promo_engine import PromoEngine, RESERVED
+from utils.scheduler import percentile
+
+# First Telegram ID used for seeded users
+USER_ID_BASE = 920_000_000
+
+PROMO_CODE = "LAUNCH"
+
+
+async def _redeem_concurrently(database_url: str, telegram_ids: list[int], start_at: float) -> tuple:
+    """Redeem the code for every user at once; returns (outcomes, latencies, errors)"""
+    db_manager.configure_engine(database_url)
+    engine = PromoEngine()
+    latencies = []
+    errors = []
+
+    async def redeem(telegram_id: int) -> tuple:
+        started = time.perf_counter()
+        try:
+            outcome, _, reservation_id = await engine.redeem(telegram_id, PROMO_CODE)
+            return telegram_id, outcome, reservation_id
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return telegram_id, "error", None
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    # Processes start at different speeds; all of them fire at the same moment
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    outcomes = await asyncio.gather(*(redeem(telegram_id) for telegram_id in telegram_ids))
+    await db_manager.dispose_engine()
+    return outcomes, latencies, errors
+
+
+def _redeem_process(database_url: str, telegram_ids: list[int], start_at: float) -> tuple:
+    logging.basicConfig(level=logging.WARNING)
+    return asyncio.run(_redeem_concurrently(database_url, telegram_ids, start_at))
+
+
+async def run_benchmark(args) -> dict:
+    db_manager.configure_engine(args.database_url)
+    await db_manager.init_db()
+    await db_manager.create_promo_code(PROMO_CODE, discount=20, max_uses=args.max_uses)
+    telegram_ids = [USER_ID_BASE + index for index in range(args.users)]
+    for index, telegram_id in enumerate(telegram_ids):
+        await db_manager.get_or_create_user(telegram_id, f"promo{index}", f"Promo{index}")
+    await db_manager.dispose_engine()
+
+    # Repeated entries of one user go to the same process, as one user's updates do
+    attempts = telegram_ids + telegram_ids[:args.repeat]
+    shares = [[telegram_id for telegram_id in attempts if telegram_id % args.processes == index]
+              for index in range(args.processes)]
+    start_at = time.time() + args.start_delay
+    with ProcessPoolExecutor(args.processes, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            asyncio.wrap_future(executor.submit(_redeem_process, args.database_url, share, start_at))
+            for share in shares
+        ]
+        results = await asyncio.gather(*futures)
+    elapsed = time.time() - start_at
+
+    outcomes = {}
+    reservations = {}
+    latencies = []
+    errors = []
+    for process_outcomes, process_latencies, process_errors in results:
+        latencies.extend(process_latencies)
+        errors.extend(process_errors)
+        for telegram_id, outcome, reservation_id in process_outcomes:
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+            if outcome == RESERVED:
+                reservations.setdefault(telegram_id, set()).add(reservation_id)
+
+    db_manager.configure_engine(args.database_url)
+    async with db_manager.async_session() as session:
+        current_uses = await session.scalar(select(PromoCode.current_uses).where(PromoCode.code == PROMO_CODE))
+        stored_reservations = await session.scalar(
+            select(func.count()).select_from(PromoReservation).where(PromoReservation.status == 'reserved')
+        )
+    await db_manager.dispose_engine()
+
+    distinct = set().union(*reservations.values()) if reservations else set()
+    expected = min(args.max_uses, args.users)
+    checks = {
+        "uses_capped": current_uses == expected,
+        "reservations_capped": len(distinct) == expected and stored_reservations == expected,
+        "one_per_user": all(len(ids) == 1 for ids in reservations.values()),
+        "no_errors": not errors
+    }
+    return {
+        "users": args.users,
+        "attempts": len(attempts),
+        "processes": args.processes,
+        "max_uses": args.max_uses,
+        "current_uses": current_uses,
+        "outcomes": outcomes,
+        "elapsed_s": round(elapsed, 2),
+        "redemptions_per_s": round(len(attempts) / elapsed, 1),
+        "redeem_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "redeem_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "errors": errors[:10],
+        "checks": checks
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"{report['attempts']} redemptions of {PROMO_CODE} by {report['users']} users "
+        f"in {report['processes']} processes (max_uses {report['max_uses']})"
+    )
+    print(
+        f"Done in {report['elapsed_s']}s ({report['redemptions_per_s']} redemptions/s), "
+        f"p50 {report['redeem_p50_ms']} ms, p95 {report['redeem_p95_ms']} ms"
+    )
+    print(f"Outcomes: {report['outcomes']}; current_uses {report['current_uses']}")
+    for error in report["errors"]:
+        print(f"  error: {error}")
+    for name, passed in report["checks"].items():
+        print(f"  {'ok  ' if passed else 'FAIL'} {name}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Redeem one promo code from many concurrent users")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--max-uses", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=50, help="users who enter the code twice at once")
+    parser.add_argument("--processes", type=int, default=2, help="processes the users are split over")
+    parser.add_argument("--start-delay", type=float, default=3.0,
+                        help="seconds the processes get to start before all of them fire")
+    parser.add_argument("--database-url", help="database to use (default: a scratch SQLite file)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.database_url:
+            args.database_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'promo.db')}"
+        report = asyncio.run(run_benchmark(args))
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if not all(report["checks"].values()):
+        raise SystemExit("Concurrent redemptions violated an invariant")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Promo Engine - cached promo code validation, attempt throttling and usage reservation
+
+Lookups are served from an in-memory cache of known (positive) and unknown
+(negative) codes, so guessing does not hit the database per attempt; admins'
+/create_promo invalidates it. The cache only knows whether a code exists: a
+use is taken by an atomic reservation in the database, which is the single
+authority on max_uses.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import timedelta
+from database import db_manager
+import config
+
+logger = logging.getLogger(__name__)
+
+# redeem() outcomes
+RESERVED, INVALID, EXHAUSTED, THROTTLED = "reserved", "invalid", "exhausted", "throttled"
+
+
+class PromoEngine:
+    """Validates and reserves promo codes for the premium purchase flow"""
+
+    def __init__(self, ttl: float = config.PROMO_CACHE_TTL,
+                 negative_ttl: float = config.PROMO_NEGATIVE_CACHE_TTL,
+                 max_entries: int = config.PROMO_CACHE_MAX_ENTRIES,
+                 max_failed_attempts: int = config.PROMO_MAX_FAILED_ATTEMPTS,
+                 attempt_window: float = config.PROMO_ATTEMPT_WINDOW):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.max_failed_attempts = max_failed_attempts
+        self.attempt_window = attempt_window
+        # code -> (expires at, {discount_percent, bonus_days} or None for unknown codes)
+        self._cache = OrderedDict()
+        self._failed_attempts = {}
+        # code -> lookup in flight, shared by concurrent callers
+        self._inflight = {}
+        # code -> lock queueing this process's reservations of the code (only existing codes get here)
+        self._reserve_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, code: str = None):
+        """Forget one code (after it was created or changed) or the whole cache"""
+        if code is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(code.upper(), None)
+
+    def _remember(self, code: str, promo: dict | None):
+        ttl = self.ttl if promo else self.negative_ttl
+        self._cache[code] = (time.monotonic() + ttl, promo)
+        self._cache.move_to_end(code)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _load(self, code: str) -> dict | None:
+        try:
+            promo_code = await db_manager.get_promo_code(code, include_exhausted=True)
+            promo = None
+            if promo_code:
+                promo = {"discount_percent": promo_code.discount_percent, "bonus_days": promo_code.bonus_days}
+            self._remember(code, promo)
+            return promo
+        finally:
+            del self._inflight[code]
+
+    async def lookup(self, code: str) -> dict | None:
+        """Cached view of a promo code, None if it is unknown, inactive or expired"""
+        code = code.upper()
+        cached = self._cache.get(code)
+        if cached and cached[0] > time.monotonic():
+            self.hits += 1
+            return cached[1]
+
+        # A burst of users entering a new code triggers one query, not one each
+        if code not in self._inflight:
+            self.misses += 1
+            self._inflight[code] = asyncio.ensure_future(self._load(code))
+        return await asyncio.shield(self._inflight[code])
+
+    def is_throttled(self, user_id: int) -> bool:
+        """Whether the user entered too many invalid codes within the attempt window"""
+        failures = self._failed_attempts.get(user_id)
+        if not failures:
+            return False
+        cutoff = time.monotonic() - self.attempt_window
+        while failures and failures[0] < cutoff:
+            failures.popleft()
+        if not failures:
+            del self._failed_attempts[user_id]
+            return False
+        return len(failures) >= self.max_failed_attempts
+
+    def _record_failure(self, user_id: int):
+        self._failed_attempts.setdefault(user_id, deque()).append(time.monotonic())
+
+    async def redeem(self, user_id: int, code: str) -> tuple[str, dict | None, int | None]:
+        """
+        Validate a code entered by a user and reserve one use of it.
+        Returns (outcome, promo, reservation id); only RESERVED carries the last two.
+        """
+        if self.is_throttled(user_id):
+            return THROTTLED, None, None
+
+        promo = await self.lookup(code)
+        # The purchase flow only applies discount codes
+        if not promo or not promo["discount_percent"]:
+            self._record_failure(user_id)
+            return INVALID, None, None
+
+        # Reservations of one code update the same row and are serialized by the
+        # database anyway; queueing them here avoids lock polling (SQLite) during a burst
+        lock = self._reserve_locks.setdefault(code.upper(), asyncio.Lock())
+        async with lock:
+            reservation_id = await db_manager.reserve_promo_code(
+                code, user_id, timedelta(hours=config.PROMO_RESERVATION_TTL_HOURS)
+            )
+        if reservation_id is None:
+            # No uses left, or expired since it was cached
+            return EXHAUSTED, None, None
+
+        return RESERVED, promo, reservation_id
+
+    async def release(self, reservation_id: int):
+        """Give a reserved use back, e.g. when the payment could not be created"""
+        if await db_manager.release_promo_reservation(reservation_id):
+            logger.info(f"Released promo reservation {reservation_id}")
+
+    def stats(self) -> dict:
+        return {
+            "cached_codes": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "throttled_users": sum(1 for user_id in list(self._failed_attempts) if self.is_throttled(user_id))
+        }
+
+
+# Global promo engine
+promo_engine = PromoEngine()
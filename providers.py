@@ -0,0 +1,120 @@
+"""
+Provider gateway - single entry point for all AI provider calls
+"""
+import logging
+import time
+from database import db_manager
+from utils.scheduler import provider_scheduler
+from utils.circuit_breaker import provider_guard, CLOSED, HALF_OPEN, OPEN
+from utils.metrics import metrics, PROVIDER_DURATION, PROVIDER_QUEUE_WAIT, PROVIDER_ERRORS
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailable(Exception):
+    """Raised when a provider's circuit breaker is open and the call fails fast"""
+
+    def __init__(self, service_name: str):
+        super().__init__(f"Provider for '{service_name}' is temporarily unavailable")
+        self.service_name = service_name
+
+
+async def _log_transition(telegram_id: int, service_name: str, transition):
+    """Record a circuit breaker state change in the request log"""
+    if not transition:
+        return
+
+    old_state, new_state = transition
+    metrics.counter(
+        "bot_circuit_breaker_transitions_total", "Circuit breaker state transitions",
+        service=service_name, **{"from": old_state, "to": new_state}
+    ).inc()
+    logger.warning(f"Circuit breaker for {service_name}: {old_state} -> {new_state}")
+    try:
+        await db_manager.log_request(
+            telegram_id,
+            service_name,
+            {"event": "circuit_breaker", "from": old_state, "to": new_state},
+            config.CIRCUIT_BREAKER_LOG_STATUS,
+            error_message=f"Circuit breaker {old_state} -> {new_state}"
+        )
+    except Exception as e:
+        logger.error(f"Failed to log circuit breaker transition: {e}")
+
+
+async def timed_call_provider(service_name: str, telegram_id: int, provider, *args, **kwargs) -> tuple:
+    """
+    Call an integrate_*_api hook through the circuit breaker, the priority
+    scheduler and the adaptive concurrency limit of the service.
+    Returns (result, queue_wait, provider_time) with times in seconds.
+    Raises ProviderUnavailable without calling the provider when the breaker is open.
+    """
+    breaker = provider_guard.breaker(service_name)
+    limiter = provider_guard.limiter(service_name)
+
+    allowed, transition = breaker.allow_request()
+    # A half-open probe slot is held until the provider's outcome is recorded
+    settled = not allowed
+    try:
+        await _log_transition(telegram_id, service_name, transition)
+        if not allowed:
+            raise ProviderUnavailable(service_name)
+
+        package_key = await db_manager.get_user_package_key(telegram_id)
+
+        async with provider_scheduler.slot(service_name, package_key) as queue_wait:
+            metrics.histogram(
+                PROVIDER_QUEUE_WAIT, "Time provider calls waited for a scheduler slot",
+                service=service_name, package=package_key
+            ).observe(queue_wait)
+            started = time.monotonic()
+            try:
+                result = await provider(*args, **kwargs)
+            except Exception:
+                settled = True
+                # Failed and timed-out calls are often the slowest ones
+                metrics.histogram(PROVIDER_DURATION, "Duration of provider calls", service=service_name).observe(
+                    time.monotonic() - started
+                )
+                metrics.counter(PROVIDER_ERRORS, "Provider calls that raised", service=service_name).inc()
+                provider_scheduler.set_capacity(service_name, limiter.on_failure())
+                await _log_transition(telegram_id, service_name, breaker.record_failure())
+                raise
+
+            settled = True
+            provider_time = time.monotonic() - started
+            metrics.histogram(PROVIDER_DURATION, "Duration of provider calls", service=service_name).observe(provider_time)
+            provider_scheduler.set_capacity(service_name, limiter.on_success(provider_time))
+            await _log_transition(telegram_id, service_name, breaker.record_success())
+            return result, queue_wait, provider_time
+    finally:
+        if not settled:
+            # Cancelled, or failed before the provider answered: the probe proved nothing
+            breaker.release_probe()
+
+
+async def call_provider(service_name: str, telegram_id: int, provider, *args, **kwargs):
+    """Call an integrate_*_api hook through the provider gateway and return its result"""
+    result, _, _ = await timed_call_provider(service_name, telegram_id, provider, *args, **kwargs)
+    return result
+
+
+BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _collect_provider_state():
+    """Scrape-time gauges for breaker states, adaptive limits and scheduler queues"""
+    guard_stats = provider_guard.stats()
+    service_stats = provider_scheduler.service_stats()
+    return [
+        ("bot_circuit_breaker_state", "gauge", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+         [({"service": name}, BREAKER_STATE_VALUES[stats['state']]) for name, stats in guard_stats.items()]),
+        ("bot_provider_concurrency_limit", "gauge", "Current adaptive concurrency limit",
+         [({"service": name}, stats['limit']) for name, stats in guard_stats.items()]),
+        ("bot_provider_queued_calls", "gauge", "Provider calls waiting for a slot",
+         [({"service": name}, stats['queued']) for name, stats in service_stats.items()]),
+    ]
+
+
+metrics.register_collector(_collect_provider_state)
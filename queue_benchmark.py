@@ -0,0 +1,152 @@
+"""
+Generation queue benchmark - job throughput with a fake slow provider
+
+Submits a burst of --jobs video jobs from --users users to a scratch database
+and lets a GenerationQueue with each --workers count process them. The video
+provider is replaced by a fake one that sleeps --latency seconds, as a real
+video API would. Reports how long submitting took (what a handler waits for),
+jobs per second against the ideal workers / latency, end-to-end latency
+percentiles, and checks that every job was delivered exactly once.
+
+Usage:
+    python queue_benchmark.py
+    python queue_benchmark.py --jobs 200 --workers 1,4,8,16 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from database import db_manager
+from services.generation_queue import GenerationQueue
+from utils.scheduler import percentile
+
+# First Telegram ID used for seeded users
+USER_ID_BASE = 900_000_000
+
+
+class RecordingBot:
+    """Stands in for the Bot: records when each result message was sent"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.sent.append((chat_id, text, time.perf_counter()))
+
+
+def fake_provider(latency: float):
+    async def provider(payload: dict, lifecycle) -> str:
+        await asyncio.sleep(latency)
+        return f"result {payload['sequence']}"
+    return provider
+
+
+async def run_level(workers: int, args, run_index: int) -> dict:
+    bot = RecordingBot()
+    queue = GenerationQueue(workers=workers, poll_interval=0.2)
+    queue.register_provider("video", fake_provider(args.latency))
+
+    submitted = {}
+    started = time.perf_counter()
+    for index in range(args.jobs):
+        telegram_id = USER_ID_BASE + index % args.users
+        sequence = f"{run_index}-{index}"
+        job = await queue.submit(telegram_id, telegram_id, "video_creation", "video",
+                                 {"telegram_id": telegram_id, "language": "uz", "sequence": sequence})
+        if job is None:
+            raise SystemExit(f"Job {sequence} could not be queued")
+        submitted[sequence] = time.perf_counter()
+    submit_seconds = time.perf_counter() - started
+
+    # Workers start after the burst, so every level sees the same backlog
+    drain_started = time.perf_counter()
+    await queue.start(bot)
+    deadline = drain_started + args.timeout
+    while len(bot.sent) < args.jobs and time.perf_counter() < deadline:
+        await asyncio.sleep(0.02)
+    drain_seconds = time.perf_counter() - drain_started
+    await queue.stop()
+
+    delivered = {}
+    for _, text, sent_at in bot.sent:
+        sequence = text.rsplit(' ', 1)[-1]
+        delivered[sequence] = delivered.get(sequence, 0) + 1
+    duplicates = sum(count - 1 for count in delivered.values())
+    missing = len(set(submitted) - set(delivered))
+    end_to_end = [sent_at - submitted[text.rsplit(' ', 1)[-1]] for _, text, sent_at in bot.sent]
+
+    return {
+        "workers": workers,
+        "submit_ms_per_job": round(submit_seconds / args.jobs * 1000, 2),
+        "drain_s": round(drain_seconds, 2),
+        "jobs_per_s": round(len(delivered) / drain_seconds, 1),
+        "ideal_jobs_per_s": round(workers / args.latency, 1),
+        "end_to_end_p50_s": round(percentile(end_to_end, 50), 2),
+        "end_to_end_p95_s": round(percentile(end_to_end, 95), 2),
+        "delivered": len(delivered),
+        "duplicates": duplicates,
+        "missing": missing
+    }
+
+
+async def run_benchmark(args) -> dict:
+    db_manager.configure_engine(args.database_url)
+    await db_manager.init_db()
+    for index in range(args.users):
+        await db_manager.get_or_create_user(USER_ID_BASE + index, f"queue{index}", f"Queue{index}")
+
+    results = []
+    for run_index, workers in enumerate(args.workers):
+        results.append(await run_level(workers, args, run_index))
+    await db_manager.dispose_engine()
+    return {"jobs": args.jobs, "latency_s": args.latency, "results": results}
+
+
+def print_report(report: dict):
+    print(f"{report['jobs']} jobs, fake provider latency {report['latency_s']}s")
+    print(f"{'workers':>7} {'submit/job':>11} {'drain':>8} {'jobs/s':>8} {'ideal':>7} {'p50':>7} {'p95':>7} {'dup':>4} {'miss':>5}")
+    for result in report["results"]:
+        print(
+            f"{result['workers']:>7} {result['submit_ms_per_job']:>9.2f}ms {result['drain_s']:>7.2f}s "
+            f"{result['jobs_per_s']:>8.1f} {result['ideal_jobs_per_s']:>7.1f} {result['end_to_end_p50_s']:>6.2f}s "
+            f"{result['end_to_end_p95_s']:>6.2f}s {result['duplicates']:>4} {result['missing']:>5}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark generation queue throughput with a fake slow provider")
+    parser.add_argument("--jobs", type=int, default=100, help="jobs submitted per worker count")
+    parser.add_argument("--users", type=int, default=20, help="users the jobs are spread over")
+    parser.add_argument("--workers", default="1,4,8", help="comma separated worker pool sizes")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake provider latency per job (s)")
+    parser.add_argument("--timeout", type=float, default=120, help="give up waiting for a level after this many seconds")
+    parser.add_argument("--database-url", help="database to use (default: a scratch SQLite file)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+    args.workers = [int(count) for count in args.workers.split(',')]
+    return args
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        if not args.database_url:
+            args.database_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'queue.db')}"
+        report = asyncio.run(run_benchmark(args))
+
+    print_report(report)
+    failed = [result for result in report["results"] if result["duplicates"] or result["missing"]]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if failed:
+        raise SystemExit("Some jobs were lost or delivered twice")
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,10 @@ TRANSLATIONS = {
     "service_voice": "🎵 Голос и Музыка",
     "service_premium": "⭐ Премиум",
     
+    # Long results
+    "output_document": "📄 Результат слишком длинный ({chars} символов), поэтому отправлен файлом.",
+    "output_pages_expired": "⌛ Страницы этого результата больше недоступны.",
+    
     # Chat Service (unchanged)
     "chat_start": "💬 Услуга чата\n\nНапишите ваш вопрос:",
     "chat_response": "💬 Ответ:\n\n{response}",
@@ -31,6 +35,7 @@ TRANSLATIONS = {
     "translation_start": "🌐 Услуга перевода\n\nОтправьте текст для перевода:",
     "translation_select_source": "Выберите исходный язык:",
     "translation_select_target": "Выберите целевой язык:",
+    "translation_source_detected": "🔎 Исходный язык: {source} ({confidence}%). Чтобы выбрать другой, нажмите «⬅️ Назад».\n\nВыберите целевой язык:",
     "translation_result": "🌐 Перевод:\n\n{translation}",
     
     # Text Generation Service (unchanged)
@@ -72,6 +77,17 @@ TRANSLATIONS = {
     "voice_processing": "🎵 Создается...",
     "voice_result": "🎵 Аудио готово!",
     
+    # Background Jobs
+    "job_queued": "⏳ Ваш запрос поставлен в очередь (ID задачи: {job_id}). Результат будет отправлен, как только он будет готов.\n\nСтатус: /jobs",
+    "job_failed": "❌ Задача #{job_id} не выполнена. Пожалуйста, попробуйте позже.",
+    "jobs_header": "📋 Ваши задачи:",
+    "jobs_empty": "📋 У вас пока нет задач.",
+    "job_status_line": "#{job_id} • {service} • {status} • {created_at}",
+    "job_status_queued": "⏳ В очереди",
+    "job_status_running": "⚙️ Выполняется",
+    "job_status_done": "✅ Готово",
+    "job_status_failed": "❌ Ошибка",
+    
     # --- НОВЫЕ PREMIUM TEXTS ---
     "premium_start_main": "⭐ Premium Пакеты\n\n{current_status}\n\nВыберите один из следующих пакетов:\n\n{package_list}",
     "premium_package_info": "🌟 **{name}** ({price})\n\nПреимущества:\n{features}\n\nНажмите, чтобы выбрать пакет.",
@@ -84,6 +100,7 @@ TRANSLATIONS = {
     "premium_ask_promo": "🏷️ Если у вас есть Промокод, введите его. Если нет, нажмите **'ПРОДОЛЖИТЬ'**, чтобы перейти к оплате.",
     "premium_skip_promo": "ПРОДОЛЖИТЬ", # Text to skip promo code
     "promo_invalid_skip": "❌ Неверный промокод. Переход к оплате.",
+    "promo_throttled": "⏳ Слишком много неверных попыток. Введите промокод позже. Переход к оплате.",
     "promo_applied": "✅ Промокод успешно применен! Скидка **{discount}%**.\n\nИтоговая цена: **{final_price}**",
     
     # Payment Page
@@ -91,6 +108,7 @@ TRANSLATIONS = {
     "payment_confirm_btn": "ПОДТВЕРДИТЬ ОПЛАТУ",
     "payment_confirmation_sent": "⏳ Запрос на оплату отправлен администратору. Ваш Premium будет активирован в ближайшее время. Спасибо за ожидание!",
     "premium_activated_user_msg": "🎉 Ваша Premium подписка активирована! Теперь вы можете пользоваться всеми преимуществами.",
+    "premium_expired_user_msg": "⌛ Срок вашей Premium подписки истёк. Вы переведены на Базовый пакет. Чтобы продлить подписку, нажмите ⭐ Premium.",
     "payment_id_missing": "❌ ID платежа не найден. Пожалуйста, попробуйте сначала.",
 
     # Rate Limiting
@@ -0,0 +1,176 @@
+"""
+Priority scheduler for AI provider calls (premium priority processing)
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+import config
+
+# Number of recent wait samples kept per package for percentile reporting
+WAIT_SAMPLE_SIZE = 1000
+
+
+def percentile(samples, percent: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class PriorityScheduler:
+    """
+    Weighted-fair scheduler in front of provider calls.
+
+    Every service has a concurrency cap and one FIFO queue per package. When a
+    slot frees up, the next waiter is picked by stride scheduling: each package
+    advances its virtual time by 1/weight per dispatched call, and the package
+    with the smallest virtual time goes next. A waiter that has been queued
+    longer than max_wait is served first regardless of weight, so free users
+    are never starved by a steady stream of premium requests.
+    """
+
+    def __init__(self, weights: dict = config.PRIORITY_WEIGHTS,
+                 concurrency: dict = config.PROVIDER_CONCURRENCY,
+                 max_wait: float = config.PRIORITY_MAX_WAIT_SECONDS,
+                 default_concurrency: int = 5):
+        self.weights = weights
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.default_concurrency = default_concurrency
+        self._queues = {}
+        self._pass = {}
+        self._virtual_time = {}
+        self._active = {}
+        self._wait_samples = {tier: deque(maxlen=WAIT_SAMPLE_SIZE) for tier in weights}
+        self._capacity_override = {}
+
+    def _service_state(self, service_name: str):
+        """Lazily create the queues of a service"""
+        if service_name not in self._queues:
+            self._queues[service_name] = {tier: deque() for tier in self.weights}
+            self._pass[service_name] = {tier: 0.0 for tier in self.weights}
+            self._virtual_time[service_name] = 0.0
+            self._active[service_name] = 0
+        return self._queues[service_name]
+
+    def _capacity(self, service_name: str) -> int:
+        if service_name in self._capacity_override:
+            return self._capacity_override[service_name]
+        return self.concurrency.get(service_name, self.default_concurrency)
+
+    def set_capacity(self, service_name: str, capacity: int):
+        """Change the concurrency cap of a service at runtime (used by the adaptive limiter)"""
+        self._service_state(service_name)
+        grew = capacity > self._capacity(service_name)
+        self._capacity_override[service_name] = capacity
+        if grew:
+            self._dispatch(service_name)
+
+    def _has_waiters(self, service_name: str) -> bool:
+        return any(self._queues[service_name].values())
+
+    @asynccontextmanager
+    async def slot(self, service_name: str, tier: str):
+        """
+        Wait for a provider slot of a service. Yields the queue wait in seconds.
+        Usage: async with scheduler.slot("chat", "vip"): ...
+        """
+        if tier not in self.weights:
+            tier = 'basic'
+
+        queues = self._service_state(service_name)
+        enqueued_at = time.monotonic()
+
+        if self._active[service_name] < self._capacity(service_name) and not self._has_waiters(service_name):
+            self._active[service_name] += 1
+        else:
+            queue = queues[tier]
+            if not queue:
+                # An idle package rejoins at the current virtual time instead of bursting ahead
+                self._pass[service_name][tier] = max(self._pass[service_name][tier], self._virtual_time[service_name])
+            waiter = asyncio.get_running_loop().create_future()
+            queue.append((enqueued_at, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was granted just before cancellation, hand it on
+                    self._release(service_name)
+                raise
+
+        wait = time.monotonic() - enqueued_at
+        self._wait_samples[tier].append(wait)
+
+        try:
+            yield wait
+        finally:
+            self._release(service_name)
+
+    def _release(self, service_name: str):
+        """Free a slot and dispatch waiters"""
+        self._active[service_name] -= 1
+        self._dispatch(service_name)
+
+    def _dispatch(self, service_name: str):
+        """Hand free slots to waiters"""
+        while self._active[service_name] < self._capacity(service_name):
+            waiter = self._next_waiter(service_name)
+            if waiter is None:
+                break
+            self._active[service_name] += 1
+            waiter.set_result(None)
+
+    def _next_waiter(self, service_name: str):
+        """Pick the next waiter: starving requests first, then lowest virtual time"""
+        queues = self._queues[service_name]
+        passes = self._pass[service_name]
+
+        while True:
+            non_empty = [tier for tier, queue in queues.items() if queue]
+            if not non_empty:
+                return None
+
+            oldest_tier = min(non_empty, key=lambda t: queues[t][0][0])
+            if time.monotonic() - queues[oldest_tier][0][0] >= self.max_wait:
+                tier = oldest_tier
+            else:
+                tier = min(non_empty, key=lambda t: (passes[t], -self.weights[t]))
+
+            _, waiter = queues[tier].popleft()
+            if waiter.cancelled():
+                continue
+
+            self._virtual_time[service_name] = passes[tier]
+            passes[tier] += 1.0 / self.weights[tier]
+            return waiter
+
+    def wait_stats(self) -> dict:
+        """Queue wait percentiles per package in milliseconds"""
+        stats = {}
+        for tier, samples in self._wait_samples.items():
+            values = list(samples)
+            stats[tier] = {
+                'count': len(values),
+                'p50': percentile(values, 50) * 1000,
+                'p95': percentile(values, 95) * 1000,
+                'max': max(values) * 1000 if values else 0.0
+            }
+        return stats
+
+    def service_stats(self) -> dict:
+        """Active and queued calls per service"""
+        return {
+            service_name: {
+                'active': self._active[service_name],
+                'queued': sum(len(queue) for queue in queues.values()),
+                'capacity': self._capacity(service_name)
+            }
+            for service_name, queues in self._queues.items()
+        }
+
+
+# Global scheduler instance for provider calls
+provider_scheduler = PriorityScheduler()
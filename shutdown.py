@@ -0,0 +1,171 @@
+"""
+Shutdown Coordinator - drain the bot before the process exits
+
+On SIGTERM/SIGINT (a deploy) the coordinator stops fetching updates, lets the
+updates already fetched and the handlers in flight finish until a deadline,
+and only then stops the application. Handlers still running at the deadline
+are cancelled, so their RequestLifecycle is logged as interrupted rather than
+lost with the process. When the application has shut down, the registered
+flushers write buffered state (media store uses, analytics rollup), the SQLite
+WAL is checkpointed, and a summary of what was drained is logged.
+"""
+import asyncio
+import logging
+import signal
+import time
+from telegram.ext import Application, ConversationHandler
+from database import db_manager
+import config
+
+logger = logging.getLogger(__name__)
+
+# How often the drain checks whether the in-flight handlers finished
+DRAIN_POLL_INTERVAL = 0.05
+
+
+class ShutdownCoordinator:
+    """Tracks in-flight handler callbacks and drains them on shutdown"""
+
+    def __init__(self, drain_timeout: float = config.SHUTDOWN_DRAIN_TIMEOUT):
+        self.drain_timeout = drain_timeout
+        self.draining = False
+        # task running a handler callback -> (handler name, started)
+        self._in_flight = {}
+        self._flushers = []
+        self._drain_task = None
+        self.report = {"drained": [], "interrupted": [], "flushed": {}, "checkpoint": None}
+
+    def register_flush(self, name: str, flush):
+        """flush() (a coroutine function) runs once on shutdown, after all handlers and workers stopped"""
+        self._flushers.append((name, flush))
+
+    # --- In-flight tracking ---
+
+    def _track(self, callback, name: str):
+        async def wrapper(*args, **kwargs):
+            # Own task, so the deadline can cancel the handler without cancelling PTB's update fetcher
+            task = asyncio.ensure_future(callback(*args, **kwargs))
+            self._in_flight[task] = (name, time.monotonic())
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                _, started = self._in_flight.pop(task)
+                if self.draining:
+                    entry = {"handler": name, "seconds": round(time.monotonic() - started, 2)}
+                    self.report["interrupted" if task.cancelled() else "drained"].append(entry)
+
+            if task.cancelled():
+                # Cancelled by the drain deadline: end the conversation, the user starts over
+                return ConversationHandler.END
+            return task.result()
+
+        wrapper.__shutdown_tracked__ = True
+        wrapper.__qualname__ = getattr(callback, '__qualname__', repr(callback))
+        return wrapper
+
+    def _track_handler(self, handler):
+        if isinstance(handler, ConversationHandler):
+            for child in handler.entry_points + handler.fallbacks:
+                self._track_handler(child)
+            for state_handlers in handler.states.values():
+                for child in state_handlers:
+                    self._track_handler(child)
+            return
+
+        callback = getattr(handler, 'callback', None)
+        if callback is None or getattr(callback, '__shutdown_tracked__', False):
+            return
+        handler.callback = self._track(callback, getattr(callback, '__qualname__', repr(callback)))
+
+    def track_application(self, application: Application):
+        """Track every handler registered on the application"""
+        for handlers in application.handlers.values():
+            for handler in handlers:
+                self._track_handler(handler)
+
+    # --- Lifecycle ---
+
+    def install(self, application: Application):
+        """
+        Handle SIGTERM/SIGINT by draining (call from post_init; run_polling must be
+        started with stop_signals=None). A second signal stops without waiting.
+        """
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop, application)
+            except NotImplementedError:
+                # Windows event loops: Ctrl+C still stops run_polling, without the drain
+                logger.warning(f"Cannot handle {sig.name}; shutdown will not drain in-flight handlers")
+                return
+
+    def request_stop(self, application: Application):
+        if not application.running:
+            # Still starting up: nothing to drain
+            raise SystemExit
+        if self.draining:
+            logger.warning("Second stop signal: stopping without waiting for in-flight handlers")
+            application.stop_running()
+            return
+        self.draining = True
+        self._drain_task = asyncio.ensure_future(self.drain(application))
+
+    async def drain(self, application: Application):
+        """Stop fetching updates, wait for queued updates and in-flight handlers, then stop the application"""
+        started = time.monotonic()
+        deadline = started + self.drain_timeout
+        logger.info(
+            f"Draining: {len(self._in_flight)} handlers in flight, {application.update_queue.qsize()} updates queued "
+            f"(deadline {self.drain_timeout:.0f}s)"
+        )
+        try:
+            # Updates already fetched are confirmed to Telegram and must still be handled
+            if application.updater and application.updater.running:
+                await application.updater.stop()
+
+            while (self._in_flight or application.update_queue.qsize()) and time.monotonic() < deadline:
+                await asyncio.sleep(DRAIN_POLL_INTERVAL)
+
+            if self._in_flight:
+                names = ", ".join(name for name, _ in self._in_flight.values())
+                logger.warning(f"Drain deadline reached, cancelling {len(self._in_flight)} handlers: {names}")
+                tasks = list(self._in_flight)
+                for task in tasks:
+                    task.cancel("shutdown drain deadline")
+                # Cancelled handlers still log their request on the way out
+                await asyncio.wait(tasks, timeout=config.SHUTDOWN_CANCEL_GRACE)
+        finally:
+            self.report["drain_seconds"] = round(time.monotonic() - started, 2)
+            application.stop_running()
+
+    async def finish(self):
+        """Flush buffered state and checkpoint the database (call from post_shutdown, last)"""
+        for name, flush in self._flushers:
+            try:
+                result = await flush()
+                self.report["flushed"][name] = result if result is not None else "ok"
+            except Exception as e:
+                logger.error(f"Shutdown flush {name} failed: {e}")
+                self.report["flushed"][name] = f"failed: {e}"
+
+        try:
+            self.report["checkpoint"] = await db_manager.checkpoint_wal()
+        except Exception as e:
+            logger.error(f"WAL checkpoint failed: {e}")
+        await db_manager.dispose_engine()
+
+        report = self.report
+        logger.info(
+            f"Shutdown complete: drained {len(report['drained'])} handlers"
+            f"{', interrupted ' + str(len(report['interrupted'])) if report['interrupted'] else ''}"
+            f" in {report.get('drain_seconds', 0)}s; flushed {report['flushed']}; checkpoint {report['checkpoint']}"
+        )
+        for entry in report["interrupted"]:
+            logger.warning(f"Interrupted by shutdown: {entry['handler']} after {entry['seconds']}s")
+
+
+# Global shutdown coordinator
+shutdown_coordinator = ShutdownCoordinator()
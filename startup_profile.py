@@ -0,0 +1,161 @@
+"""
+Startup profile - import cost and time from process start to first handled update
+
+Two reports:
+  * python -X importtime of `import main`, summarized by the modules main
+    imports directly and by top-level package (self time);
+  * time to first update: fresh processes start the bot as run_polling does
+    (build_application, initialize, post_init, start) with an offline Bot API
+    transport and an existing scratch database, as in a rolling restart, then
+    handle /start and a main menu button (the first use of a lazily imported
+    service). Phases are measured from the moment the process was spawned.
+
+Usage:
+    python startup_profile.py
+    python startup_profile.py --runs 10 --top 15 --output startup.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ("imported", "built", "initialized", "started", "first_update", "first_service_update")
+
+
+def importtime_report(runs: int, top: int) -> dict:
+    """Median cumulative/self import times (ms) of `import main` over runs"""
+    direct = {}
+    packages = {}
+    totals = []
+    # The first run only fills the bytecode cache
+    for index in range(runs + 1):
+        output = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"],
+            capture_output=True, text=True, check=True
+        ).stderr
+        if not index:
+            continue
+        package_self = {}
+        for line in output.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            depth = (len(name) - len(name.lstrip())) // 2
+            name = name.strip()
+            package = name.split('.')[0]
+            package_self[package] = package_self.get(package, 0) + int(self_us) / 1000
+            if name == "main":
+                totals.append(int(cumulative_us) / 1000)
+            elif depth == 1:
+                direct.setdefault(name, []).append(int(cumulative_us) / 1000)
+        for package, value in package_self.items():
+            packages.setdefault(package, []).append(value)
+
+    def ranked(samples: dict) -> list:
+        medians = {name: statistics.median(values) for name, values in samples.items()}
+        return [[name, round(value, 1)] for name, value in sorted(medians.items(), key=lambda item: -item[1])[:top]]
+
+    return {
+        "import_main_ms": round(statistics.median(totals), 1),
+        "direct_imports": ranked(direct),
+        "packages_self": ranked(packages)
+    }
+
+
+async def _child(spawned_at: float, database_url: str):
+    """Start the bot offline and report when each phase completed (seconds since spawn)"""
+    marks = {}
+
+    def mark(phase: str):
+        marks[phase] = time.time() - spawned_at
+
+    import main
+    from benchmark import OfflineRequest, UpdateFactory
+    from database import db_manager
+    from locales import get_text
+    from telegram.ext import ExtBot
+    mark("imported")
+
+    db_manager.configure_engine(database_url)
+    transport = OfflineRequest()
+    bot = ExtBot(token="123456:OFFLINE", request=transport, get_updates_request=OfflineRequest())
+    application = main.build_application(bot=bot)
+    mark("built")
+
+    # The order of Application.run_polling
+    await application.initialize()
+    await main.post_init(application)
+    mark("initialized")
+    await application.start()
+    mark("started")
+
+    factory = UpdateFactory(application.bot)
+    telegram_id = 700_000_001
+    await application.process_update(factory.message(telegram_id, "/start"))
+    mark("first_update")
+    await application.process_update(factory.message(telegram_id, get_text("ru", "service_chat")))
+    mark("first_service_update")
+
+    await application.stop()
+    await main.post_shutdown(application)
+    await application.shutdown()
+    print(json.dumps(marks))
+
+
+def time_to_first_update(runs: int) -> dict:
+    """Median phase completion times (ms since spawn) of runs fresh processes"""
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'startup.db')}"
+        samples = {phase: [] for phase in PHASES}
+        # The first process creates the schema; later ones find it, as a restarted bot does
+        for index in range(runs + 1):
+            spawned_at = time.time()
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", str(spawned_at), database_url],
+                capture_output=True, text=True, check=True
+            ).stdout
+            marks = json.loads(output.strip().splitlines()[-1])
+            if index:
+                for phase in PHASES:
+                    samples[phase].append(marks[phase] * 1000)
+    return {phase: round(statistics.median(values)) for phase, values in samples.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile bot startup: imports and time to first handled update")
+    parser.add_argument("--runs", type=int, default=5, help="processes per measurement (medians are reported)")
+    parser.add_argument("--top", type=int, default=12, help="modules/packages listed")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--child", nargs=2, metavar=("SPAWNED_AT", "DATABASE_URL"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        asyncio.run(_child(float(args.child[0]), args.child[1]))
+        return
+
+    report = {"imports": importtime_report(args.runs, args.top), "startup_ms": time_to_first_update(args.runs)}
+
+    imports = report["imports"]
+    print(f"import main: {imports['import_main_ms']:.0f} ms (median of {args.runs})")
+    print("  imported by main (cumulative):")
+    for name, value in imports["direct_imports"]:
+        print(f"    {name:<36} {value:>8.1f} ms")
+    print("  by package (self):")
+    for name, value in imports["packages_self"]:
+        print(f"    {name:<36} {value:>8.1f} ms")
+    print("Time since process spawn (median):")
+    for phase, value in report["startup_ms"].items():
+        print(f"  {phase:<22} {value:>6} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Conversation states of the services
+
+Kept apart from the service modules so the handlers can be registered at
+startup without importing the services themselves (see main._lazy).
+"""
+
+# Chat
+WAITING_QUESTION = 1
+
+# Translation
+WAITING_TEXT, SELECTING_SOURCE, SELECTING_TARGET = range(3)
+
+# Text generation
+SELECTING_TYPE, ENTERING_TOPIC, SELECTING_LENGTH, SELECTING_TONE = range(4)
+
+# Video creation
+VIDEO_DESCRIPTION, VIDEO_LENGTH, VIDEO_STYLE, VIDEO_RATIO = range(4)
+
+# Image generation
+ENTERING_PROMPT, SELECTING_SIZE, IMAGE_STYLE, SELECTING_QUANTITY = range(4)
+
+# Voice & music
+SELECTING_MODE, ENTERING_TEXT, SELECTING_VOICE_STYLE, SELECTING_VOICE_LANG = range(4, 8)
+ENTERING_MUSIC_PROMPT, SELECTING_MUSIC_STYLE = range(8, 10)
+
+# Premium
+SELECTING_PACKAGE, ENTERING_PROMO, WAITING_FOR_PAYMENT = range(100, 103)
@@ -8,10 +8,13 @@ from locales import get_text
 from utils.keyboards import (get_main_menu_keyboard, get_text_type_keyboard,
                              get_text_length_keyboard, get_text_tone_keyboard)
 from utils.decorators import rate_limit 
+from utils.providers import ProviderUnavailable
+from utils.lifecycle import RequestLifecycle
+from utils.output_delivery import deliver
 import config
 
-# Conversation states
-SELECTING_TYPE, ENTERING_TOPIC, SELECTING_LENGTH, SELECTING_TONE = range(4)
+# Conversation states (defined in services.states)
+from services.states import SELECTING_TYPE, ENTERING_TOPIC, SELECTING_LENGTH, SELECTING_TONE
 
 class TextGenerationService:
     """Text generation service"""
@@ -130,32 +133,37 @@ class TextGenerationService:
         topic = context.user_data.get('topic', '')
         length = context.user_data.get('length', '')
         
-        # Show processing message
-        await update.message.reply_text(get_text(language, "processing"))
-        
-        # Log request
-        await db_manager.log_request(
-            user.id,
-            "text_generation",
-            {
-                "type": content_type,
-                "topic": topic,
-                "length": length,
-                "tone": tone
-            },
-            "success"
-        )
-        
-        # AI API integration point
-        generated_text = await TextGenerationService.integrate_ai_api(
-            content_type, topic, length, tone, language
-        )
-        
-        # Send generated text
-        await update.message.reply_text(
-            get_text(language, "textgen_result", text=generated_text),
-            reply_markup=get_main_menu_keyboard(language)
-        )
+        request_data = {
+            "type": content_type,
+            "topic": topic,
+            "length": length,
+            "tone": tone
+        }
+        
+        try:
+            # Timed and logged to RequestLog with the real final status
+            async with RequestLifecycle(user.id, "text_generation", request_data) as lifecycle:
+                # Show processing message
+                await lifecycle.send(update.message.reply_text(get_text(language, "processing")))
+                
+                # AI API integration point
+                generated_text = await lifecycle.call_provider(
+                    TextGenerationService.integrate_ai_api,
+                    content_type, topic, length, tone, language
+                )
+                
+                # Send generated text
+                await lifecycle.send(deliver(
+                    update.message, get_text(language, "textgen_result", text=generated_text), language,
+                    reply_markup=get_main_menu_keyboard(language), filename="text.txt"
+                ))
+        except ProviderUnavailable:
+            await update.message.reply_text(
+                get_text(language, "service_unavailable"),
+                reply_markup=get_main_menu_keyboard(language)
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
         
         # Clear context data
         context.user_data.clear()
@@ -7,10 +7,15 @@ from database import db_manager
 from locales import get_text
 from utils.keyboards import get_main_menu_keyboard, get_translation_language_keyboard
 from utils.decorators import rate_limit 
+from utils.providers import ProviderUnavailable
+from utils.lifecycle import RequestLifecycle
+from utils.output_delivery import deliver
+from utils.language_detect import detect
+from services import translation_memory
 import config
 
-# Conversation states
-WAITING_TEXT, SELECTING_SOURCE, SELECTING_TARGET = range(3)
+# Conversation states (defined in services.states)
+from services.states import WAITING_TEXT, SELECTING_SOURCE, SELECTING_TARGET
 
 class TranslationService:
     """Translation service"""
@@ -46,6 +51,17 @@ class TranslationService:
         # Store text in context
         context.user_data['translation_text'] = text
         
+        # Skip the source step when the language is recognized with confidence
+        detection = detect(text, config.SERVICE_PARAMS["translation"]["languages"])
+        if detection and detection.confidence >= config.LANGUAGE_DETECT_MIN_CONFIDENCE:
+            context.user_data['source_language'] = detection.language
+            await update.message.reply_text(
+                get_text(language, "translation_source_detected",
+                         source=detection.language, confidence=round(detection.confidence * 100)),
+                reply_markup=get_translation_language_keyboard(language)
+            )
+            return SELECTING_TARGET
+        
         # Ask for source language
         await update.message.reply_text(
             get_text(language, "translation_select_source"),
@@ -98,31 +114,43 @@ class TranslationService:
         text = context.user_data.get('translation_text', '')
         source_lang = context.user_data.get('source_language', '')
         
-        # Show processing message
-        await update.message.reply_text(get_text(language, "processing"))
-        
-        # Log request
-        await db_manager.log_request(
-            user.id,
-            "translation",
-            {
-                "text": text,
-                "source": source_lang,
-                "target": target_lang
-            },
-            "success"
-        )
-        
-        # AI API integration point
-        translation = await TranslationService.integrate_ai_api(
-            text, source_lang, target_lang, language
-        )
-        
-        # Send translation
-        await update.message.reply_text(
-            get_text(language, "translation_result", translation=translation),
-            reply_markup=get_main_menu_keyboard(language)
-        )
+        request_data = {
+            "text": text,
+            "source": source_lang,
+            "target": target_lang
+        }
+        
+        try:
+            # Timed and logged to RequestLog with the real final status
+            async with RequestLifecycle(user.id, "translation", request_data) as lifecycle:
+                # Show processing message
+                await lifecycle.send(update.message.reply_text(get_text(language, "processing")))
+                
+                async def translate_batch(segments: list[str]):
+                    # AI API integration point
+                    return await lifecycle.call_provider(
+                        TranslationService.integrate_ai_api,
+                        segments, source_lang, target_lang, language
+                    )
+
+                # Only sentences not translated before go to the provider
+                translation, memory_stats = await translation_memory.translate(
+                    text, source_lang, target_lang, translate_batch
+                )
+                lifecycle.extra.update(memory_stats)
+                
+                # Send translation
+                await lifecycle.send(deliver(
+                    update.message, get_text(language, "translation_result", translation=translation), language,
+                    reply_markup=get_main_menu_keyboard(language), filename="translation.txt"
+                ))
+        except ProviderUnavailable:
+            await update.message.reply_text(
+                get_text(language, "service_unavailable"),
+                reply_markup=get_main_menu_keyboard(language)
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
         
         # Clear context data
         context.user_data.clear()
@@ -130,12 +158,16 @@ class TranslationService:
         return ConversationHandler.END
     
     @staticmethod
-    async def integrate_ai_api(text: str, source_lang: str, target_lang: str, ui_language: str) -> str:
+    async def integrate_ai_api(segments: list[str], source_lang: str, target_lang: str, ui_language: str) -> list[str]:
         """
-        AI API integration point for translation
+        AI API integration point for translation.
+        Receives the sentences missing from the translation memory in one batch
+        and returns a list of their translations in the same order. They are
+        stored in the memory: clear the translation_memory table after
+        replacing the placeholder.
         """
-        # Placeholder translation
-        return f"[Translation Placeholder]\n\nOriginal ({source_lang}): {text}\n\nTranslated to {target_lang}: [Add API integration here]"
+        # Placeholder translation, one per sentence
+        return [f"[{target_lang}: {segment}]" for segment in segments]
     
     @staticmethod
     async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
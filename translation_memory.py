@@ -0,0 +1,86 @@
+"""
+Translation Memory - sentence-level reuse of earlier translations
+
+Input text is split into segments (sentences and lines). Each segment is
+looked up by its normalized text and language pair; only the misses are sent
+to the provider, in one batched call, and stored for the next request. The
+translation is reassembled with the original separators between segments.
+"""
+import hashlib
+import re
+import unicodedata
+from database import db_manager
+
+# Sentence ends followed by whitespace, and line breaks; kept for reassembly
+SEGMENT_BOUNDARY = re.compile(r'((?<=[.!?…])[ \t]+|\s*\n\s*)')
+
+
+def normalize(segment: str) -> str:
+    """Canonical form used as the memory key: NFC, single spaces, no outer whitespace"""
+    return unicodedata.normalize('NFC', ' '.join(segment.split()))
+
+
+def segment_hash(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+async def translate(text: str, source_lang: str, target_lang: str, translate_batch) -> tuple[str, dict]:
+    """
+    Translate text segment by segment through the memory.
+    translate_batch(segments) translates the missing normalized segments and
+    returns a list of their translations in the same order.
+    Returns (translation, stats for RequestLog.response_data).
+    """
+    parts = SEGMENT_BOUNDARY.split(text)
+    # parts alternates segment, separator, segment, ...
+    keys = {}
+    for segment in parts[0::2]:
+        normalized = normalize(segment)
+        if normalized:
+            keys.setdefault(segment_hash(normalized), normalized)
+
+    stored = await db_manager.get_translation_segments(source_lang, target_lang, list(keys))
+    misses = [source_hash for source_hash in keys if source_hash not in stored]
+
+    segments = 0
+    hits = 0
+    for segment in parts[0::2]:
+        normalized = normalize(segment)
+        if normalized:
+            segments += 1
+            hits += segment_hash(normalized) in stored
+    stats = {
+        "tm_segments": segments,
+        "tm_hits": hits,
+        "tm_hit_ratio": round(hits / segments, 3) if segments else 0.0,
+        "tm_provider_chars": sum(len(keys[source_hash]) for source_hash in misses)
+    }
+
+    translations = dict(stored)
+    if misses:
+        result = await translate_batch([keys[source_hash] for source_hash in misses])
+        # One joined string would silently drop the sentences served from memory
+        if not isinstance(result, list):
+            raise TypeError(f"Provider must return a list of translations, got {type(result).__name__}")
+        if len(result) != len(misses):
+            raise ValueError(f"Provider returned {len(result)} translations for {len(misses)} segments")
+        translations.update(zip(misses, result))
+
+    await db_manager.save_translation_segments(
+        source_lang, target_lang,
+        [(source_hash, keys[source_hash], translations[source_hash]) for source_hash in misses],
+        list(stored)
+    )
+
+    output = []
+    for index, part in enumerate(parts):
+        normalized = normalize(part) if index % 2 == 0 else ""
+        if not normalized:
+            # Separator or whitespace-only segment
+            output.append(part)
+            continue
+        # Keep the segment's own leading/trailing whitespace (start and end of the text)
+        leading = part[:len(part) - len(part.lstrip())]
+        trailing = part[len(part.rstrip()):]
+        output.append(leading + translations[segment_hash(normalized)] + trailing)
+    return "".join(output), stats
@@ -0,0 +1,117 @@
+"""
+TTS pipeline benchmark - time to first audio for long texts
+
+A --chars long text of mixed-length sentences is synthesized with the fake TTS
+provider (latency = base + per character) once as a single provider call, as
+before the pipeline, and then through utils.tts_pipeline at each concurrency
+level. Time to first audio is when the first voice message is ready to send.
+
+Usage:
+    python tts_benchmark.py --chars 5000 --concurrency 1,2,4,8
+    python tts_benchmark.py --base-latency 0.5 --ms-per-char 3 --runs 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from utils.tts_pipeline import FakeTTSProvider, OggOpusWriter, split_text, synthesize_parts
+
+WORDS = ("the", "voice", "assistant", "reads", "every", "sentence", "aloud", "while", "users", "wait",
+         "for", "audio", "messages", "to", "arrive", "quickly", "and", "clearly", "in", "order")
+
+
+def sample_text(chars: int, seed: int = 1) -> str:
+    """Sentences of 4 to 30 words, with some commas, up to chars characters"""
+    rng = random.Random(seed)
+    sentences = []
+    length = 0
+    while length < chars:
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 30))]
+        if len(words) > 12:
+            words[len(words) // 2] += ","
+        sentence = " ".join(words).capitalize() + rng.choice(".!?")
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)[:chars]
+
+
+async def run_single(text: str, provider: FakeTTSProvider) -> dict:
+    started = time.perf_counter()
+    writer = OggOpusWriter()
+    writer.append(await provider(text))
+    writer.finish()
+    elapsed = time.perf_counter() - started
+    return {"first_audio_s": elapsed, "total_s": elapsed, "parts": 1, "audio_s": writer.duration}
+
+
+async def run_pipeline(text: str, provider: FakeTTSProvider, concurrency: int) -> dict:
+    started = time.perf_counter()
+    first_audio = None
+    parts = 0
+    audio_seconds = 0.0
+    async for audio, seconds in synthesize_parts(text, provider, concurrency=concurrency):
+        if first_audio is None:
+            first_audio = time.perf_counter() - started
+        parts += 1
+        audio_seconds += seconds
+    return {"first_audio_s": first_audio, "total_s": time.perf_counter() - started,
+            "parts": parts, "audio_s": audio_seconds}
+
+
+def summarize(label: str, runs: list[dict]) -> dict:
+    return {
+        "mode": label,
+        "first_audio_s": round(statistics.median(run["first_audio_s"] for run in runs), 3),
+        "total_s": round(statistics.median(run["total_s"] for run in runs), 3),
+        "parts": runs[0]["parts"],
+        "audio_s": round(runs[0]["audio_s"], 1)
+    }
+
+
+async def run_benchmark(args) -> dict:
+    text = sample_text(args.chars)
+    provider = FakeTTSProvider(args.base_latency, args.ms_per_char / 1000)
+    results = [summarize("single call", [await run_single(text, provider) for _ in range(args.runs)])]
+    for concurrency in args.concurrency:
+        runs = [await run_pipeline(text, provider, concurrency) for _ in range(args.runs)]
+        results.append(summarize(f"chunked x{concurrency}", runs))
+    return {"chars": len(text), "chunks": len(split_text(text)), "results": results}
+
+
+def print_report(report: dict):
+    print(f"{report['chars']:,} characters, {report['chunks']} chunks")
+    print(f"{'mode':<14} {'first audio':>12} {'total':>9} {'parts':>6} {'audio':>8}")
+    for result in report["results"]:
+        print(
+            f"{result['mode']:<14} {result['first_audio_s']:>11.2f}s {result['total_s']:>8.2f}s "
+            f"{result['parts']:>6} {result['audio_s']:>7.1f}s"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark time to first audio of the TTS pipeline")
+    parser.add_argument("--chars", type=int, default=5000)
+    parser.add_argument("--concurrency", default="1,2,4,8", help="comma separated chunks in flight")
+    parser.add_argument("--base-latency", type=float, default=0.3, help="fake provider latency per call (s)")
+    parser.add_argument("--ms-per-char", type=float, default=2.0, help="fake provider latency per character")
+    parser.add_argument("--runs", type=int, default=3, help="runs per mode (the median is reported)")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    args = parser.parse_args()
+    args.concurrency = [int(level) for level in args.concurrency.split(',')]
+    return args
+
+
+def main():
+    args = parse_args()
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
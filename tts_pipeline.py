@@ -0,0 +1,284 @@
+"""
+TTS pipeline - chunked, concurrent speech synthesis of long texts
+
+Text is split into sentence-aligned chunks, which are synthesized concurrently
+(bounded) through the provider hook. The OGG/Opus audio of the chunks is
+remuxed in text order into voice messages: Opus packets are copied into one
+Ogg stream with rewritten page sequence numbers and granule positions, so
+nothing is decoded or re-encoded. The small first chunk becomes its own voice
+message, sent while the rest of the text is still being synthesized.
+"""
+import asyncio
+import io
+import random
+import re
+import struct
+import zlib
+
+import config
+
+# Sentence ends, then whitespace; paragraph breaks always split
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])\s+|\n\s*\n')
+# Fallback split points inside an overlong sentence
+CLAUSE_BOUNDARY = re.compile(r'(?<=[,;:])\s+')
+
+OPUS_SAMPLE_RATE = 48000
+
+
+def _split_long(sentence: str, max_chars: int) -> list[str]:
+    """Split a sentence longer than max_chars at clause boundaries, then at spaces"""
+    pieces = []
+    for clause in CLAUSE_BOUNDARY.split(sentence):
+        while len(clause) > max_chars:
+            cut = clause.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            pieces.append(clause[:cut].strip())
+            clause = clause[cut:].strip()
+        if clause:
+            pieces.append(clause)
+    return pieces
+
+
+def split_text(text: str, max_chars: int = config.TTS_CHUNK_CHARS,
+               first_chunk_chars: int = config.TTS_FIRST_CHUNK_CHARS) -> list[str]:
+    """
+    Pack whole sentences into chunks of at most max_chars (the first at most
+    first_chunk_chars); only a sentence longer than that is split inside.
+    """
+    chunks = []
+    current = ""
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        limit = first_chunk_chars if not chunks else max_chars
+        for piece in _split_long(sentence, limit) if len(sentence) > limit else [sentence]:
+            if current and len(current) + 1 + len(piece) > limit:
+                chunks.append(current)
+                current = ""
+                limit = max_chars
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# --- Ogg/Opus (RFC 3533, RFC 7845) ---
+
+# Each byte with its bits in reverse order
+_REVERSED_BITS = bytes(int(f'{value:08b}'[::-1], 2) for value in range(256))
+
+
+def ogg_crc(data: bytes) -> int:
+    """
+    Ogg page checksum: CRC-32 (polynomial 0x04C11DB7) MSB first, initial value
+    and final xor 0. zlib computes the bit-reversed variant in C, so reverse the
+    input bits and the result instead of looping over the bytes in Python.
+    """
+    reflected = zlib.crc32(data.translate(_REVERSED_BITS), 0xFFFFFFFF) ^ 0xFFFFFFFF
+    return int(f'{reflected:032b}'[::-1], 2)
+
+
+def ogg_page(packets: list[bytes], granule: int, serial: int, sequence: int, flags: int = 0) -> bytes:
+    """One Ogg page holding whole packets (flags: 0x02 first page, 0x04 last page)"""
+    lacing = bytearray()
+    for packet in packets:
+        lacing += b'\xff' * (len(packet) // 255) + bytes([len(packet) % 255])
+    page = bytearray(struct.pack('<4sBBqIIIB', b'OggS', 0, flags, granule, serial, sequence, 0, len(lacing)))
+    page += lacing + b''.join(packets)
+    struct.pack_into('<I', page, 22, ogg_crc(page))
+    return bytes(page)
+
+
+def opus_head(channels: int = 1, pre_skip: int = 312) -> bytes:
+    return b'OpusHead' + struct.pack('<BBHIhB', 1, channels, pre_skip, OPUS_SAMPLE_RATE, 0, 0)
+
+
+def opus_tags(vendor: bytes) -> bytes:
+    return b'OpusTags' + struct.pack('<I', len(vendor)) + vendor + struct.pack('<I', 0)
+
+
+def ogg_packets(data: bytes):
+    """Yield the packets of an Ogg stream (a single logical stream is assumed)"""
+    position = 0
+    packet = bytearray()
+    while position < len(data):
+        if data[position:position + 4] != b'OggS':
+            raise ValueError(f"Invalid Ogg page at byte {position}")
+        segments = data[position + 26]
+        table = data[position + 27:position + 27 + segments]
+        offset = position + 27 + segments
+        for lacing in table:
+            packet += data[offset:offset + lacing]
+            offset += lacing
+            if lacing < 255:
+                yield bytes(packet)
+                packet = bytearray()
+        position = offset
+    if packet:
+        yield bytes(packet)
+
+
+def opus_packet_samples(packet: bytes) -> int:
+    """Duration of an Opus packet in 48 kHz samples, from its TOC byte (RFC 6716, 3.1)"""
+    config_number = packet[0] >> 3
+    if config_number < 12:
+        frame = (480, 960, 1920, 2880)[config_number % 4]
+    elif config_number < 16:
+        frame = (480, 960)[config_number % 2]
+    else:
+        frame = (120, 240, 480, 960)[config_number % 4]
+    code = packet[0] & 0x03
+    frames = 1 if code == 0 else 2 if code in (1, 2) else packet[1] & 0x3F
+    return frame * frames
+
+
+class OggOpusWriter:
+    """
+    Remuxes the Opus packets of several OGG/Opus streams, in the order they are
+    appended, into a single stream. Pages are written as soon as they fill up.
+    The first stream's OpusHead is kept; later streams must have the same
+    channel count. Their encoder pre-skip (a few ms) is played, not trimmed.
+    """
+
+    PAGE_TARGET_BYTES = 4096
+
+    def __init__(self, serial: int = None):
+        self.serial = serial if serial is not None else random.getrandbits(32)
+        self._output = io.BytesIO()
+        self._sequence = 0
+        self._granule = 0
+        self._pre_skip = 0
+        self._channels = None
+        self._page = []
+        self._page_bytes = 0
+        self._page_lacing = 0
+
+    @property
+    def duration(self) -> float:
+        """Seconds of audio appended so far"""
+        return max(self._granule - self._pre_skip, 0) / OPUS_SAMPLE_RATE
+
+    @property
+    def has_audio(self) -> bool:
+        return self._granule > 0
+
+    def _write_page(self, packets: list[bytes], granule: int, flags: int = 0):
+        self._output.write(ogg_page(packets, granule, self.serial, self._sequence, flags))
+        self._sequence += 1
+
+    def _flush_page(self, flags: int = 0):
+        if self._page or flags:
+            self._write_page(self._page, self._granule, flags)
+            self._page = []
+            self._page_bytes = 0
+            self._page_lacing = 0
+
+    def append(self, stream: bytes):
+        """Append the audio of one OGG/Opus stream"""
+        packets = ogg_packets(stream)
+        head = next(packets, b'')
+        if not head.startswith(b'OpusHead'):
+            raise ValueError("Not an Ogg Opus stream")
+        next(packets, None)  # OpusTags
+
+        channels = head[9]
+        if self._channels is None:
+            self._channels = channels
+            self._pre_skip = struct.unpack_from('<H', head, 10)[0]
+            self._write_page([head], 0, flags=0x02)
+            self._write_page([opus_tags(b'tts_pipeline')], 0)
+        elif channels != self._channels:
+            raise ValueError(f"Cannot join {channels} channel audio to {self._channels} channel audio")
+
+        for packet in packets:
+            # A page holds at most 255 lacing values
+            lacing = len(packet) // 255 + 1
+            if self._page and (self._page_bytes >= self.PAGE_TARGET_BYTES or self._page_lacing + lacing > 255):
+                self._flush_page()
+            self._page.append(packet)
+            self._page_bytes += len(packet)
+            self._page_lacing += lacing
+            self._granule += opus_packet_samples(packet)
+
+    def finish(self) -> bytes:
+        """Write the last page (end of stream) and return the whole stream"""
+        self._flush_page(flags=0x04)
+        return self._output.getvalue()
+
+
+async def synthesize_parts(text: str, synthesize, concurrency: int = config.TTS_CONCURRENCY,
+                           part_max_seconds: float = config.TTS_PART_MAX_SECONDS):
+    """
+    Async generator of voice message parts for text: (OGG/Opus bytes, seconds).
+    synthesize(chunk) returns the OGG/Opus audio of one chunk. Once the first
+    chunk returned audio, the others start in order with at most concurrency
+    in flight; the first part is the first chunk alone, the following parts hold up to part_max_seconds of audio.
+    A str returned for the first chunk (placeholder provider) is yielded as is,
+    and ends the generator before any other chunk is sent to the provider.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(chunk: str):
+        async with semaphore:
+            return await synthesize(chunk)
+
+    chunks = split_text(text)
+    tasks = [asyncio.ensure_future(run(chunks[0]))] if chunks else []
+    try:
+        writer = OggOpusWriter()
+        for index in range(len(chunks)):
+            audio = await tasks[index]
+            if index == 0:
+                if isinstance(audio, str):
+                    yield audio
+                    return
+                # The provider returns audio: synthesize the other chunks concurrently
+                tasks.extend(asyncio.ensure_future(run(chunk)) for chunk in chunks[1:])
+            elif not isinstance(audio, bytes):
+                raise TypeError(f"TTS provider returned {type(audio).__name__} after audio")
+
+            writer.append(audio)
+            if index == 0 or writer.duration >= part_max_seconds:
+                yield writer.finish(), writer.duration
+                writer = OggOpusWriter()
+
+        if writer.has_audio:
+            yield writer.finish(), writer.duration
+    finally:
+        # The consumer stopped early (error, cancelled request)
+        for task in tasks:
+            task.cancel()
+
+
+class FakeTTSProvider:
+    """
+    Stand-in TTS provider for benchmarks and local testing: returns valid mono
+    OGG/Opus of silence (TOC-only, i.e. DTX, 20 ms frames) lasting as long as
+    the text takes to read, after a latency that grows with the text length.
+    """
+
+    def __init__(self, base_latency: float = 0.3, seconds_per_char: float = 0.001,
+                 chars_per_second: float = 15.0):
+        self.base_latency = base_latency
+        self.seconds_per_char = seconds_per_char
+        self.chars_per_second = chars_per_second
+        self.calls = 0
+
+    def encode(self, text: str) -> bytes:
+        frames = max(1, round(len(text) / self.chars_per_second / 0.02))
+        serial = random.getrandbits(32)
+        pages = [ogg_page([opus_head()], 0, serial, 0, flags=0x02), ogg_page([opus_tags(b'fake')], 0, serial, 1)]
+        granule = 312
+        for start in range(0, frames, 255):
+            # CELT fullband 20 ms, mono, one frame without data
+            packets = [b'\xf8'] * min(255, frames - start)
+            granule += 960 * len(packets)
+            pages.append(ogg_page(packets, granule, serial, len(pages), flags=0x04 if start + 255 >= frames else 0))
+        return b''.join(pages)
+
+    async def __call__(self, text: str) -> bytes:
+        self.calls += 1
+        await asyncio.sleep(self.base_latency + self.seconds_per_char * len(text))
+        return self.encode(text)
@@ -23,6 +23,10 @@ TRANSLATIONS = {
     "service_voice": "🎵 Ovoz va Musiqa",
     "service_premium": "⭐ Premium",
     
+    # Long results
+    "output_document": "📄 Natija juda uzun ({chars} belgi), shuning uchun fayl sifatida yuborildi.",
+    "output_pages_expired": "⌛ Bu natija sahifalari endi mavjud emas.",
+    
     # Chat Service (unchanged)
     "chat_start": "💬 Chat xizmati\n\nSavolingizni yozing:",
     "chat_response": "💬 Javob:\n\n{response}",
@@ -31,6 +35,7 @@ TRANSLATIONS = {
     "translation_start": "🌐 Tarjima xizmati\n\nTarjima qilish uchun matnni yuboring:",
     "translation_select_source": "Manba tilini tanlang:",
     "translation_select_target": "Maqsad tilini tanlang:",
+    "translation_source_detected": "🔎 Manba tili: {source} ({confidence}%). Boshqa tilni tanlash uchun «⬅️ Orqaga» tugmasini bosing.\n\nMaqsad tilini tanlang:",
     "translation_result": "🌐 Tarjima:\n\n{translation}",
     
     # Text Generation Service (unchanged)
@@ -72,6 +77,17 @@ TRANSLATIONS = {
     "voice_processing": "🎵 Yaratilmoqda...",
     "voice_result": "🎵 Audio tayyor!",
     
+    # Background Jobs
+    "job_queued": "⏳ So'rovingiz navbatga qo'shildi (Vazifa ID: {job_id}). Natija tayyor bo'lishi bilan sizga yuboriladi.\n\nHolatni ko'rish: /jobs",
+    "job_failed": "❌ Vazifa #{job_id} bajarilmadi. Iltimos, keyinroq qaytadan urinib ko'ring.",
+    "jobs_header": "📋 Sizning vazifalaringiz:",
+    "jobs_empty": "📋 Sizda hali vazifalar yo'q.",
+    "job_status_line": "#{job_id} • {service} • {status} • {created_at}",
+    "job_status_queued": "⏳ Navbatda",
+    "job_status_running": "⚙️ Bajarilmoqda",
+    "job_status_done": "✅ Tayyor",
+    "job_status_failed": "❌ Xatolik",
+    
     # --- YANGI PREMIUM TEXTS ---
     "premium_start_main": "⭐ Premium Paketlar\n\n{current_status}\n\nQuyidagi paketlardan birini tanlang:\n\n{package_list}",
     "premium_package_info": "🌟 **{name}** ({price})\n\nAfzalliklari:\n{features}\n\nPaketni tanlash uchun ustiga bosing.",
@@ -84,6 +100,7 @@ TRANSLATIONS = {
     "premium_ask_promo": "🏷️ Agar Promo kodingiz bo'lsa, uni kiriting. Agar yo'q bo'lsa, to'lov sahifasiga o'tish uchun **'O'TKAZISH'** tugmasini bosing.",
     "premium_skip_promo": "O'TKAZISH", # Text to skip promo code
     "promo_invalid_skip": "❌ Noto'g'ri promo kod. To'lov sahifasiga o'tilmoqda.",
+    "promo_throttled": "⏳ Juda ko'p noto'g'ri urinishlar. Promo kodni keyinroq kiriting. To'lov sahifasiga o'tilmoqda.",
     "promo_applied": "✅ Promo kod muvaffaqiyatli qo'llandi! **{discount}%** chegirma.\n\nYakuniy narx: **{final_price}**",
     
     # Payment Page
@@ -91,6 +108,7 @@ TRANSLATIONS = {
     "payment_confirm_btn": "TO'LOVNI TASDIQLASH",
     "payment_confirmation_sent": "⏳ To'lov so'rovi administratorga yuborildi. Tez orada Premiumingiz faollashadi. E'tiboringiz uchun rahmat!",
     "premium_activated_user_msg": "🎉 Premium obunangiz faollashdi! Endi cheksiz imkoniyatlardan foydalanishingiz mumkin.",
+    "premium_expired_user_msg": "⌛ Premium obunangiz muddati tugadi. Siz Asosiy paketga o'tkazildingiz. Obunani yangilash uchun ⭐ Premium tugmasini bosing.",
     "payment_id_missing": "❌ To'lov ID topilmadi. Iltimos, boshidan urinib ko'ring.",
 
     # Rate Limiting
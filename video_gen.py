@@ -8,10 +8,16 @@ from locales import get_text
 from utils.keyboards import (get_main_menu_keyboard, get_video_length_keyboard,
                              get_video_style_keyboard, get_video_ratio_keyboard)
 from utils.decorators import rate_limit 
+from services.generation_queue import generation_queue
 import config
 
-# Conversation states
-ENTERING_DESCRIPTION, SELECTING_LENGTH, SELECTING_STYLE, SELECTING_RATIO = range(4)
+# Conversation states (defined in services.states)
+from services.states import (
+    VIDEO_DESCRIPTION as ENTERING_DESCRIPTION,
+    VIDEO_LENGTH as SELECTING_LENGTH,
+    VIDEO_STYLE as SELECTING_STYLE,
+    VIDEO_RATIO as SELECTING_RATIO
+)
 
 class VideoCreationService:
     """Video creation service"""
@@ -133,27 +139,32 @@ class VideoCreationService:
         # Show processing message
         await update.message.reply_text(get_text(language, "video_processing"))
         
-        # Log request
-        await db_manager.log_request(
+        # Queue the generation; the result is pushed to the user by a background worker
+        job = await generation_queue.submit(
             user.id,
+            update.effective_chat.id,
             "video_creation",
+            "video",
             {
                 "description": description,
                 "length": length,
                 "style": style,
-                "ratio": ratio
-            },
-            "success"
+                "ratio": ratio,
+                "language": language,
+                "telegram_id": user.id
+            }
         )
         
-        # AI API integration point
-        video_result = await VideoCreationService.integrate_ai_api(
-            description, length, style, ratio, language
-        )
+        if not job:
+            await update.message.reply_text(
+                get_text(language, "error"),
+                reply_markup=get_main_menu_keyboard(language)
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
         
-        # Send result message
         await update.message.reply_text(
-            get_text(language, "video_result") + f"\n\n{video_result}",
+            get_text(language, "job_queued", job_id=job.id),
             reply_markup=get_main_menu_keyboard(language)
         )
         
@@ -170,6 +181,15 @@ class VideoCreationService:
         # Placeholder result
         return f"[Video Generation Placeholder]\n\nDescription: {description}\nLength: {length}\nStyle: {style}\nRatio: {ratio}\n\n[Add API integration here to generate actual video]"
     
+    @staticmethod
+    async def run_job(payload: dict, lifecycle) -> str:
+        """Background worker entry point for a queued video job"""
+        return await lifecycle.call_provider(
+            VideoCreationService.integrate_ai_api,
+            payload['description'], payload['length'], payload['style'],
+            payload['ratio'], payload['language']
+        )
+    
     @staticmethod
     async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Cancel video creation conversation"""
@@ -184,3 +204,4 @@ class VideoCreationService:
         )
         
         return ConversationHandler.END
+
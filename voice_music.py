@@ -9,11 +9,22 @@ from utils.keyboards import (get_main_menu_keyboard, get_voice_mode_keyboard,
                              get_voice_style_keyboard, get_voice_language_keyboard,
                              get_music_style_keyboard)
 from utils.decorators import rate_limit 
+from utils.providers import ProviderUnavailable
+from utils.lifecycle import RequestLifecycle
+from utils.tts_pipeline import split_text, synthesize_parts
+from utils.media_store import media_store, request_cache_key
+from services.generation_queue import generation_queue
 import config
 
-# Conversation states
-SELECTING_MODE, ENTERING_TEXT, SELECTING_VOICE_STYLE, SELECTING_VOICE_LANG = range(4, 8)
-ENTERING_MUSIC_PROMPT, SELECTING_MUSIC_STYLE = range(8, 10)
+# Conversation states (defined in services.states)
+from services.states import (
+    SELECTING_MODE,
+    ENTERING_TEXT,
+    SELECTING_VOICE_STYLE,
+    SELECTING_VOICE_LANG,
+    ENTERING_MUSIC_PROMPT,
+    SELECTING_MUSIC_STYLE
+)
 
 class VoiceMusicService:
     """Voice and music service"""
@@ -137,38 +148,71 @@ class VoiceMusicService:
         text = context.user_data.get('voice_text', '')
         style = context.user_data.get('voice_style', '')
         
-        # Show processing message
-        await update.message.reply_text(get_text(language, "voice_processing"))
-        
-        # Log request
-        await db_manager.log_request(
-            user.id,
-            "voice_music",
-            {
-                "mode": "tts",
-                "text": text,
-                "style": style,
-                "language": voice_lang
-            },
-            "success"
-        )
-        
-        # AI API integration point
-        audio_result = await VoiceMusicService.integrate_tts_api(
-            text, style, voice_lang, language
-        )
-        
-        # Send result
-        await update.message.reply_text(
-            get_text(language, "voice_result") + f"\n\n{audio_result}",
-            reply_markup=get_main_menu_keyboard(language)
-        )
+        request_data = {
+            "mode": "tts",
+            "text": text,
+            "style": style,
+            "language": voice_lang
+        }
+        
+        try:
+            # Timed and logged to RequestLog with the real final status
+            async with RequestLifecycle(user.id, "voice_music", request_data) as lifecycle:
+                # Show processing message
+                await lifecycle.send(update.message.reply_text(get_text(language, "voice_processing")))
+                
+                await VoiceMusicService.send_speech(update, lifecycle, text, style, voice_lang, language)
+        except ProviderUnavailable:
+            await update.message.reply_text(
+                get_text(language, "service_unavailable"),
+                reply_markup=get_main_menu_keyboard(language)
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
         
         # Clear context data
         context.user_data.clear()
         
         return ConversationHandler.END
     
+    @staticmethod
+    async def send_speech(update: Update, lifecycle: RequestLifecycle, text: str, style: str,
+                          voice_lang: str, language: str):
+        """
+        Synthesize text chunk by chunk and send the audio as voice messages;
+        the first part is sent while the rest is still being synthesized.
+        """
+        caption = get_text(language, "voice_result")
+        # Speech of a short text is fully determined by the request: resend the earlier upload
+        cache_key = None
+        sent = None
+        if len(split_text(text)) == 1:
+            cache_key = request_cache_key("voice_music", {"text": text, "style": style, "language": voice_lang})
+            sent = await lifecycle.send(media_store.send_cached(update.message.reply_voice, cache_key, "voice", caption=caption))
+
+        async def synthesize(chunk: str):
+            # AI API integration point
+            return await lifecycle.call_provider(VoiceMusicService.integrate_tts_api, chunk, style, voice_lang, language)
+
+        if not sent:
+            first = True
+            async for part in synthesize_parts(text, synthesize):
+                if isinstance(part, str):
+                    # Placeholder provider: no audio
+                    await lifecycle.send(update.message.reply_text(caption + f"\n\n{part}"))
+                    break
+                audio, seconds = part
+                await lifecycle.send(media_store.send(
+                    update.message.reply_voice, audio, "voice", cache_key=cache_key,
+                    duration=round(seconds), caption=caption if first else None
+                ))
+                first = False
+
+        await lifecycle.send(update.message.reply_text(
+            get_text(language, "main_menu"),
+            reply_markup=get_main_menu_keyboard(language)
+        ))
+
     # Music Generation flow
     @staticmethod
     async def enter_music_prompt(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -216,26 +260,31 @@ class VoiceMusicService:
         # Show processing message
         await update.message.reply_text(get_text(language, "voice_processing"))
         
-        # Log request
-        await db_manager.log_request(
+        # Queue the generation; the result is pushed to the user by a background worker
+        job = await generation_queue.submit(
             user.id,
+            update.effective_chat.id,
             "voice_music",
+            "music",
             {
                 "mode": "music",
                 "prompt": prompt,
-                "style": style
-            },
-            "success"
+                "style": style,
+                "language": language,
+                "telegram_id": user.id
+            }
         )
         
-        # AI API integration point
-        music_result = await VoiceMusicService.integrate_music_api(
-            prompt, style, language
-        )
+        if not job:
+            await update.message.reply_text(
+                get_text(language, "error"),
+                reply_markup=get_main_menu_keyboard(language)
+            )
+            context.user_data.clear()
+            return ConversationHandler.END
         
-        # Send result
         await update.message.reply_text(
-            get_text(language, "voice_result") + f"\n\n{music_result}",
+            get_text(language, "job_queued", job_id=job.id),
             reply_markup=get_main_menu_keyboard(language)
         )
         
@@ -245,9 +294,12 @@ class VoiceMusicService:
         return ConversationHandler.END
     
     @staticmethod
-    async def integrate_tts_api(text: str, style: str, voice_lang: str, ui_language: str) -> str:
+    async def integrate_tts_api(text: str, style: str, voice_lang: str, ui_language: str) -> bytes | str:
         """
-        AI API integration point for text-to-speech
+        AI API integration point for text-to-speech.
+        Called once per chunk of the text (at most config.TTS_CHUNK_CHARS
+        characters, several at once); return the speech as OGG/Opus bytes.
+        A str is sent as text instead (placeholder).
         """
         # Placeholder result
         return f"[TTS Placeholder]\n\nText: {text}\nStyle: {style}\nLanguage: {voice_lang}\n\n[Add API integration here to generate actual audio]"
@@ -260,6 +312,14 @@ class VoiceMusicService:
         # Placeholder result
         return f"[Music Generation Placeholder]\n\nPrompt: {prompt}\nStyle: {style}\n\n[Add API integration here to generate actual music]"
     
+    @staticmethod
+    async def run_music_job(payload: dict, lifecycle) -> str:
+        """Background worker entry point for a queued music job"""
+        return await lifecycle.call_provider(
+            VoiceMusicService.integrate_music_api,
+            payload['prompt'], payload['style'], payload['language']
+        )
+    
     @staticmethod
     async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Cancel voice & music conversation"""
@@ -274,3 +334,4 @@ class VoiceMusicService:
         )
         
         return ConversationHandler.END
+